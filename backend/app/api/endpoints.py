@@ -1,310 +1,381 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 from typing import List, Optional
-import shutil
-from pathlib import Path
-from uuid import uuid4
-from datetime import datetime
+import json
+import logging
+import time
 
-from app.core.database import get_db
-from app.models.all_models import Medicine, Prescription, Bill, BillItem, Pharmacist, InventoryTransaction, AuditLog
-from app.schemas.schemas import ScanResponse, BillConfirmationRequest, MedicineResponse
-from app.services.gemini_service import extract_medicines_from_prescription
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal, get_async_db, get_db
+from app.core.metrics import CONFIRM_STAGE_SECONDS, SCAN_STAGE_SECONDS
+from app.core.security import InvalidToken, create_access_token, decode_access_token, verify_pin
+from app.models.all_models import Pharmacist
+from app.schemas.schemas import ScanResponse, ScanJobResponse, BillConfirmationRequest, BillCancellationRequest, BillItemRequest, BulkBillConfirmationRequest, BulkBillConfirmationResponse, MedicineResponse, PharmacistLoginRequest, TokenResponse
+from app.services.dispensing import BillAlreadyProcessed, BillNotFound, InsufficientStock, MedicineNotFound, add_bill_item, cancel_pending_bill, confirm_pending_bill, confirm_pending_bills
+from app.services.autocomplete import autocomplete_index
+from app.services.extraction_cache import extraction_cache
+from app.services.catalog_version import catalog_version
+from app.services.inventory import (INVENTORY_RESPONSES, InvalidCursor, csv_lines, export_chunks, inventory_page,
+                                    inventory_response_cache, low_stock_count, ndjson_lines)
+from app.services.scan_jobs import scan_job_queue
+from app.services.scan_pipeline import run_scan, run_scan_batch
+from app.services.storage import save_upload
 
 router = APIRouter()
 
+bearer_scheme = HTTPBearer(auto_error=False)
+
+logger = logging.getLogger(__name__)
+
 # --- Helpers ---
-def generate_bill_number():
-    # Simple bill number generation
-    year = datetime.now().year
-    count = uuid4().hex[:6].upper()
-    return f"BILL-{year}-{count}"
+async def authenticate_pharmacist_by_pin(pin: str, db: AsyncSession, license_number: str):
+    """
+    Check a PIN against the bcrypt hash of the active pharmacist with
+    `license_number`. Legacy plaintext PINs and outdated hashes are rewritten
+    on success. This costs one bcrypt verify, run in the threadpool, so
+    clients should log in once and use the token.
+    """
+    pharmacist = await db.scalar(
+        select(Pharmacist).where(Pharmacist.license_number == license_number, Pharmacist.is_active == True)
+    )
+    if pharmacist is not None:
+        valid, new_hash = await run_in_threadpool(verify_pin, pin, pharmacist.pin_hash)
+        if valid:
+            if new_hash:
+                pharmacist.pin_hash = new_hash
+                await db.commit()
+            logger.debug("PIN accepted for pharmacist %s", pharmacist.id)
+            return pharmacist
+    logger.info("Rejected pharmacist PIN for license %s", license_number)
+    return None
+
+async def resolve_pharmacist_id(credentials: Optional[HTTPAuthorizationCredentials], pin: Optional[str],
+                                license_number: Optional[str], db: AsyncSession) -> str:
+    # A Bearer token is checked by signature alone; PIN + license number is the legacy fallback
+    if credentials is not None:
+        try:
+            return decode_access_token(credentials.credentials)["sub"]
+        except InvalidToken:
+            raise HTTPException(status_code=401, detail="Invalid or expired token",
+                                headers={"WWW-Authenticate": "Bearer"})
+    if pin:
+        if not license_number:
+            raise HTTPException(status_code=401, detail="license_number is required with pharmacist_pin")
+        pharmacist = await authenticate_pharmacist_by_pin(pin, db, license_number)
+        if pharmacist:
+            return pharmacist.id
+    raise HTTPException(status_code=401, detail="Invalid Pharmacist PIN")
+
+async def save_upload_timed(file: UploadFile):
+    started = time.perf_counter()
+    saved = await save_upload(file)
+    SCAN_STAGE_SECONDS.observe(time.perf_counter() - started, stage="upload")
+    return saved
 
-def authenticate_pharmacist_by_pin(pin: str, db: Session):
-    # In a real app, use bcrypt verify. For this demo, simple check or mock.
-    # We will assume a simple PIN for now as per prompt "Simple PIN-based"
-    # To make it work with the seed data, we'll implement a basic check.
-    # Note: PINs should be hashed. We'll handle this in the seed data.
-    # PIN: 1234
-    print(f"DEBUG AUTH: Checking PIN: {pin}")
-    pharmacist = db.query(Pharmacist).filter(Pharmacist.pin_hash == pin, Pharmacist.is_active == True).first()
-    if pharmacist:
-        print(f"DEBUG AUTH: Found Pharmacist: {pharmacist.name}")
-    else:
-        print("DEBUG AUTH: No pharmacist found with this PIN.")
-    return pharmacist
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def job_to_response(job: dict, request: Request) -> dict:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "error": job.get("error"),
+        "result": job.get("result"),
+        "status_url": str(request.url_for("get_scan_job", job_id=job["id"])),
+        "events_url": str(request.url_for("stream_scan_job_events", job_id=job["id"])),
+    }
 
 # --- Endpoints ---
 
 @router.post("/prescriptions/scan", response_model=ScanResponse)
 async def scan_prescription(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    # 1. Save uploaded image
-    upload_dir = Path("uploads/prescriptions")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    file_path = upload_dir / f"{uuid4()}.jpg"
-    
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    image_key, content_hash = await save_upload_timed(file)
+    return await run_scan(db, image_key, content_hash)
+
+@router.post("/prescriptions/scan/batch")
+async def scan_prescription_batch(files: List[UploadFile] = File(...)):
+    """
+    Scan many prescriptions in one request. Streams NDJSON: one line per file
+    (in completion order) with its ScanResponse or error, then a summary line.
+    """
+    if len(files) > settings.SCAN_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.SCAN_BATCH_MAX_FILES} files per batch")
         
-    # 2. Call Gemini
-    # Convert path to string for service
-    extraction = await extract_medicines_from_prescription(str(file_path))
-    
-    # 3. Create prescription record
-    prescription = Prescription(
-        image_path=str(file_path),
-        gemini_extraction_response=extraction,
-        extraction_confidence=extraction.get("prescription_metadata", {}).get("overall_confidence", 0.0),
-        is_readable=extraction.get("extraction_quality", {}).get("is_readable", False)
-    )
-    db.add(prescription)
-    db.commit()
-    db.refresh(prescription)
-    
-    # 4. Process medicines
-    medicines_with_pricing = []
-    bill_subtotal = 0.0
-    
-    extracted_medicines = extraction.get("medicines", [])
+    saved = [await save_upload_timed(f) for f in files]
+    filenames = [f.filename for f in files]
     
-    # Fetch all medicines for better matching (small dataset assumption)
-    all_medicines = db.query(Medicine).all()
-    
-    extracted_medicines = extraction.get("medicines", [])
-    
-    for med_data in extracted_medicines:
-        # Match Logic:
-        # 1. Exact/Case-insensitive Generic Name
-        # 2. Brand Name match (if available)
-        
-        extracted_generic = med_data.get("generic_name", "").strip().lower()
-        extracted_brand = (med_data.get("brand_name") or "").strip().lower()
+    async def result_stream():
+        succeeded = failed = 0
+        # The request-scoped session is gone once streaming starts
+        async with AsyncSessionLocal() as db:
+            async for index, response, error in run_scan_batch(db, saved):
+                if error:
+                    failed += 1
+                    line = {"index": index, "filename": filenames[index], "status": "ERROR", "error": error}
+                else:
+                    succeeded += 1
+                    line = {"index": index, "filename": filenames[index], "status": "OK", "result": response}
+                yield json.dumps(jsonable_encoder(line)) + "\n"
+        yield json.dumps({"summary": {"files": len(saved), "succeeded": succeeded, "failed": failed}}) + "\n"
         
-        matched_med = None
-        
-        # Try finding match
-        for db_med in all_medicines:
-            db_generic = db_med.generic_name.lower()
-             # Check if brand_names is a list (JSON) or string, handle safely
-            db_brands = []
-            if isinstance(db_med.brand_names, list):
-                db_brands = [b.lower() for b in db_med.brand_names]
-            elif isinstance(db_med.brand_names, str):
-                 # Fallback if somehow stored as string
-                 import json
-                 try: 
-                     db_brands = [b.lower() for b in json.loads(db_med.brand_names)]
-                 except: 
-                     db_brands = [db_med.brand_names.lower()]
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
 
-            if extracted_generic == db_generic:
-                matched_med = db_med
-                break
-            
-            # Check if extracted generic matches a DB brand (common AI error)
-            if extracted_generic in db_brands:
-                matched_med = db_med
-                break
-                
-            # Check if extracted brand matches DB brand
-            if extracted_brand and extracted_brand in db_brands:
-                matched_med = db_med
-                break
-                
-            # Check if extracted brand matches DB generic (common AI error)
-            if extracted_brand and extracted_brand == db_generic:
-                matched_med = db_med
-                break
+@router.post("/prescriptions/scan/jobs", response_model=ScanJobResponse, status_code=202)
+async def submit_scan_job(
+    request: Request,
+    file: UploadFile = File(...)
+):
+    # Save the image and return immediately; a worker runs extraction + billing
+    image_key, content_hash = await save_upload_timed(file)
+    job = await scan_job_queue.submit(image_key, content_hash)
+    return job_to_response(job, request)
 
-        
-        # Helper to construct item dict
-        item = med_data.copy()
-        item["found_in_inventory"] = False
-        item["stock_available"] = False
-        item["unit_price"] = 0.0
-        item["line_total"] = 0.0
-        item["gst_amount"] = 0.0
-        item["item_total"] = 0.0
-        item["current_stock"] = 0
-        
-        qty = int(med_data.get("quantity_prescribed") or 1) # Default to 1 if None
-        item["quantity_prescribed"] = qty
+@router.get("/prescriptions/jobs/{job_id}", response_model=ScanJobResponse)
+async def get_scan_job(job_id: str, request: Request):
+    job = await scan_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scan job not found")
+    return job_to_response(job, request)
 
-        if matched_med:
-            medicine = matched_med
-            item["medicine_id"] = medicine.id
-            item["found_in_inventory"] = True
-            item["current_stock"] = medicine.current_stock
-            item["stock_available"] = medicine.current_stock >= qty
-            item["unit_price"] = float(medicine.unit_price)
-            
-            line_total = float(medicine.unit_price) * qty
-            gst_amount = line_total * (float(medicine.gst_rate) / 100.0)
-            
-            item["line_total"] = line_total
-            item["gst_amount"] = gst_amount
-            item["item_total"] = line_total + gst_amount
-            
-            bill_subtotal += line_total
+@router.get("/prescriptions/jobs/{job_id}/events")
+async def stream_scan_job_events(job_id: str, request: Request):
+    # Server-Sent Events: one event per status change, closed once the job finishes
+    if not await scan_job_queue.get(job_id):
+        raise HTTPException(status_code=404, detail="Scan job not found")
         
-        medicines_with_pricing.append(item)
-        
-    # 5. Totals
-    total_gst = sum(m["gst_amount"] for m in medicines_with_pricing)
-    final_amount = bill_subtotal + total_gst
-    
-    # 6. Create Bill (Pending)
-    bill = Bill(
-        bill_number=generate_bill_number(),
-        prescription_id=prescription.id,
-        patient_name=extraction.get("prescription_metadata", {}).get("patient_name"),
-        patient_age=extraction.get("prescription_metadata", {}).get("patient_age"),
-        subtotal=bill_subtotal,
-        total_gst=total_gst,
-        final_amount=final_amount,
-        status="PENDING"
+    async def event_stream():
+        async for job in scan_job_queue.events(job_id):
+            if await request.is_disconnected():
+                break
+            payload = json.dumps(jsonable_encoder(job_to_response(job, request)))
+            yield f"event: {job['status'].lower()}\ndata: {payload}\n\n"
+            
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    db.add(bill)
-    db.commit()
-    db.refresh(bill)
-    
-    # 7. Create Items (only for found ones? or all? Prompt says "Flag extractions... for manual review")
-    # We will save all, but non-inventory ones might fail FK constraints if we enforce medicine_id.
-    # The requirement says "Medicine not in database - flag for manual entry".
-    # Since our DB schema forces medicine_id, we can't save non-existent medicines to bill_items yet.
-    # In a real app we'd have a temporary items table or allow null medicine_id.
-    # For this build, we will only save FOUND items to the DB, but return ALL to the UI.
-    # The UI will likely need to "Add to Inventory" or map to existing before confirming.
-    
-    for m in medicines_with_pricing:
-        if m["found_in_inventory"]:
-             bill_item = BillItem(
-                bill_id=bill.id,
-                medicine_id=m["medicine_id"],
-                quantity=m["quantity_prescribed"],
-                unit_price=m["unit_price"],
-                line_total=m["line_total"],
-                gst_amount=m["gst_amount"],
-                item_total=m["item_total"],
-                dosage_frequency=m.get("frequency"),
-                dosage_duration=m.get("duration"),
-            )
-             db.add(bill_item)
-    db.commit()
-    
-    return {
-        "status": "PENDING_CONFIRMATION",
-        "bill_id": bill.id,
-        "bill_number": bill.bill_number,
-        "extraction_confidence": float(prescription.extraction_confidence or 0),
-        "medicines": medicines_with_pricing,
-        "subtotal": bill_subtotal,
-        "total_gst": total_gst,
-        "final_amount": final_amount,
-        "final_amount": final_amount,
-        "doctor_notes": extraction.get("prescription_metadata", {}).get("doctor_notes"),
-        "clinical_analysis": extraction.get("clinical_analysis"),
-        "warnings": [m for m in medicines_with_pricing if not m["found_in_inventory"] or not m["stock_available"]]
-    }
+
+@router.post("/auth/login", response_model=TokenResponse)
+async def login(request: PharmacistLoginRequest, db: AsyncSession = Depends(get_async_db)):
+    pharmacist = await authenticate_pharmacist_by_pin(request.pin, db, request.license_number)
+    if not pharmacist:
+        raise HTTPException(status_code=401, detail="Invalid Pharmacist PIN")
+    token, expires_in = create_access_token(pharmacist.id, pharmacist.name)
+    return {"access_token": token, "expires_in": expires_in,
+            "pharmacist_id": pharmacist.id, "pharmacist_name": pharmacist.name}
 
 @router.post("/bills/{bill_id}/confirm")
 async def confirm_bill(
     bill_id: str,
     request: BillConfirmationRequest,
-    db: Session = Depends(get_db)
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    pharmacist = authenticate_pharmacist_by_pin(request.pharmacist_pin, db)
-    if not pharmacist:
-        raise HTTPException(status_code=401, detail="Invalid Pharmacist PIN")
+    with CONFIRM_STAGE_SECONDS.time(stage="auth"):
+        pharmacist_id = await resolve_pharmacist_id(credentials, request.pharmacist_pin, request.license_number, db)
         
-    bill = db.query(Bill).filter(Bill.id == bill_id).first()
-    if not bill:
+    try:
+        with CONFIRM_STAGE_SECONDS.time(stage="dispense"):
+            bill_number = await db.run_sync(confirm_pending_bill, bill_id, pharmacist_id, request.notes)
+    except BillNotFound:
         raise HTTPException(status_code=404, detail="Bill not found")
-        
-    if bill.status != "PENDING":
+    except BillAlreadyProcessed:
+        await db.rollback()
         raise HTTPException(status_code=400, detail="Bill already processed")
+    except InsufficientStock as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
         
-    # Verify stock again
-    items = db.query(BillItem).filter(BillItem.bill_id == bill_id).all()
-    for item in items:
-        med = db.query(Medicine).filter(Medicine.id == item.medicine_id).first()
-        if med.current_stock < item.quantity:
-             raise HTTPException(status_code=400, detail=f"Insufficient stock for {med.generic_name}")
-             
-    # Process
-    bill.status = "CONFIRMED"
-    bill.confirmed_by = pharmacist.id
-    bill.confirmation_notes = request.notes
+    with CONFIRM_STAGE_SECONDS.time(stage="commit"):
+        await db.commit()
     
-    for item in items:
-        med = db.query(Medicine).filter(Medicine.id == item.medicine_id).first()
+    return {"status": "success", "bill_number": bill_number}
+
+@router.post("/bills/confirm-bulk", response_model=BulkBillConfirmationResponse)
+async def confirm_bills_bulk(
+    request: BulkBillConfirmationRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Confirm many pending bills with one authentication and one commit. Each
+    bill is reported as confirmed or failed (not found, already processed,
+    insufficient stock); failures don't stop the others.
+    """
+    if len(request.bill_ids) > settings.BULK_CONFIRM_MAX_BILLS:
+        raise HTTPException(status_code=413, detail=f"At most {settings.BULK_CONFIRM_MAX_BILLS} bills per request")
+    with CONFIRM_STAGE_SECONDS.time(stage="auth"):
+        pharmacist_id = await resolve_pharmacist_id(credentials, request.pharmacist_pin, request.license_number, db)
         
-        # Transaction
-        tx = InventoryTransaction(
-            medicine_id=med.id,
-            transaction_type="DISPENSED",
-            quantity_change=-item.quantity,
-            stock_before=med.current_stock,
-            stock_after=med.current_stock - item.quantity,
-            bill_id=bill.id,
-            performed_by=pharmacist.id
-        )
-        db.add(tx)
+    try:
+        with CONFIRM_STAGE_SECONDS.time(stage="bulk_dispense"):
+            results = await db.run_sync(confirm_pending_bills, request.bill_ids, pharmacist_id, request.notes)
+    except InsufficientStock as e:
+        # Stock moved under us despite the row locks; nothing was applied
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
         
-        # Update stock
-        med.current_stock -= item.quantity
+    with CONFIRM_STAGE_SECONDS.time(stage="commit"):
+        await db.commit()
+    
+    confirmed = sum(1 for r in results if r["status"] == "confirmed")
+    return {"results": results, "summary": {"bills": len(results), "confirmed": confirmed, "failed": len(results) - confirmed}}
+
+@router.post("/bills/{bill_id}/items")
+async def add_item_to_bill(
+    bill_id: str,
+    request: BillItemRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Bill a medicine the pharmacist chose for a line the scan couldn't match
+    exactly, typically one of its match_candidates. Returns the priced line
+    and the bill's new totals.
+    """
+    pharmacist_id = await resolve_pharmacist_id(credentials, request.pharmacist_pin, request.license_number, db)
         
-    # Audit
-    audit = AuditLog(
-        pharmacist_id=pharmacist.id,
-        action="BILL_CONFIRMED",
-        resource_type="BILL",
-        resource_id=bill.id,
-        changes={"status": "CONFIRMED"}
-    )
-    db.add(audit)
+    try:
+        result = await db.run_sync(add_bill_item, bill_id, pharmacist_id, request.medicine_id, request.quantity,
+                                   request.frequency, request.duration)
+    except MedicineNotFound:
+        raise HTTPException(status_code=404, detail="Medicine not found")
+    except BillNotFound:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Bill not found")
+    except BillAlreadyProcessed:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Bill already processed")
+    await db.commit()
     
-    db.commit()
+    return result
+
+@router.post("/bills/{bill_id}/cancel")
+async def cancel_bill(
+    bill_id: str,
+    request: BillCancellationRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    pharmacist_id = await resolve_pharmacist_id(credentials, request.pharmacist_pin, request.license_number, db)
+        
+    try:
+        bill_number = await db.run_sync(cancel_pending_bill, bill_id, pharmacist_id, request.reason)
+    except BillNotFound:
+        raise HTTPException(status_code=404, detail="Bill not found")
+    except BillAlreadyProcessed:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Bill already processed")
+    await db.commit()
     
-    return {"status": "success", "bill_number": bill.bill_number}
+    return {"status": "cancelled", "bill_number": bill_number}
 
 @router.get("/inventory", response_model=dict)
-def get_inventory(
+async def get_inventory(
     search: Optional[str] = None, 
     low_stock_only: bool = False,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Medicine)
-    
-    if low_stock_only:
-        query = query.filter(Medicine.current_stock < Medicine.min_stock_level)
-        
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Medicine.generic_name.ilike(search_term),
-                Medicine.brand_names.any(search) # Array contains
-            )
-        )
-        
-    medicines = query.all()
-    
-    res_list = []
-    for m in medicines:
-        res_list.append({
-            "id": m.id,
-            "generic_name": m.generic_name,
-            "brand_names": m.brand_names,
-            "strength": m.strength,
-            "current_stock": m.current_stock,
-            "min_stock_level": m.min_stock_level,
-            "unit_price": float(m.unit_price),
-            "stock_status": "LOW" if m.current_stock < m.min_stock_level else "OK"
-        })
+    """
+    Inventory ordered by name, one page at a time. Pass the returned
+    `next_cursor` back as `cursor` for the following page; it is null on the
+    last page. With `search`, returns the `limit` best matches instead
+    (prefix match on generic/brand name, strength, manufacturer).
+
+    Responses carry an ETag derived from the catalog version: a matching
+    If-None-Match gets a 304 after a single version lookup, and unchanged
+    queries are served from the in-process response cache.
+    """
+    limit = min(limit or settings.INVENTORY_PAGE_SIZE, settings.INVENTORY_MAX_PAGE_SIZE)
+    # Read the version before the data, so a cached body is never older than its version
+    version = await db.run_sync(catalog_version)
+    headers = {}
+    if version is not None:
+        etag = f'"inventory-{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, etag):
+            INVENTORY_RESPONSES.inc(outcome="not_modified")
+            return Response(status_code=304, headers=headers)
+        query = (search, low_stock_only, cursor, limit)
+        body = inventory_response_cache.get(version, query)
+        if body is not None:
+            INVENTORY_RESPONSES.inc(outcome="hit")
+            return Response(body, media_type="application/json", headers=headers)
+            
+    try:
+        medicines, next_cursor = await db.run_sync(inventory_page, limit, cursor, search, low_stock_only)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
         
-    return {"medicines": res_list}
+    response = JSONResponse({"medicines": medicines, "next_cursor": next_cursor}, headers=headers)
+    if version is not None:
+        inventory_response_cache.put(version, query, response.body)
+    INVENTORY_RESPONSES.inc(outcome="miss")
+    return response
+
+@router.get("/inventory/export")
+def export_inventory(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    low_stock_only: bool = False,
+    expiring_within_days: Optional[int] = Query(None, ge=0),
+    manufacturer: Optional[str] = None
+):
+    """
+    Stream the whole catalog with stock and valuation as NDJSON or CSV, in
+    chunks of INVENTORY_EXPORT_CHUNK_ROWS, with optional filters.
+    """
+    def export_stream():
+        # The request-scoped session is gone once streaming starts
+        db = SessionLocal()
+        try:
+            chunks = export_chunks(db, settings.INVENTORY_EXPORT_CHUNK_ROWS, low_stock_only,
+                                   expiring_within_days, manufacturer)
+            yield from (csv_lines(chunks) if fmt == "csv" else ndjson_lines(chunks))
+        finally:
+            db.close()
+            
+    filename = f"inventory-{time.strftime('%Y%m%d')}.{fmt}"
+    return StreamingResponse(
+        export_stream(),
+        media_type="text/csv" if fmt == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/inventory/low-stock/count", response_model=dict)
+async def get_low_stock_count(db: AsyncSession = Depends(get_async_db)):
+    # Counted from the low-stock partial index, without listing rows
+    return {"low_stock_count": await db.run_sync(low_stock_count)}
+
+@router.get("/inventory/autocomplete", response_model=dict)
+def autocomplete_medicines(
+    q: str = Query(..., max_length=100),
+    limit: int = Query(10, ge=1, le=settings.AUTOCOMPLETE_MAX_RESULTS),
+    db: Session = Depends(get_db)
+):
+    # Served from memory; the database is only read to (re)build the index. Kept
+    # sync so a rebuild runs in the threadpool rather than on the event loop
+    autocomplete_index.ensure_built(db)
+    return {"query": q, "suggestions": autocomplete_index.complete(q, limit)}
+
+@router.get("/prescriptions/cache/stats", response_model=dict)
+def get_extraction_cache_stats():
+    return extraction_cache.stats()
@@ -1,18 +1,138 @@
 from pydantic_settings import BaseSettings
+from sqlalchemy.engine import make_url
 from typing import Optional
 import os
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Pharmacy Automation System"
     API_V1_STR: str = "/api"
+    # Level for the app.* loggers (DEBUG shows per-scan progress)
+    LOG_LEVEL: str = "INFO"
+    # Expose Prometheus metrics on /metrics
+    METRICS_ENABLED: bool = True
     
     POSTGRES_SERVER: str = os.getenv("POSTGRES_SERVER", "localhost")
     POSTGRES_USER: str = os.getenv("POSTGRES_USER", "postgres")
     POSTGRES_PASSWORD: str = os.getenv("POSTGRES_PASSWORD", "password")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "pharmacy_db")
     SQLALCHEMY_DATABASE_URI: Optional[str] = "sqlite:///./pharmacy.db"
+    # Connection pool per engine (the app has a sync and an async one); not used by in-memory SQLite
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 never recycles
+    # Test connections on checkout (one round trip); drops ones a server or proxy closed while idle
+    DB_POOL_PRE_PING: bool = True
+    # Pragmas set on every new SQLite connection: WAL lets readers run alongside the
+    # writer, busy_timeout makes writers queue instead of failing with "database is
+    # locked", synchronous=NORMAL is durable across app crashes in WAL mode (a power
+    # loss can drop the last commits), mmap/cache sizes are in bytes / KiB
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 15000
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
     
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY", "")
+    # Extraction model; response_mime_type is always JSON, the rest is optional tuning
+    GEMINI_MODEL_NAME: str = "gemini-flash-latest"
+    GEMINI_TEMPERATURE: Optional[float] = None
+    GEMINI_MAX_OUTPUT_TOKENS: Optional[int] = None
+    # Send one tiny request at startup so the first scan doesn't pay connection setup
+    GEMINI_WARMUP: bool = False
+    GEMINI_WARMUP_TIMEOUT_SECONDS: float = 15
+    # Max Gemini extraction calls in flight per process
+    GEMINI_MAX_CONCURRENCY: int = 4
+    # Shared rate limit (0 disables), retry budget and circuit breaker for Gemini
+    GEMINI_RATE_LIMIT_PER_MINUTE: float = 60
+    GEMINI_RATE_LIMIT_BURST: int = 5
+    GEMINI_REQUEST_DEADLINE_SECONDS: float = 60
+    GEMINI_MAX_RETRIES: int = 3
+    GEMINI_RETRY_BASE_DELAY: float = 0.5
+    GEMINI_RETRY_MAX_DELAY: float = 8
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 5
+    GEMINI_BREAKER_RESET_SECONDS: float = 30
+    
+    # Extraction cache keyed by image content hash + prompt/model version
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_TTL_HOURS: int = 24 * 7
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 5000
+    # Perceptual-hash matching of re-photographed prescriptions (off by default)
+    EXTRACTION_CACHE_PHASH: bool = False
+    EXTRACTION_CACHE_PHASH_MAX_DISTANCE: int = 4
+    
+    # Image pre-processing before upload to Gemini (runs in a process pool)
+    IMAGE_PREPROCESSING_ENABLED: bool = True
+    IMAGE_MAX_DIMENSION: int = 1600
+    IMAGE_JPEG_QUALITY: int = 80
+    IMAGE_GRAYSCALE: bool = True
+    IMAGE_CROP_MARGINS: bool = True
+    IMAGE_PREPROCESS_WORKERS: int = 2
+    
+    # Background scan jobs (POST /prescriptions/scan/jobs)
+    SCAN_JOB_BACKEND: str = "sql" # "sql" survives restarts, "memory" does not
+    SCAN_JOB_WORKERS: int = 4
+    SCAN_JOB_MAX_ATTEMPTS: int = 3
+    # A job that finds Gemini unavailable (breaker open, rate limited) is re-queued after a
+    # jittered backoff between these bounds, and never sooner than the upstream's retry_after
+    SCAN_JOB_RETRY_BASE_DELAY_SECONDS: float = 5
+    SCAN_JOB_RETRY_MAX_DELAY_SECONDS: float = 60
+    SCAN_JOB_EVENT_POLL_SECONDS: float = 2.0
+    # A RUNNING job's worker refreshes updated_at every third of this; a job not refreshed for
+    # this long belonged to a worker that died and is put back in the queue
+    SCAN_JOB_LEASE_SECONDS: float = 300
+    
+    # Batch scanning (POST /prescriptions/scan/batch)
+    SCAN_BATCH_MAX_FILES: int = 100
+    SCAN_BATCH_CONCURRENCY: int = 8
+    SCAN_BATCH_PERSIST_CHUNK: int = 20
+    # Bulk bill confirmation (POST /bills/confirm-bulk)
+    BULK_CONFIRM_MAX_BILLS: int = 200
+    
+    # Prescription image storage: "local" (under UPLOAD_ROOT) or "s3" (needs boto3)
+    STORAGE_BACKEND: str = "local"
+    UPLOAD_ROOT: str = "uploads"
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    # Uploads are rejected (413) as soon as they stream past this size, before the form is parsed
+    MAX_UPLOAD_BYTES: int = 15 * 1024 * 1024
+    # Delete images not re-uploaded for this many days (0 keeps them forever)
+    UPLOAD_RETENTION_DAYS: int = 0
+    UPLOAD_SWEEP_INTERVAL_SECONDS: float = 3600
+    
+    # Pending bills hold soft stock reservations for this long (0 disables reservations)
+    RESERVATION_TTL_MINUTES: int = 30
+    RESERVATION_SWEEP_INTERVAL_SECONDS: float = 60
+    
+    # GET /inventory page size (default and the most a client may ask for)
+    INVENTORY_PAGE_SIZE: int = 100
+    INVENTORY_MAX_PAGE_SIZE: int = 500
+    # Serialized /inventory responses kept per process, keyed by query and catalog version (0 disables)
+    INVENTORY_CACHE_ENTRIES: int = 256
+    # Rows fetched and written per chunk by GET /inventory/export
+    INVENTORY_EXPORT_CHUNK_ROWS: int = 1000
+    # GET /inventory/autocomplete: shortest prefix served, result cap, the dispensing
+    # window used to rank suggestions and how often the index is rebuilt from scratch
+    AUTOCOMPLETE_MIN_PREFIX: int = 2
+    AUTOCOMPLETE_MAX_RESULTS: int = 20
+    AUTOCOMPLETE_POPULARITY_DAYS: int = 30
+    AUTOCOMPLETE_INDEX_TTL_SECONDS: int = 3600
+    
+    # Pharmacist login tokens (HS256); set SECRET_KEY so tokens survive restarts and work across workers
+    SECRET_KEY: str = os.getenv("SECRET_KEY", "")
+    JWT_ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    # bcrypt cost for stored PINs; existing hashes are upgraded on the next login
+    PIN_HASH_ROUNDS: int = 12
+    
+    # Medicine name index used by prescription matching (0 = never rebuild on age)
+    CATALOG_INDEX_TTL_SECONDS: int = 300
+    # Lines without an exact name match are never billed automatically; catalog
+    # names scoring at least this are returned as candidates for the pharmacist
+    FUZZY_MATCH_THRESHOLD: float = 0.6
+    FUZZY_MATCH_MAX_CANDIDATES: int = 5
     
     @property
     def database_url(self) -> str:
@@ -21,6 +141,13 @@ class Settings(BaseSettings):
         # Fallback to Postgres only if specifically configured env vars are present (logic optional, but sticking to URI priority)
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}/{self.POSTGRES_DB}"
 
+    @property
+    def async_database_url(self) -> str:
+        # Same database, asyncio driver: aiosqlite for SQLite, asyncpg for Postgres
+        url = make_url(self.database_url)
+        drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+        return url.set(drivername=drivers.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
     class Config:
         case_sensitive = True
         env_file = [".env", "../.env"]
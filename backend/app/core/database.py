@@ -1,10 +1,57 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 
-engine = create_engine(settings.database_url)
+def engine_options(url: str) -> dict:
+    """Pool settings from Settings; in-memory SQLite keeps SQLAlchemy's single-connection pool."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def sqlite_pragmas() -> dict:
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "cache_size": -settings.SQLITE_CACHE_SIZE_KB,  # negative = KiB rather than pages
+    }
+
+def configure_sqlite(engine: Engine):
+    """Apply sqlite_pragmas() to every new connection of a SQLite engine (no-op for other databases)."""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+configure_sqlite(engine)
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Same database through an asyncio driver (aiosqlite / asyncpg) for the async endpoints.
+# Attributes stay loaded after commit: lazy refreshes can't run outside an await.
+async_engine = create_async_engine(settings.async_database_url, **engine_options(settings.async_database_url))
+configure_sqlite(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -13,3 +60,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
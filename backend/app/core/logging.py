@@ -0,0 +1,36 @@
+"""
+Queue-backed logging for the `app.*` loggers.
+
+Log calls only put the record on an in-memory queue; a QueueListener thread
+does the formatting and the (possibly slow) stream write, so logging from a
+coroutine never blocks the event loop on I/O.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+from typing import Optional
+
+from app.core.config import settings
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging():
+    """Attach the queue handler to the `app` logger and start the writer thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger = logging.getLogger("app")
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
@@ -0,0 +1,229 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters and histograms are plain dicts keyed by label values behind one lock
+each, so recording on the hot path is a bisect plus a few additions.
+Callback metrics are read only when /metrics is scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Seconds: from sub-millisecond catalog matching up to a slow Gemini round trip
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            snapshot = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter whose value is read from `fn` at scrape time."""
+
+    def __init__(self, name: str, documentation: str, fn: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.kind = kind
+
+    def collect(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, fn: Callable[[], float], kind: str = "gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, fn, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+SCAN_STAGE_SECONDS = registry.histogram(
+    "medease_scan_stage_seconds", "Time spent in each prescription scan stage", ("stage",))
+CONFIRM_STAGE_SECONDS = registry.histogram(
+    "medease_bill_confirm_stage_seconds", "Time spent in each bill confirmation stage", ("stage",))
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "medease_http_request_seconds", "HTTP request latency", ("method", "route", "status"))
+HTTP_REQUEST_DB_QUERIES = registry.histogram(
+    "medease_http_request_db_queries", "Database statements executed per HTTP request", ("method", "route"),
+    buckets=COUNT_BUCKETS)
+DB_QUERIES_TOTAL = registry.counter(
+    "medease_db_queries_total", "Database statements executed", ("operation",))
+DB_QUERY_SECONDS = registry.histogram(
+    "medease_db_query_seconds", "Database statement latency", ("operation",))
+
+# Per-request statement counter; None outside an HTTP request (e.g. job workers)
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+def observe_scan_timings(timings: Dict[str, float]):
+    """Feed a scan's `timings` dict (stage_ms -> ms) into the stage histogram."""
+    for key, ms in timings.items():
+        SCAN_STAGE_SECONDS.observe(ms / 1000.0, stage=key[:-3] if key.endswith("_ms") else key)
+
+
+def instrument_engine(engine):
+    """Count and time every statement the engine sends to the database."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        # Kept on the per-execution context so a failed statement leaves nothing behind
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        operation = statement.lstrip()[:6].upper()
+        if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            operation = "OTHER"
+        DB_QUERIES_TOTAL.inc(operation=operation)
+        DB_QUERY_SECONDS.observe(elapsed, operation=operation)
+        counter = _request_queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request latency and DB statement count per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        counter = [0]
+        token = _request_queries.set(counter)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_queries.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, route=route,
+                                         status=str(status["code"]))
+            HTTP_REQUEST_DB_QUERIES.observe(counter[0], method=method, route=route)
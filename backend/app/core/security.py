@@ -0,0 +1,71 @@
+"""
+PIN hashing and pharmacist session tokens.
+
+PINs are stored as bcrypt hashes and checked once at login; the login hands
+out a short-lived HS256 token that later requests present as a Bearer
+header, so a confirmation costs one signature check instead of a bcrypt
+verify and a pharmacists query.
+"""
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from jose import JWTError, jwt
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PIN_HASH_ROUNDS)
+
+_secret_key = settings.SECRET_KEY
+if not _secret_key:
+    # Tokens from an ephemeral key die with the process and aren't shared between workers
+    logger.warning("SECRET_KEY is not set; using a per-process key for pharmacist tokens")
+    _secret_key = secrets.token_urlsafe(32)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def hash_pin(pin: str) -> str:
+    return pwd_context.hash(pin)
+
+
+def verify_pin(pin: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Check `pin` against a stored hash. Returns (valid, replacement_hash); the
+    replacement is set when the stored value should be rewritten, i.e. it is
+    a legacy plaintext PIN or a hash with outdated parameters.
+    """
+    if not stored:
+        return False, None
+    if pwd_context.identify(stored) is None:
+        # Rows seeded before PINs were hashed hold the PIN itself
+        if hmac.compare_digest(pin.encode(), stored.encode()):
+            return True, hash_pin(pin)
+        return False, None
+    return pwd_context.verify_and_update(pin, stored)
+
+
+def create_access_token(pharmacist_id: str, name: str) -> Tuple[str, int]:
+    """Signed token for a pharmacist. Returns (token, lifetime_seconds)."""
+    lifetime = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    now = datetime.now(timezone.utc)
+    claims = {"sub": pharmacist_id, "name": name, "iat": now, "exp": now + lifetime}
+    return jwt.encode(claims, _secret_key, algorithm=settings.JWT_ALGORITHM), int(lifetime.total_seconds())
+
+
+def decode_access_token(token: str) -> dict:
+    """Verify signature and expiry without touching the database. Raises InvalidToken."""
+    try:
+        claims = jwt.decode(token, _secret_key, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError as e:
+        raise InvalidToken(str(e)) from e
+    if not claims.get("sub"):
+        raise InvalidToken("Token has no subject")
+    return claims
@@ -1,11 +1,12 @@
 from app.core.database import SessionLocal
 from app.models.all_models import Pharmacist
+from app.core.security import hash_pin
 
 def create_admin():
     db = SessionLocal()
     try:
         print("Checking for Admin Pharmacist...")
-        admin = db.query(Pharmacist).filter(Pharmacist.pin_hash == "1234").first()
+        admin = db.query(Pharmacist).filter(Pharmacist.license_number == "PHARM-001").first()
         
         if admin:
             print(f"Admin already exists: {admin.name} (ID: {admin.id})")
@@ -14,7 +15,7 @@ def create_admin():
             new_admin = Pharmacist(
                 name="Admin Pharmacist",
                 license_number="PHARM-001",
-                pin_hash="1234",
+                pin_hash=hash_pin("1234"),
                 is_active=True
             )
             db.add(new_admin)
@@ -1,10 +1,14 @@
 from app.core.database import SessionLocal, engine, Base
 from app.models.all_models import Medicine, Pharmacist
+from app.core.security import hash_pin
+from app.services.catalog_version import ensure_catalog_version
 from sqlalchemy.orm import Session
 
 def init_db():
     print("Creating tables...")
     Base.metadata.create_all(bind=engine)
+    # Seeding bumps the catalog version like any other write
+    ensure_catalog_version(engine)
     
     db = SessionLocal()
     
@@ -73,7 +77,7 @@ def init_db():
     admin = Pharmacist(
         name="Admin Pharmacist",
         license_number="PHARM-001",
-        pin_hash="1234", 
+        pin_hash=hash_pin("1234"),
         is_active=True
     )
     db.add(admin)
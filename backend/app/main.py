@@ -1,10 +1,51 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import math
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import endpoints
 from app.core.config import settings
+from app.core.database import Base, async_engine, engine
+from app.core.logging import setup_logging
+from app.core.metrics import MetricsMiddleware, registry
+from app.services import image_preprocessing
+from app.services.gemini_service import GeminiUnavailableError, extraction_client
+from app.services.catalog_version import ensure_catalog_version
+from app.services.inventory import ensure_low_stock_index
+from app.services.reservations import reservation_sweeper
+from app.services.scan_jobs import scan_job_queue
+from app.services.search_index import ensure_search_index
+from app.services.storage import UploadSizeLimitMiddleware, UploadTooLarge, retention_sweeper
 
-app = FastAPI(title=settings.PROJECT_NAME)
+setup_logging()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create any tables added since the database was first initialised
+    Base.metadata.create_all(bind=engine)
+    # Full-text inventory search (FTS5 / tsvector), built once and then kept in sync by the database
+    ensure_search_index(engine)
+    ensure_low_stock_index(engine)
+    # Row holding the version /inventory's ETags and response cache key on
+    ensure_catalog_version(engine)
+    # Configure Gemini and build the model once (optionally warming it up)
+    await extraction_client.start()
+    # Starting the queue re-enqueues jobs interrupted by the last shutdown
+    await scan_job_queue.start()
+    retention_sweeper.start()
+    reservation_sweeper.start()
+    yield
+    await reservation_sweeper.stop()
+    await retention_sweeper.stop()
+    await scan_job_queue.stop()
+    image_preprocessing.shutdown_pool()
+    extraction_client.close()
+    await async_engine.dispose()
+
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
+
+# Innermost, so its 413s still get CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     # Allow all origins for this demo. In production, list specific domains e.g. ["https://medease-app.vercel.app"]
@@ -14,8 +55,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(GeminiUnavailableError)
+async def gemini_unavailable_handler(request: Request, exc: GeminiUnavailableError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Prescription extraction is temporarily unavailable: {exc}"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large_handler(request: Request, exc: UploadTooLarge):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
 app.include_router(endpoints.router, prefix="/api")
 
 @app.get("/")
 def read_root():
     return {"message": "Pharmacy Automation System API is running"}
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        # Prometheus text exposition format
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Float, Boolean, ForeignKey, DateTime, Text, DECIMAL, JSON
+from sqlalchemy import Column, String, Integer, Float, Boolean, ForeignKey, DateTime, Text, DECIMAL, JSON, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -26,6 +26,21 @@ class Medicine(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        # Partial index of just the low-stock rows, in listing order. The database updates it on every
+        # stock change, so low_stock_only listings and counts cost O(low-stock rows), not a table scan.
+        Index("ix_medicines_low_stock", "generic_name", "id",
+              sqlite_where=current_stock < min_stock_level,
+              postgresql_where=current_stock < min_stock_level),
+    )
+
+class CatalogVersion(Base):
+    # Single row (id=1), bumped once per transaction that writes medicines / stock_reservations
+    __tablename__ = "catalog_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
 class Prescription(Base):
     __tablename__ = "prescriptions"
     
@@ -38,6 +53,32 @@ class Prescription(Base):
     status = Column(String, default='EXTRACTED') # EXTRACTED, PROCESSED, ERROR
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+    
+    cache_key = Column(String, primary_key=True) # <sha256 of image bytes>:<extraction version>
+    content_hash = Column(String, nullable=False)
+    extraction_version = Column(String, nullable=False)
+    perceptual_hash = Column(String, nullable=True) # 64-bit dHash as hex, for near-duplicates
+    prescription_id = Column(String, ForeignKey("prescriptions.id"), nullable=True)
+    gemini_extraction_response = Column(JSON, nullable=False)
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ScanJob(Base):
+    __tablename__ = "scan_jobs"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    status = Column(String, default="QUEUED", index=True) # QUEUED, RUNNING, COMPLETED, FAILED
+    image_path = Column(String, nullable=False)
+    content_hash = Column(String, nullable=False)
+    result = Column(JSON, nullable=True) # ScanResponse payload once COMPLETED
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Pharmacist(Base):
     __tablename__ = "pharmacists"
     
@@ -63,7 +104,7 @@ class Bill(Base):
     subtotal = Column(DECIMAL(12, 2), nullable=False)
     total_gst = Column(DECIMAL(12, 2), nullable=False)
     final_amount = Column(DECIMAL(12, 2), nullable=False)
-    status = Column(String, default="PENDING") # PENDING, CONFIRMED
+    status = Column(String, default="PENDING") # PENDING, CONFIRMED, CANCELLED
     confirmed_by = Column(String, ForeignKey("pharmacists.id"), nullable=True)
     confirmation_notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -86,6 +127,22 @@ class BillItem(Base):
     
     bill = relationship("Bill", back_populates="items")
 
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    bill_id = Column(String, ForeignKey("bills.id"), nullable=False, index=True)
+    medicine_id = Column(String, ForeignKey("medicines.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Covers the "reserved per medicine" sum (no table lookups) and the expiry sweep
+    __table_args__ = (
+        Index("ix_stock_reservations_medicine_expiry", "medicine_id", "expires_at", "quantity"),
+        Index("ix_stock_reservations_expires_at", "expires_at"),
+    )
+
 class InventoryTransaction(Base):
     __tablename__ = "inventory_transactions"
     
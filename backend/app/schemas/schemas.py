@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 from decimal import Decimal
 
@@ -41,6 +41,12 @@ class GeminiResponse(BaseModel):
     extraction_quality: ExtractionQuality
 
 # API Response Schemas
+class MatchCandidate(BaseModel):
+    medicine_id: str
+    name: str
+    kind: str
+    score: float
+
 class MedicinePriceCheck(MedicineExtraction):
     medicine_id: Optional[str] = None
     found_in_inventory: bool
@@ -50,6 +56,12 @@ class MedicinePriceCheck(MedicineExtraction):
     item_total: Optional[float] = None
     stock_available: bool = False
     current_stock: int = 0
+    reserved_stock: int = 0 # held by other pending bills
+    available_stock: int = 0 # current_stock - reserved_stock
+    stock_reserved: bool = False # this bill now holds a reservation for the line
+    match_type: Optional[str] = None # EXACT, FUZZY
+    match_score: Optional[float] = None
+    match_candidates: List[MatchCandidate] = []
 
 class ScanResponse(BaseModel):
     status: str
@@ -60,14 +72,69 @@ class ScanResponse(BaseModel):
     subtotal: float
     total_gst: float
     final_amount: float
+    extraction_cached: bool = False
+    timings: Dict[str, float] = {} # per-stage durations in ms
     doctor_notes: Optional[str] = None
     clinical_analysis: Optional[ClinicalAnalysis] = None
     warnings: List[dict]
 
+class ScanJobResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[ScanResponse] = None
+    status_url: Optional[str] = None
+    events_url: Optional[str] = None
+
+class PharmacistLoginRequest(BaseModel):
+    pin: str
+    license_number: str
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    pharmacist_id: str
+    pharmacist_name: str
+
+# pharmacist_pin + license_number are only needed without an Authorization: Bearer token
 class BillConfirmationRequest(BaseModel):
-    pharmacist_pin: str
+    pharmacist_pin: Optional[str] = None
+    license_number: Optional[str] = None
+    notes: Optional[str] = None
+
+# Adds a medicine the pharmacist picked (e.g. one of a line's match_candidates) to a pending bill
+class BillItemRequest(BaseModel):
+    medicine_id: str
+    quantity: int = Field(1, gt=0)
+    frequency: Optional[str] = None
+    duration: Optional[str] = None
+    pharmacist_pin: Optional[str] = None
+    license_number: Optional[str] = None
+
+class BillCancellationRequest(BaseModel):
+    pharmacist_pin: Optional[str] = None
+    license_number: Optional[str] = None
+    reason: Optional[str] = None
+
+class BulkBillConfirmationRequest(BaseModel):
+    bill_ids: List[str]
+    pharmacist_pin: Optional[str] = None
+    license_number: Optional[str] = None
     notes: Optional[str] = None
 
+class BulkBillResult(BaseModel):
+    bill_id: str
+    bill_number: Optional[str] = None
+    status: str # confirmed, failed
+    error: Optional[str] = None
+
+class BulkBillConfirmationResponse(BaseModel):
+    results: List[BulkBillResult]
+    summary: dict
+
 class MedicineResponse(BaseModel):
     id: str
     generic_name: str
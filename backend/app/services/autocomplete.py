@@ -0,0 +1,269 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.all_models import InventoryTransaction, Medicine
+from app.services.fuzzy_matcher import fuzzy_key
+from app.services.medicine_index import parse_brand_names
+
+# Session.info keys holding catalog changes / dispensings that are waiting for their commit
+_PENDING_KEY = "autocomplete_pending"
+_DISPENSED_KEY = "autocomplete_dispensed"
+_MEMO_ENTRIES = 16384
+
+Rank = Tuple[bool, bool, str]  # (is_brand, inner_word, name)
+
+
+class AutocompleteIndex:
+    """
+    Prefix completions over generic and brand names, ranked by how often each
+    medicine was dispensed in the last AUTOCOMPLETE_POPULARITY_DAYS.
+
+    Every word start of every name is a key in one sorted array ("para" finds
+    "Aceclofenac + Paracetamol" too), so a lookup is a bisect to the first key
+    with the prefix plus a walk over the matching slice. The ranked top
+    AUTOCOMPLETE_MAX_RESULTS per prefix is memoized: dispensings only raise
+    popularity, so they are patched into the memoized lists in place, while a
+    catalog edit forgets the prefixes of the names it touched. The whole index
+    is rebuilt every AUTOCOMPLETE_INDEX_TTL_SECONDS so old dispensings age out
+    of the window and writes that bypass the ORM are picked up.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._keys: List[str] = []
+        self._postings: List[Tuple[str, Rank]] = []  # aligned with _keys
+        self._medicines: Dict[str, Tuple[str, str, List[str]]] = {}  # id -> (generic, strength, brands)
+        self._popularity: Counter = Counter()
+        self._memo: Dict[str, List[Tuple[str, Rank]]] = {}  # prefix -> ranked (id, rank)
+
+    @property
+    def is_built(self) -> bool:
+        return self._built_at is not None
+
+    def build(self, db: Session):
+        rows = db.execute(select(Medicine.id, Medicine.generic_name, Medicine.strength, Medicine.brand_names)).all()
+        cutoff = datetime.utcnow() - timedelta(days=settings.AUTOCOMPLETE_POPULARITY_DAYS)
+        popularity = Counter(dict(db.execute(
+            select(InventoryTransaction.medicine_id, func.count())
+            .where(InventoryTransaction.transaction_type == "DISPENSED", InventoryTransaction.created_at >= cutoff)
+            .group_by(InventoryTransaction.medicine_id)
+        ).all()))
+        entries = []
+        medicines = {}
+        for med_id, generic_name, strength, brand_names in rows:
+            brands = parse_brand_names(brand_names)
+            medicines[med_id] = (generic_name, strength, brands)
+            entries.extend(_entries_for(med_id, generic_name, brands))
+        entries.sort(key=lambda e: e[0])
+        with self._lock:
+            self._keys = [key for key, _ in entries]
+            self._postings = [posting for _, posting in entries]
+            self._medicines = medicines
+            self._popularity = popularity
+            self._memo = {}
+            self._built_at = time.monotonic()
+            self._warm()
+
+    @property
+    def needs_build(self) -> bool:
+        ttl = settings.AUTOCOMPLETE_INDEX_TTL_SECONDS
+        return self._built_at is None or bool(ttl and time.monotonic() - self._built_at > ttl)
+
+    def ensure_built(self, db: Session):
+        if self.needs_build:
+            # One build at a time; callers that waited find it fresh
+            with self._build_lock:
+                if self.needs_build:
+                    self.build(db)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def upsert(self, med_id: str, generic_name: str, strength: str, brand_names: List[str]):
+        with self._lock:
+            if not self.is_built:
+                return
+            self._remove(med_id)
+            self._medicines[med_id] = (generic_name, strength, brand_names)
+            self._forget(med_id)
+            for key, posting in _entries_for(med_id, generic_name, brand_names):
+                index = bisect.bisect_right(self._keys, key)
+                self._keys.insert(index, key)
+                self._postings.insert(index, posting)
+
+    def remove(self, med_id: str):
+        with self._lock:
+            if self.is_built:
+                self._remove(med_id)
+
+    def record_dispensed(self, counts: Dict[str, int]):
+        with self._lock:
+            self._popularity.update(counts)
+            for med_id in counts:
+                if med_id in self._medicines:
+                    self._promote(med_id)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Up to `limit` medicines with a name word starting with `prefix`, most dispensed first."""
+        key = fuzzy_key(prefix)
+        if len(key) < settings.AUTOCOMPLETE_MIN_PREFIX:
+            return []
+        with self._lock:
+            ranked = self._memo.get(key)
+            if ranked is None:
+                ranked = self._rank(key)
+                if len(self._memo) >= _MEMO_ENTRIES:
+                    self._memo.clear()
+                self._memo[key] = ranked
+            return [
+                {
+                    "medicine_id": med_id,
+                    "generic_name": self._medicines[med_id][0],
+                    "strength": self._medicines[med_id][1],
+                    "match": name,
+                    "match_type": "brand" if is_brand else "generic",
+                    "dispensed_recently": self._popularity[med_id],
+                }
+                for med_id, (is_brand, _, name) in ranked[:limit]
+            ]
+
+    # --- internals (call with the lock held) ---
+    def _order(self, item: Tuple[str, Rank]):
+        return -self._popularity[item[0]], item[1]
+
+    def _rank(self, key: str) -> List[Tuple[str, Rank]]:
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_left(self._keys, key + "\uffff", lo=start)
+        best: Dict[str, Rank] = {}
+        for med_id, rank in self._postings[start:end]:
+            if med_id not in best or rank < best[med_id]:
+                best[med_id] = rank
+        return heapq.nsmallest(settings.AUTOCOMPLETE_MAX_RESULTS, best.items(), key=self._order)
+
+    def _warm(self):
+        # The shortest prefixes match the longest slices; rank them once up front
+        # (keys are sorted, so each prefix is one contiguous run)
+        length = settings.AUTOCOMPLETE_MIN_PREFIX
+        seen = set()
+        for key in self._keys:
+            prefix = key[:length]
+            if len(prefix) == length and prefix not in seen:
+                seen.add(prefix)
+                self._memo[prefix] = self._rank(prefix)
+
+    def _prefixes(self, med_id: str):
+        """Memoizable prefixes under which `med_id` appears, with its best rank for each."""
+        generic_name, _, brands = self._medicines[med_id]
+        best: Dict[str, Rank] = {}
+        for key, (_, rank) in _entries_for(med_id, generic_name, brands):
+            for end in range(settings.AUTOCOMPLETE_MIN_PREFIX, len(key) + 1):
+                prefix = key[:end]
+                if prefix not in best or rank < best[prefix]:
+                    best[prefix] = rank
+        return best
+
+    def _promote(self, med_id: str):
+        # Popularity only grows between rebuilds, so the memoized lists stay exact
+        # by re-placing this one medicine
+        for prefix, rank in self._prefixes(med_id).items():
+            ranked = self._memo.get(prefix)
+            if ranked is None:
+                continue
+            ranked = [item for item in ranked if item[0] != med_id] + [(med_id, rank)]
+            ranked.sort(key=self._order)
+            self._memo[prefix] = ranked[:settings.AUTOCOMPLETE_MAX_RESULTS]
+
+    def _forget(self, med_id: str):
+        for prefix in self._prefixes(med_id):
+            self._memo.pop(prefix, None)
+
+    def _remove(self, med_id: str):
+        if med_id not in self._medicines:
+            return
+        self._forget(med_id)
+        generic_name, _, brands = self._medicines.pop(med_id)
+        for key, posting in _entries_for(med_id, generic_name, brands):
+            index = bisect.bisect_left(self._keys, key)
+            while index < len(self._keys) and self._keys[index] == key:
+                if self._postings[index] == posting:
+                    del self._keys[index]
+                    del self._postings[index]
+                    break
+                index += 1
+
+
+def _entries_for(med_id: str, generic_name: str, brand_names: Iterable[str]):
+    # Rank within a medicine's own matches: generic over brand, whole name over inner word
+    for is_brand, name in [(False, generic_name)] + [(True, b) for b in brand_names]:
+        words = fuzzy_key(name).split()
+        for i in range(len(words)):
+            # Key from each word start to the end of the name, so multi-word prefixes work too
+            yield " ".join(words[i:]), (med_id, (is_brand, i > 0, name))
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def stage_dispensed(db: Session, medicine_ids: Iterable[str]):
+    """Count one dispensing per medicine towards autocomplete ranking once `db` commits."""
+    db.info.setdefault(_DISPENSED_KEY, Counter()).update(medicine_ids)
+
+
+# --- Keep the index in sync with committed Medicine writes ---
+def _stage(target: Medicine, entry):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, {})[target.id] = entry
+
+
+def _entry(target: Medicine):
+    return target.generic_name, target.strength, parse_brand_names(target.brand_names)
+
+
+@event.listens_for(Medicine, "after_insert")
+def _medicine_inserted(mapper, connection, target):
+    _stage(target, _entry(target))
+
+
+@event.listens_for(Medicine, "after_update")
+def _medicine_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    # Stock-only updates don't touch the index
+    if any(getattr(attrs, name).history.has_changes() for name in ("generic_name", "strength", "brand_names")):
+        _stage(target, _entry(target))
+
+
+@event.listens_for(Medicine, "after_delete")
+def _medicine_deleted(mapper, connection, target):
+    _stage(target, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    for med_id, entry in (pending or {}).items():
+        if entry is None:
+            autocomplete_index.remove(med_id)
+        else:
+            autocomplete_index.upsert(med_id, *entry)
+    dispensed = session.info.pop(_DISPENSED_KEY, None)
+    if dispensed:
+        autocomplete_index.record_dispensed(dispensed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_DISPENSED_KEY, None)
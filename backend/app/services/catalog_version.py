@@ -0,0 +1,118 @@
+"""
+Catalog/stock version: a counter that changes whenever anything /inventory
+shows may have changed.
+
+The counter lives in the single catalog_version row. Engine listeners note
+every INSERT/DELETE on medicines or stock_reservations and every UPDATE
+setting a listed medicines column, whatever issued it (ORM flushes, the
+Core statements of confirmations, scans and the reservation sweeper,
+engine.begin() blocks), and bump the counter once per transaction as its
+last statement before COMMIT. The new version becomes visible together with
+the data, and the row lock is only held for that final UPDATE rather than
+for the whole writing transaction, so concurrent writers don't queue behind
+each other on it. SQL run outside this process (psql, other tools) must
+bump the version itself.
+"""
+import logging
+import re
+from functools import lru_cache
+from typing import FrozenSet, Optional
+
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models.all_models import CatalogVersion
+
+logger = logging.getLogger(__name__)
+
+_BUMP = "UPDATE catalog_version SET version = version + 1 WHERE id = 1"
+_LISTED_COLUMNS = frozenset(
+    ["generic_name", "brand_names", "strength", "form", "unit_price", "min_stock_level", "current_stock"]
+)
+# Connection.info flag: this transaction changed something /inventory shows
+_CHANGED_KEY = "catalog_version_changed"
+
+# Triggers and function that used to do the bump inside each write; dropped on startup
+_LEGACY_SQLITE_TRIGGERS = [
+    "catalog_version_medicines_ai", "catalog_version_medicines_ad", "catalog_version_medicines_au",
+    "catalog_version_reservations_ai", "catalog_version_reservations_ad", "catalog_version_reservations_au",
+]
+_LEGACY_POSTGRES_DDL = [
+    "DROP TRIGGER IF EXISTS catalog_version_medicines ON medicines",
+    "DROP TRIGGER IF EXISTS catalog_version_reservations ON stock_reservations",
+    "DROP FUNCTION IF EXISTS bump_catalog_version()",
+]
+
+
+# Set once the version row exists; until then there is no trustworthy version
+_tracking = False
+
+
+def ensure_catalog_version(engine: Engine) -> bool:
+    """Create the version row if missing and drop the old bump triggers (idempotent; tables must exist)."""
+    global _tracking
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO catalog_version (id, version) SELECT 1, 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM catalog_version WHERE id = 1)"
+        ))
+        if engine.dialect.name == "sqlite":
+            for name in _LEGACY_SQLITE_TRIGGERS:
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        elif engine.dialect.name == "postgresql":
+            for statement in _LEGACY_POSTGRES_DDL:
+                conn.execute(text(statement))
+    _tracking = True
+    return True
+
+
+def catalog_version(db: Session) -> Optional[int]:
+    """Current version, or None if this process hasn't set up the version row."""
+    if not _tracking:
+        return None
+    return db.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+
+@lru_cache(maxsize=256)
+def _assigned_columns(statement: str) -> FrozenSet[str]:
+    # Column names on the left of each "col=" in an UPDATE's SET clause
+    match = re.search(r"\bSET\s+(.*?)(?:\s+WHERE\b|\s+RETURNING\b|$)", statement, re.S | re.I)
+    if not match:
+        return frozenset()
+    return frozenset(re.findall(r'(?:^|,)\s*"?(\w+)"?\s*=', match.group(1)))
+
+
+def _changes_catalog(context) -> bool:
+    if not (context.isinsert or context.isupdate or context.isdelete):
+        return False
+    table = getattr(context.compiled, "statement", None)
+    table = getattr(table, "table", None)
+    name = getattr(table, "name", None)
+    if name == "stock_reservations":
+        return True
+    if name != "medicines":
+        return False
+    return not context.isupdate or bool(_assigned_columns(context.statement) & _LISTED_COLUMNS)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and context.compiled is not None and _changes_catalog(context):
+        conn.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(Engine, "commit")
+def _bump_before_commit(conn):
+    if conn.info.pop(_CHANGED_KEY, False):
+        # Straight on the DBAPI connection: the SQLAlchemy transaction is already committing
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(_BUMP)
+        finally:
+            cursor.close()
+
+
+@event.listens_for(Engine, "rollback")
+def _forget_write(conn):
+    conn.info.pop(_CHANGED_KEY, None)
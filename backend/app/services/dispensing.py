@@ -0,0 +1,342 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.all_models import AuditLog, Bill, BillItem, InventoryTransaction, Medicine
+from app.services.autocomplete import stage_dispensed
+from app.services.reservations import release, release_bills, reservations_enabled, reserve, reserved_quantities
+
+
+class BillNotFound(Exception):
+    pass
+
+
+class BillAlreadyProcessed(Exception):
+    pass
+
+
+class MedicineNotFound(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+    def __init__(self, medicine_names: List[str]):
+        super().__init__(f"Insufficient stock for {', '.join(medicine_names)}")
+        self.medicine_names = medicine_names
+
+
+_medicines = Medicine.__table__
+
+# Conditional decrement: a row only changes if it still has enough stock, so
+# concurrent confirmations can never drive stock below zero
+_DECREMENT = (
+    update(_medicines)
+    .where(_medicines.c.id == bindparam("medicine_id"), _medicines.c.current_stock >= bindparam("qty"))
+    .values(current_stock=_medicines.c.current_stock - bindparam("qty"))
+)
+
+
+def aggregate_quantities(items: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    """(medicine_id, qty) pairs -> total qty per medicine, in id order (the lock order)."""
+    totals: Dict[str, int] = defaultdict(int)
+    for medicine_id, quantity in items:
+        totals[medicine_id] += quantity
+    return dict(sorted(totals.items()))
+
+
+def lock_stock(db: Session, medicine_ids: Iterable[str]) -> Dict[str, Tuple[str, int]]:
+    """
+    SELECT ... FOR UPDATE the given medicines in id order, so concurrent
+    confirmations lock rows in the same order (no deadlocks). Returns
+    medicine_id -> (generic_name, current_stock).
+    """
+    rows = db.execute(
+        select(Medicine.id, Medicine.generic_name, Medicine.current_stock)
+        .where(Medicine.id.in_(list(medicine_ids)))
+        .order_by(Medicine.id)
+        .with_for_update()
+    ).all()
+    return {r.id: (r.generic_name, r.current_stock) for r in rows}
+
+
+def apply_decrements(db: Session, quantities: Dict[str, int]):
+    """
+    One executemany of conditional UPDATEs (`current_stock >= qty`), which
+    also guards databases without row locks, checked via the rowcount.
+    """
+    params = [{"medicine_id": mid, "qty": qty} for mid, qty in quantities.items()]
+    if not params:
+        return
+    conn = db.connection()
+    if conn.dialect.supports_sane_multi_rowcount:
+        updated = conn.execute(_DECREMENT, params).rowcount
+    else:
+        # Drivers like psycopg2 don't report executemany rowcounts; same statements, summed
+        updated = sum(conn.execute(_DECREMENT, p).rowcount for p in params)
+    if updated != len(params):
+        raise InsufficientStock(["one or more medicines (stock changed concurrently)"])
+
+
+def decrement_stock(db: Session, quantities: Dict[str, int]) -> Dict[str, Tuple[int, int]]:
+    """
+    Take `quantities` out of stock inside the caller's transaction, in a
+    constant number of statements: lock_stock() then apply_decrements().
+
+    Returns medicine_id -> (stock_before, stock_after). Raises InsufficientStock
+    (the caller rolls back) if any medicine is short or missing.
+    """
+    if not quantities:
+        return {}
+    stock = lock_stock(db, quantities)
+    short = [name for mid, (name, level) in stock.items() if level < quantities[mid]]
+    short += [mid for mid in quantities if mid not in stock]
+    if short:
+        raise InsufficientStock(short)
+
+    apply_decrements(db, quantities)
+    return {mid: (stock[mid][1], stock[mid][1] - qty) for mid, qty in quantities.items()}
+
+
+def ledger_rows(levels: Dict[str, Tuple[int, int]], quantities: Dict[str, int],
+                bill_id: str, pharmacist_id: str) -> List[dict]:
+    return [
+        {
+            "medicine_id": medicine_id,
+            "transaction_type": "DISPENSED",
+            "quantity_change": -quantities[medicine_id],
+            "stock_before": before,
+            "stock_after": after,
+            "bill_id": bill_id,
+            "performed_by": pharmacist_id,
+        }
+        for medicine_id, (before, after) in levels.items()
+    ]
+
+
+def confirm_pending_bill(db: Session, bill_id: str, pharmacist_id: str, notes: str = None) -> str:
+    """
+    Confirm a PENDING bill and dispense its items in a constant number of
+    statements, independent of the number of items. Returns the bill number;
+    the caller commits.
+    """
+    bill = db.execute(select(Bill.bill_number, Bill.status).where(Bill.id == bill_id)).first()
+    if not bill:
+        raise BillNotFound(bill_id)
+    if bill.status != "PENDING":
+        raise BillAlreadyProcessed(bill_id)
+
+    # Claim the bill first: of two concurrent confirmations only one gets a row.
+    # Being the first write, this is also where SQLite takes its write lock.
+    claimed = db.execute(
+        update(Bill)
+        .where(Bill.id == bill_id, Bill.status == "PENDING")
+        .values(status="CONFIRMED", confirmed_by=pharmacist_id, confirmation_notes=notes)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        raise BillAlreadyProcessed(bill_id)
+
+    items = db.execute(select(BillItem.medicine_id, BillItem.quantity).where(BillItem.bill_id == bill_id)).all()
+    quantities = aggregate_quantities((i.medicine_id, i.quantity) for i in items)
+    levels = decrement_stock(db, quantities)
+
+    rows = ledger_rows(levels, quantities, bill_id, pharmacist_id)
+    if rows:
+        db.execute(insert(InventoryTransaction), rows)
+        stage_dispensed(db, (row["medicine_id"] for row in rows))
+    # Reserved units are now actually dispensed
+    release(db, bill_id)
+    db.add(AuditLog(
+        pharmacist_id=pharmacist_id,
+        action="BILL_CONFIRMED",
+        resource_type="BILL",
+        resource_id=bill_id,
+        changes={"status": "CONFIRMED"}
+    ))
+    return bill.bill_number
+
+
+def add_bill_item(db: Session, bill_id: str, pharmacist_id: str, medicine_id: str, quantity: int,
+                  frequency: str = None, duration: str = None) -> dict:
+    """
+    Add a pharmacist-chosen medicine (e.g. a fuzzy-match candidate they
+    confirmed) to a PENDING bill, priced from the catalog and reserved like a
+    scanned line if enough stock is available. Returns the priced line and the
+    new bill totals; the caller commits.
+    """
+    medicine = db.execute(
+        select(Medicine.id, Medicine.generic_name, Medicine.strength, Medicine.unit_price, Medicine.gst_rate,
+               Medicine.current_stock)
+        .where(Medicine.id == medicine_id)
+    ).first()
+    if not medicine:
+        raise MedicineNotFound(medicine_id)
+    line_total = float(medicine.unit_price) * quantity
+    gst_amount = line_total * (float(medicine.gst_rate) / 100.0)
+
+    # Totals move in the same conditional UPDATE that checks the bill is still
+    # PENDING, so a concurrent confirmation can't miss the new line
+    updated = db.execute(
+        update(Bill)
+        .where(Bill.id == bill_id, Bill.status == "PENDING")
+        .values(subtotal=Bill.subtotal + line_total, total_gst=Bill.total_gst + gst_amount,
+                final_amount=Bill.final_amount + line_total + gst_amount)
+        .returning(Bill.subtotal, Bill.total_gst, Bill.final_amount)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if not updated:
+        if db.execute(select(Bill.id).where(Bill.id == bill_id)).first():
+            raise BillAlreadyProcessed(bill_id)
+        raise BillNotFound(bill_id)
+
+    db.execute(insert(BillItem).values(
+        bill_id=bill_id, medicine_id=medicine_id, quantity=quantity, unit_price=medicine.unit_price,
+        line_total=line_total, gst_amount=gst_amount, item_total=line_total + gst_amount,
+        dosage_frequency=frequency, dosage_duration=duration,
+    ))
+    reserved_stock = reserved_quantities(db, [medicine_id]).get(medicine_id, 0)
+    available_stock = max(0, medicine.current_stock - reserved_stock)
+    stock_available = available_stock >= quantity
+    if stock_available:
+        reserve(db, [{"bill_id": bill_id, "medicine_id": medicine_id, "quantity": quantity}])
+    db.add(AuditLog(
+        pharmacist_id=pharmacist_id,
+        action="BILL_ITEM_ADDED",
+        resource_type="BILL",
+        resource_id=bill_id,
+        changes={"medicine_id": medicine_id, "quantity": quantity}
+    ))
+    return {
+        "item": {
+            "medicine_id": medicine_id,
+            "generic_name": medicine.generic_name,
+            "strength": medicine.strength,
+            "quantity_prescribed": quantity,
+            "unit_price": float(medicine.unit_price),
+            "line_total": line_total,
+            "gst_amount": gst_amount,
+            "item_total": line_total + gst_amount,
+            "current_stock": medicine.current_stock,
+            "reserved_stock": reserved_stock,
+            "available_stock": available_stock,
+            "stock_available": stock_available,
+            "stock_reserved": stock_available and reservations_enabled(),
+        },
+        "subtotal": float(updated.subtotal),
+        "total_gst": float(updated.total_gst),
+        "final_amount": float(updated.final_amount),
+    }
+
+
+def cancel_pending_bill(db: Session, bill_id: str, pharmacist_id: str, reason: str = None) -> str:
+    """Cancel a PENDING bill and release its stock reservations. Returns the bill number; the caller commits."""
+    bill = db.execute(select(Bill.bill_number, Bill.status).where(Bill.id == bill_id)).first()
+    if not bill:
+        raise BillNotFound(bill_id)
+    cancelled = db.execute(
+        update(Bill)
+        .where(Bill.id == bill_id, Bill.status == "PENDING")
+        .values(status="CANCELLED")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not cancelled:
+        raise BillAlreadyProcessed(bill_id)
+    release(db, bill_id)
+    db.add(AuditLog(
+        pharmacist_id=pharmacist_id,
+        action="BILL_CANCELLED",
+        resource_type="BILL",
+        resource_id=bill_id,
+        changes={"status": "CANCELLED", "reason": reason}
+    ))
+    return bill.bill_number
+
+
+def confirm_pending_bills(db: Session, bill_ids: List[str], pharmacist_id: str, notes: str = None) -> List[dict]:
+    """
+    Confirm several PENDING bills in one transaction and a constant number of
+    statements. Bills are allocated stock in request order; a bill that is
+    missing, already processed or short of stock is reported and left
+    untouched, the rest are still confirmed. Stock decrements are aggregated
+    per medicine across all confirmed bills, ledger and audit rows are
+    bulk-inserted. Returns one result dict per distinct bill id; the caller
+    commits.
+    """
+    bill_ids = list(dict.fromkeys(bill_ids))
+    bills = {b.id: b for b in db.execute(select(Bill.id, Bill.bill_number, Bill.status).where(Bill.id.in_(bill_ids)))}
+    results = {}
+    for bill_id in bill_ids:
+        bill = bills.get(bill_id)
+        if not bill:
+            results[bill_id] = {"bill_id": bill_id, "status": "failed", "error": "Bill not found"}
+        elif bill.status != "PENDING":
+            results[bill_id] = {"bill_id": bill_id, "bill_number": bill.bill_number, "status": "failed",
+                                "error": "Bill already processed"}
+
+    # Claim every candidate at once (also the first write, i.e. SQLite's write lock);
+    # RETURNING tells us which ones a concurrent confirmation didn't get to first
+    candidates = [bill_id for bill_id in bill_ids if bill_id not in results]
+    claimed = set()
+    if candidates:
+        claimed = set(db.execute(
+            update(Bill)
+            .where(Bill.id.in_(candidates), Bill.status == "PENDING")
+            .values(status="CONFIRMED", confirmed_by=pharmacist_id, confirmation_notes=notes)
+            .returning(Bill.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+    for bill_id in candidates:
+        if bill_id not in claimed:
+            results[bill_id] = {"bill_id": bill_id, "bill_number": bills[bill_id].bill_number, "status": "failed",
+                                "error": "Bill already processed"}
+
+    items_by_bill: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+    for item in db.execute(select(BillItem.bill_id, BillItem.medicine_id, BillItem.quantity)
+                           .where(BillItem.bill_id.in_(claimed))):
+        items_by_bill[item.bill_id].append((item.medicine_id, item.quantity))
+    stock = lock_stock(db, {mid for items in items_by_bill.values() for mid, _ in items}) if claimed else {}
+
+    # Allocate in request order against the locked stock levels
+    remaining = {mid: level for mid, (_, level) in stock.items()}
+    totals: Dict[str, int] = defaultdict(int)
+    ledger, audit, confirmed, rejected = [], [], [], []
+    for bill_id in candidates:
+        if bill_id not in claimed:
+            continue
+        quantities = aggregate_quantities(items_by_bill[bill_id])
+        short = [stock[mid][0] if mid in stock else mid
+                 for mid, qty in quantities.items() if remaining.get(mid, 0) < qty]
+        if short:
+            rejected.append(bill_id)
+            results[bill_id] = {"bill_id": bill_id, "bill_number": bills[bill_id].bill_number, "status": "failed",
+                                "error": str(InsufficientStock(short))}
+            continue
+        levels = {}
+        for mid, qty in quantities.items():
+            levels[mid] = (remaining[mid], remaining[mid] - qty)
+            remaining[mid] -= qty
+            totals[mid] += qty
+        ledger += ledger_rows(levels, quantities, bill_id, pharmacist_id)
+        audit.append({"pharmacist_id": pharmacist_id, "action": "BILL_CONFIRMED", "resource_type": "BILL",
+                      "resource_id": bill_id, "changes": {"status": "CONFIRMED", "bulk": True}})
+        confirmed.append(bill_id)
+        results[bill_id] = {"bill_id": bill_id, "bill_number": bills[bill_id].bill_number, "status": "confirmed"}
+
+    if rejected:
+        # Hand the bills we couldn't fill back to the queue
+        db.execute(
+            update(Bill)
+            .where(Bill.id.in_(rejected))
+            .values(status="PENDING", confirmed_by=None, confirmation_notes=None)
+            .execution_options(synchronize_session=False)
+        )
+    apply_decrements(db, dict(sorted(totals.items())))
+    if ledger:
+        db.execute(insert(InventoryTransaction), ledger)
+        stage_dispensed(db, (row["medicine_id"] for row in ledger))
+    if confirmed:
+        release_bills(db, confirmed)
+        db.execute(insert(AuditLog), audit)
+    return [results[bill_id] for bill_id in bill_ids]
@@ -0,0 +1,157 @@
+import io
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.models.all_models import ExtractionCacheEntry
+from app.services.gemini_service import EXTRACTION_VERSION
+
+
+def perceptual_hash(image_data: bytes) -> Optional[str]:
+    """64-bit difference hash (dHash); survives re-encoding, resizing and small exposure changes."""
+    try:
+        with Image.open(io.BytesIO(image_data)) as img:
+            small = img.convert("L").resize((9, 8), Image.LANCZOS)
+            pixels = list(small.getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class ExtractionCache:
+    """
+    Persistent cache of Gemini extractions, keyed by image content hash plus
+    EXTRACTION_VERSION so a prompt or model change never serves stale output.
+    Entries expire after EXTRACTION_CACHE_TTL_HOURS and the least recently used
+    are evicted beyond EXTRACTION_CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "phash_hits": self.phash_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def make_key(content_hash: str) -> str:
+        return f"{content_hash}:{EXTRACTION_VERSION}"
+
+    def _expiry_cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(hours=settings.EXTRACTION_CACHE_TTL_HOURS)
+
+    def get(self, db: Session, content_hash: str, phash: Optional[str] = None) -> Optional[ExtractionCacheEntry]:
+        cutoff = self._expiry_cutoff()
+        entry = db.get(ExtractionCacheEntry, self.make_key(content_hash))
+        if entry is not None and entry.created_at < cutoff:
+            entry = None
+
+        phash_hit = False
+        if entry is None and phash:
+            entry = self._nearest_by_phash(db, phash, cutoff)
+            phash_hit = entry is not None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if phash_hit:
+                self.phash_hits += 1
+
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_used_at = datetime.utcnow()
+        return entry
+
+    def _nearest_by_phash(self, db: Session, phash: str, cutoff: datetime) -> Optional[ExtractionCacheEntry]:
+        rows = (
+            db.query(ExtractionCacheEntry.cache_key, ExtractionCacheEntry.perceptual_hash)
+            .filter(
+                ExtractionCacheEntry.extraction_version == EXTRACTION_VERSION,
+                ExtractionCacheEntry.perceptual_hash.isnot(None),
+                ExtractionCacheEntry.created_at >= cutoff,
+            )
+            .all()
+        )
+        best_key, best_distance = None, settings.EXTRACTION_CACHE_PHASH_MAX_DISTANCE + 1
+        for cache_key, candidate in rows:
+            distance = hamming_distance(phash, candidate)
+            if distance < best_distance:
+                best_key, best_distance = cache_key, distance
+        return db.get(ExtractionCacheEntry, best_key) if best_key else None
+
+    def put(self, db: Session, content_hash: str, extraction: dict,
+            prescription_id: Optional[str] = None, phash: Optional[str] = None):
+        db.merge(ExtractionCacheEntry(
+            cache_key=self.make_key(content_hash),
+            content_hash=content_hash,
+            extraction_version=EXTRACTION_VERSION,
+            perceptual_hash=phash,
+            prescription_id=prescription_id,
+            gemini_extraction_response=extraction,
+            hit_count=0,
+            created_at=datetime.utcnow(),
+            last_used_at=datetime.utcnow(),
+        ))
+        db.flush()
+        self.evict(db)
+
+    def evict(self, db: Session):
+        removed = (
+            db.query(ExtractionCacheEntry)
+            .filter(ExtractionCacheEntry.created_at < self._expiry_cutoff())
+            .delete(synchronize_session=False)
+        )
+        overflow = db.query(ExtractionCacheEntry).count() - settings.EXTRACTION_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            stale_keys = [
+                key for (key,) in db.query(ExtractionCacheEntry.cache_key)
+                .order_by(ExtractionCacheEntry.last_used_at.asc())
+                .limit(overflow)
+            ]
+            removed += (
+                db.query(ExtractionCacheEntry)
+                .filter(ExtractionCacheEntry.cache_key.in_(stale_keys))
+                .delete(synchronize_session=False)
+            )
+        if removed:
+            with self._lock:
+                self.evictions += removed
+
+
+extraction_cache = ExtractionCache()
+
+registry.callback("medease_extraction_cache_hits_total", "Extraction cache hits (incl. near-duplicates)",
+                  lambda: extraction_cache.hits, kind="counter")
+registry.callback("medease_extraction_cache_phash_hits_total", "Extraction cache near-duplicate hits",
+                  lambda: extraction_cache.phash_hits, kind="counter")
+registry.callback("medease_extraction_cache_misses_total", "Extraction cache misses",
+                  lambda: extraction_cache.misses, kind="counter")
+registry.callback("medease_extraction_cache_evictions_total", "Extraction cache entries evicted",
+                  lambda: extraction_cache.evictions, kind="counter")
@@ -0,0 +1,151 @@
+import json
+import re
+from typing import Any, List, Optional, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.schemas.schemas import (
+    ClinicalAnalysis,
+    ExtractionQuality,
+    GeminiResponse,
+    MedicineExtraction,
+    PrescriptionMetadata,
+)
+
+# Built once: validating through a prebuilt adapter skips per-call schema setup
+GEMINI_RESPONSE_ADAPTER = TypeAdapter(GeminiResponse)
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+_SECTION = r'"{}"\s*:\s*'
+_DIGITS = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def error_extraction(message: str) -> GeminiResponse:
+    """The empty, unreadable extraction returned when nothing usable came back."""
+    return GeminiResponse(
+        prescription_metadata=PrescriptionMetadata(),
+        medicines=[],
+        extraction_quality=ExtractionQuality(is_readable=False, error=message),
+    )
+
+
+def parse_gemini_text(text: str) -> GeminiResponse:
+    """
+    Validate the model's JSON output in one pass; if that fails, fall back to
+    recovering whatever sections and medicines are individually valid.
+    """
+    try:
+        return GEMINI_RESPONSE_ADAPTER.validate_json(text)
+    except ValidationError:
+        pass
+
+    cleaned = _FENCE.sub("", text).strip()
+    data = _loads_outer_object(cleaned)
+    if data is not None:
+        return parse_gemini_data(data)
+    return _recover_truncated(cleaned)
+
+
+def parse_gemini_data(data: Any) -> GeminiResponse:
+    """Validate an already-decoded extraction (e.g. from the cache), tolerating bad parts."""
+    try:
+        return GEMINI_RESPONSE_ADAPTER.validate_python(data)
+    except ValidationError:
+        pass
+    if not isinstance(data, dict):
+        return error_extraction("Extraction is not a JSON object")
+
+    medicines = data.get("medicines") if isinstance(data.get("medicines"), list) else []
+    recovered = [m for m in (_lenient(MedicineExtraction, _fill_generic(item)) for item in medicines) if m]
+    quality = _lenient(ExtractionQuality, data.get("extraction_quality")) or ExtractionQuality(is_readable=bool(recovered))
+    if len(recovered) < len(medicines):
+        quality.missing_fields = list(quality.missing_fields) + [
+            f"{len(medicines) - len(recovered)} medicine(s) could not be parsed"
+        ]
+    return GeminiResponse(
+        prescription_metadata=_lenient(PrescriptionMetadata, data.get("prescription_metadata")) or PrescriptionMetadata(),
+        clinical_analysis=_lenient(ClinicalAnalysis, data.get("clinical_analysis")),
+        medicines=recovered,
+        extraction_quality=quality,
+    )
+
+
+def _loads_outer_object(text: str) -> Optional[Any]:
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+
+
+def _recover_truncated(text: str) -> GeminiResponse:
+    # Output cut off mid-JSON: salvage every complete section / medicine object
+    decoder = json.JSONDecoder()
+    data = {}
+    for section in ("prescription_metadata", "clinical_analysis", "extraction_quality"):
+        match = re.search(_SECTION.format(section), text)
+        if match:
+            try:
+                data[section], _ = decoder.raw_decode(text, match.end())
+            except ValueError:
+                pass
+
+    medicines: List[Any] = []
+    match = re.search(_SECTION.format("medicines") + r"\[", text)
+    if match:
+        pos = match.end()
+        while True:
+            while pos < len(text) and text[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(text) or text[pos] == "]":
+                break
+            try:
+                item, pos = decoder.raw_decode(text, pos)
+            except ValueError:
+                break
+            medicines.append(item)
+    data["medicines"] = medicines
+
+    if not medicines and not data.get("prescription_metadata"):
+        return error_extraction("Could not parse Gemini response")
+    if "extraction_quality" not in data:
+        data["extraction_quality"] = {"is_readable": True, "missing_fields": ["response truncated"]}
+    return parse_gemini_data(data)
+
+
+def _fill_generic(item: Any) -> Any:
+    # A medicine with only a brand is still worth matching
+    if isinstance(item, dict) and not item.get("generic_name") and item.get("brand_name"):
+        return dict(item, generic_name=item["brand_name"])
+    return item
+
+
+def _lenient(model: Type[BaseModel], data: Any) -> Optional[BaseModel]:
+    """Validate `data`, coercing numeric strings ("2 strips") and dropping fields that still fail."""
+    if not isinstance(data, dict):
+        return None
+    data = dict(data)
+    for _ in range(2):
+        try:
+            return model.model_validate(data)
+        except ValidationError as e:
+            for error in e.errors():
+                field = error["loc"][0] if error["loc"] else None
+                if field not in data:
+                    continue
+                value = data[field]
+                number = _DIGITS.search(value) if isinstance(value, str) else None
+                if number and error["type"].startswith(("int", "float")):
+                    data[field] = number.group() if error["type"].startswith("float") else number.group().split(".")[0]
+                else:
+                    del data[field]
+    try:
+        return model.model_validate(data)
+    except ValidationError:
+        return None
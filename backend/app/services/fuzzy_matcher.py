@@ -0,0 +1,129 @@
+import re
+import threading
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+class FuzzyCandidate(NamedTuple):
+    medicine_id: str
+    name: str
+    kind: str  # "generic" or "brand"
+    score: float
+
+
+def fuzzy_key(name: Optional[str]) -> str:
+    # "Dolo-650" / "dolo 650" / " DOLO 650 " all collapse to "dolo 650"
+    return _NON_ALNUM.sub(" ", (name or "").lower()).strip()
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"${key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramMatcher:
+    """
+    Approximate name matcher over a trigram inverted index.
+
+    Candidates are gathered from the posting lists of the query's trigrams,
+    rarest first, until `posting_budget` postings have been read. Only the
+    `rescore_limit` candidates sharing the most trigrams get the (slower)
+    edit-based similarity, so lookup cost stays bounded as the catalog grows.
+    """
+
+    def __init__(self, posting_budget: int = 20000, rescore_limit: int = 40):
+        self.posting_budget = posting_budget
+        self.rescore_limit = rescore_limit
+        self._lock = threading.RLock()
+        self._names: Dict[str, Tuple[str, Set[Tuple[str, str]]]] = {}  # key -> (display name, {(medicine_id, kind)})
+        self._postings: Dict[str, Set[str]] = {}  # trigram -> {key}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def clear(self):
+        with self._lock:
+            self._names.clear()
+            self._postings.clear()
+
+    def add(self, medicine_id: str, name: str, kind: str):
+        key = fuzzy_key(name)
+        if not key:
+            return
+        with self._lock:
+            entry = self._names.get(key)
+            if entry is None:
+                entry = (name, set())
+                self._names[key] = entry
+                for gram in trigrams(key):
+                    self._postings.setdefault(gram, set()).add(key)
+            entry[1].add((medicine_id, kind))
+
+    def remove(self, medicine_id: str, name: str, kind: str):
+        key = fuzzy_key(name)
+        with self._lock:
+            entry = self._names.get(key)
+            if entry is None:
+                return
+            entry[1].discard((medicine_id, kind))
+            if entry[1]:
+                return
+            del self._names[key]
+            for gram in trigrams(key):
+                keys = self._postings.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._postings[gram]
+
+    def search(self, query: Optional[str], limit: int = 5, min_score: float = 0.0) -> List[FuzzyCandidate]:
+        """Ranked candidates for `query`, best first, at most one per medicine."""
+        key = fuzzy_key(query)
+        if not key:
+            return []
+
+        with self._lock:
+            exact = self._names.get(key)
+            if exact is not None:
+                return self._expand([(1.0, key)], limit)
+
+            grams = sorted(
+                (g for g in trigrams(key) if g in self._postings),
+                key=lambda g: len(self._postings[g]),
+            )
+            overlap: Counter = Counter()
+            budget = self.posting_budget
+            for gram in grams:
+                keys = self._postings[gram]
+                if len(keys) > budget and overlap:
+                    break
+                overlap.update(keys)
+                budget -= len(keys)
+
+            scored = []
+            matcher = SequenceMatcher(autojunk=False)
+            matcher.set_seq2(key)
+            for candidate_key, _ in overlap.most_common(self.rescore_limit):
+                matcher.set_seq1(candidate_key)
+                score = matcher.ratio()
+                if score >= min_score:
+                    scored.append((score, candidate_key))
+            scored.sort(reverse=True)
+            return self._expand(scored, limit)
+
+    def _expand(self, scored: List[Tuple[float, str]], limit: int) -> List[FuzzyCandidate]:
+        results: List[FuzzyCandidate] = []
+        seen = set()
+        for score, key in scored:
+            name, refs = self._names[key]
+            for medicine_id, kind in sorted(refs):
+                if medicine_id in seen:
+                    continue
+                seen.add(medicine_id)
+                results.append(FuzzyCandidate(medicine_id, name, kind, round(score, 4)))
+                if len(results) >= limit:
+                    return results
+        return results
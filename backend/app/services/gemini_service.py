@@ -1,11 +1,52 @@
 import google.generativeai as genai
-import json
-import base64
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Optional
+from google.api_core import exceptions as api_exceptions
+from google.auth import exceptions as auth_exceptions
 from app.core.config import settings
+from app.core.metrics import registry
+from app.schemas.schemas import GeminiResponse
+from app.services.extraction_parser import error_extraction, parse_gemini_text
+from app.services.image_preprocessing import preprocess_image, preprocessing_signature
+from app.services.resilience import CircuitBreaker, CircuitOpenError, RateLimitExceeded, TokenBucket, backoff_delay
 
-# Configure Gemini
-genai.configure(api_key=settings.GOOGLE_API_KEY)
+logger = logging.getLogger(__name__)
+
+GEMINI_CALLS = registry.counter("medease_gemini_calls_total", "Gemini generate_content attempts by outcome", ("outcome",))
+
+# HTTP-style status codes worth retrying: quota, server errors, upstream timeouts
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Errors that mean no answer came back: DNS failures, refused or reset connections and
+# socket timeouts (requests' ConnectionError and Timeout are OSErrors too), failed
+# credential refreshes, and api_core giving up after its own retries
+TRANSPORT_ERRORS = (OSError, asyncio.TimeoutError, auth_exceptions.TransportError, api_exceptions.RetryError)
+
+class GeminiUnavailableError(Exception):
+    """Gemini is rate limited or unhealthy; callers should answer 503, not build a bill."""
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def build_generation_config() -> dict:
+    # Structured JSON mode: no markdown fences or prose around the object
+    config = {"response_mime_type": "application/json"}
+    if settings.GEMINI_TEMPERATURE is not None:
+        config["temperature"] = settings.GEMINI_TEMPERATURE
+    if settings.GEMINI_MAX_OUTPUT_TOKENS is not None:
+        config["max_output_tokens"] = settings.GEMINI_MAX_OUTPUT_TOKENS
+    return config
+
+# 'gemini-flash-latest' maps to the current stable Flash model.
+# If calls fail with 429, billing must be enabled on the Google Cloud Project.
+MODEL_NAME = settings.GEMINI_MODEL_NAME
+GENERATION_CONFIG = build_generation_config()
 
 VISION_PROMPT = """
 You are a pharmaceutical data extraction specialist. Analyze this prescription image and extract ALL medicines, dosages, frequencies, and patient details. Return ONLY valid JSON.
@@ -53,45 +94,231 @@ You are a pharmaceutical data extraction specialist. Analyze this prescription i
     }
     """
 
-async def extract_medicines_from_prescription(image_path: str) -> dict:
-    try:
-        # Using generic alias 'gemini-flash-latest' which maps to the current stable Flash model
-        # If this fails with 429, the user MUST enable billing on their Google Cloud Project.
-        model = genai.GenerativeModel('gemini-flash-latest') 
-        
-        print(f"Processing image: {image_path}")
+# Identifies the prompt + model (+ image pre-processing) an extraction came
+# from; cached extractions are only reused for the same version
+EXTRACTION_VERSION = hashlib.sha256(
+    f"{MODEL_NAME}\n{GENERATION_CONFIG}\n{preprocessing_signature()}\n{VISION_PROMPT}".encode()
+).hexdigest()[:16]
+
+# Smallest useful request: opens the connection and exercises JSON mode
+WARMUP_PROMPT = 'Reply with the JSON object {"ok": true}.'
+
+def _read_image(image_path: str) -> bytes:
+    if not Path(image_path).exists():
+         raise FileNotFoundError(f"Image not found at {image_path}")
+         
+    with open(image_path, "rb") as f:
+        return f.read()
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, TRANSPORT_ERRORS):
+        return True
+    # google.api_core exceptions (ResourceExhausted, ServiceUnavailable, ...) carry .code
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS_CODES
+
+def _upstream_answered(error: Exception) -> bool:
+    # Only errors carrying the HTTP status Gemini replied with prove it is up
+    return isinstance(getattr(error, "code", None), int)
+
+class GeminiExtractionClient:
+    """
+    Long-lived Gemini client, started and stopped by the app lifespan.
+
+    The SDK is configured and the model built once, so every scan reuses the
+    same transport. The client also owns the call executor, the concurrency
+    cap, the rate limiter and the circuit breaker.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, generation_config: Optional[dict] = None):
+        self.model_name = model_name
+        self.generation_config = generation_config or GENERATION_CONFIG
+        # Shared quota guard and health tracking for every call from this process
+        self.rate_limiter = TokenBucket(settings.GEMINI_RATE_LIMIT_PER_MINUTE / 60.0, settings.GEMINI_RATE_LIMIT_BURST)
+        self.circuit_breaker = CircuitBreaker(settings.GEMINI_BREAKER_FAILURE_THRESHOLD, settings.GEMINI_BREAKER_RESET_SECONDS)
+        # The SDK call is synchronous, so it runs on a dedicated pool sized to the
+        # concurrency cap; the semaphore keeps excess scans waiting on the event loop
+        # instead of piling up inside the executor.
+        self._semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._prompt_part = {"text": VISION_PROMPT}
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    genai.configure(api_key=settings.GOOGLE_API_KEY)
+                    self._model = genai.GenerativeModel(self.model_name, generation_config=self.generation_config)
+        return self._model
+
+    def set_model(self, model):
+        """Swap the extraction model, e.g. for a local fake in benchmarks."""
+        self._model = model
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=settings.GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+            return self._executor
+
+    async def start(self, warm_up: Optional[bool] = None):
+        # Build everything now rather than inside the first scan
+        self.model
+        self.executor
+        if settings.GEMINI_WARMUP if warm_up is None else warm_up:
+            await self.warm_up()
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    async def warm_up(self) -> bool:
+        """One tiny request; failures are logged and ignored so startup never blocks on Gemini."""
+        timeout = settings.GEMINI_WARMUP_TIMEOUT_SECONDS
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(
+                loop.run_in_executor(self.executor, self._call, [{"text": WARMUP_PROMPT}], timeout),
+                timeout=timeout,
+            )
+        except Exception as e:
+            logger.warning("Gemini warm-up failed, continuing without it: %r", e)
+            return False
+        logger.info("Gemini warm-up finished in %.0f ms", (time.perf_counter() - started) * 1000)
+        return True
+
+    def _call(self, parts: list, timeout: float):
+        # Runs on the Gemini executor: the blocking SDK call
+        return self.model.generate_content(parts, request_options={"timeout": timeout})
+
+    async def _generate_with_retries(self, image_data: bytes):
+        """
+        One Gemini round trip through the circuit breaker and rate limiter, retried
+        with jittered exponential backoff while GEMINI_REQUEST_DEADLINE_SECONDS allows.
+        """
+        deadline = time.monotonic() + settings.GEMINI_REQUEST_DEADLINE_SECONDS
+        last_error: Optional[Exception] = None
+        loop = asyncio.get_running_loop()
+        parts = [{"mime_type": "image/jpeg", "data": image_data}, self._prompt_part]
         
-        # Load image
-        if not Path(image_path).exists():
-             raise FileNotFoundError(f"Image not found at {image_path}")
-             
-        with open(image_path, "rb") as f:
-            image_data = f.read()
+        for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+            try:
+                async with self._semaphore:
+                    # Checked once a slot is free, so calls queued behind an outage fail fast.
+                    # The half-open trial is only claimed once the rate-limit token is in
+                    # hand, with nothing awaited in between
+                    try:
+                        self.circuit_breaker.check()
+                        await self.rate_limiter.acquire(deadline)
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            # Spent waiting for a slot; don't start a call that can't finish in time
+                            GEMINI_CALLS.inc(outcome="rejected")
+                            raise GeminiUnavailableError(
+                                "Gemini request deadline exhausted", retry_after=settings.GEMINI_RETRY_BASE_DELAY
+                            ) from last_error
+                        self.circuit_breaker.before_call()
+                    except (CircuitOpenError, RateLimitExceeded) as e:
+                        GEMINI_CALLS.inc(outcome="rejected")
+                        raise GeminiUnavailableError(str(e), retry_after=e.retry_after) from last_error
+                    try:
+                        response = await asyncio.wait_for(
+                            loop.run_in_executor(self.executor, self._call, parts, remaining),
+                            timeout=remaining,
+                        )
+                    except asyncio.CancelledError:
+                        self.circuit_breaker.abandon_trial()
+                        raise
+            except GeminiUnavailableError:
+                raise
+            except Exception as e:
+                if not _is_retryable(e):
+                    GEMINI_CALLS.inc(outcome="error")
+                    if _upstream_answered(e):
+                        # Upstream answered (e.g. bad request): not a health problem
+                        self.circuit_breaker.record_success()
+                    else:
+                        # No verdict on upstream health either way (e.g. a bug on our side)
+                        self.circuit_breaker.abandon_trial()
+                    raise
+                self.circuit_breaker.record_failure()
+                GEMINI_CALLS.inc(outcome="retryable_error")
+                last_error = e
+                delay = backoff_delay(attempt, settings.GEMINI_RETRY_BASE_DELAY, settings.GEMINI_RETRY_MAX_DELAY)
+                if attempt == settings.GEMINI_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    break
+                logger.warning("Gemini attempt %d failed (%r); retrying in %.2fs", attempt + 1, e, delay)
+                await asyncio.sleep(delay)
+                continue
+                
+            self.circuit_breaker.record_success()
+            GEMINI_CALLS.inc(outcome="ok")
+            return response
             
-        parts = [
-            {"mime_type": "image/jpeg", "data": image_data},
-            {"text": VISION_PROMPT}
-        ]
-        
-        print("Sending request to Gemini...")
-        response = model.generate_content(parts)
-        print(f"Gemini Raw Response: {response.text}")
-        
-        # Clean response text (remove markdown code blocks if any)
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        
-        return json.loads(text)
-        
+        raise GeminiUnavailableError(
+            f"Gemini unavailable after retries: {last_error!r}",
+            retry_after=settings.GEMINI_RETRY_MAX_DELAY,
+        ) from last_error
+
+    async def extract(self, image_data: bytes, timings: Optional[dict] = None) -> GeminiResponse:
+        """
+        Extract a validated GeminiResponse from prescription image bytes. Stage
+        durations (ms) are recorded into `timings` when given.
+        """
+        timings = timings if timings is not None else {}
+        try:
+            logger.debug("Processing image (%d bytes)", len(image_data))
+            
+            started = time.perf_counter()
+            image_data = await preprocess_image(image_data)
+            timings["preprocess_ms"] = (time.perf_counter() - started) * 1000
+            
+            logger.debug("Sending request to Gemini")
+            started = time.perf_counter()
+            response = await self._generate_with_retries(image_data)
+            timings["gemini_ms"] = (time.perf_counter() - started) * 1000
+            
+            # JSON mode output validated in one pass, with a tolerant fallback
+            started = time.perf_counter()
+            extraction = parse_gemini_text(response.text)
+            timings["parse_ms"] = (time.perf_counter() - started) * 1000
+            return extraction
+            
+        except GeminiUnavailableError:
+            # Surface upstream trouble instead of an empty extraction + empty bill
+            raise
+        except Exception as e:
+            logger.exception("Gemini extraction failed")
+            # Return a fallback/error structure
+            return error_extraction(str(e))
+
+extraction_client = GeminiExtractionClient()
+
+registry.callback("medease_gemini_circuit_open", "1 while the Gemini circuit breaker is open or half-open",
+                  lambda: int(extraction_client.circuit_breaker.state != CircuitBreaker.CLOSED))
+
+def get_model():
+    return extraction_client.model
+
+def set_model(model):
+    """Swap the extraction model, e.g. for a local fake in benchmarks."""
+    extraction_client.set_model(model)
+
+async def extract_medicines_from_image(image_data: bytes, timings: Optional[dict] = None) -> GeminiResponse:
+    return await extraction_client.extract(image_data, timings)
+
+async def extract_medicines_from_prescription(image_path: str, timings: Optional[dict] = None) -> GeminiResponse:
+    """Extraction for an image on local disk (scripts and benchmarks)."""
+    try:
+        image_data = await asyncio.to_thread(_read_image, image_path)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Gemini Extraction Error: {e}")
-        # Return a fallback/error structure
-        return {
-            "prescription_metadata": {},
-            "medicines": [],
-            "extraction_quality": {
-                "is_readable": False, 
-                "error": str(e)
-            }
-        }
+        logger.exception("Could not read %s", image_path)
+        return error_extraction(str(e))
+    return await extraction_client.extract(image_data, timings)
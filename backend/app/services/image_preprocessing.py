@@ -0,0 +1,97 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+# Pixels darker than this (after autocontrast) count as content when cropping margins
+_CONTENT_THRESHOLD = 200
+# Padding kept around the detected content, as a fraction of the image size
+_CROP_PADDING = 0.02
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+logger = logging.getLogger(__name__)
+
+
+def preprocess_image_bytes(data: bytes, max_dimension: int, quality: int,
+                           grayscale: bool = True, crop_margins: bool = True) -> bytes:
+    """
+    Shrink a prescription photo before it is sent to Gemini: apply the EXIF
+    orientation, crop blank paper margins, optionally drop colour, downsample
+    so the longest side is at most `max_dimension` and re-encode as JPEG.
+
+    Pure function of its arguments so it can run in a worker process.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        img = ImageOps.exif_transpose(original)
+        img = img.convert("L") if grayscale else img.convert("RGB")
+
+        if crop_margins:
+            gray = img if img.mode == "L" else img.convert("L")
+            mask = ImageOps.autocontrast(gray).point(lambda p: 255 if p < _CONTENT_THRESHOLD else 0)
+            bbox = mask.getbbox()
+            if bbox:
+                pad_x = int(img.width * _CROP_PADDING)
+                pad_y = int(img.height * _CROP_PADDING)
+                img = img.crop((
+                    max(0, bbox[0] - pad_x),
+                    max(0, bbox[1] - pad_y),
+                    min(img.width, bbox[2] + pad_x),
+                    min(img.height, bbox[3] + pad_y),
+                ))
+
+        if max(img.size) > max_dimension:
+            img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue()
+
+
+def preprocessing_signature() -> str:
+    # Part of the extraction cache version: different settings, different input
+    if not settings.IMAGE_PREPROCESSING_ENABLED:
+        return "raw"
+    return (f"max{settings.IMAGE_MAX_DIMENSION}-q{settings.IMAGE_JPEG_QUALITY}"
+            f"-g{int(settings.IMAGE_GRAYSCALE)}-c{int(settings.IMAGE_CROP_MARGINS)}")
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PREPROCESS_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+async def preprocess_image(data: bytes) -> bytes:
+    """Run the pre-processing pipeline in the process pool; falls back to the original bytes."""
+    if not settings.IMAGE_PREPROCESSING_ENABLED:
+        return data
+    loop = asyncio.get_running_loop()
+    try:
+        processed = await loop.run_in_executor(
+            _get_pool(),
+            preprocess_image_bytes,
+            data,
+            settings.IMAGE_MAX_DIMENSION,
+            settings.IMAGE_JPEG_QUALITY,
+            settings.IMAGE_GRAYSCALE,
+            settings.IMAGE_CROP_MARGINS,
+        )
+    except Exception as e:
+        logger.warning("Image pre-processing failed, sending original: %s", e)
+        return data
+    # Never send something bigger than what was uploaded
+    return processed if len(processed) < len(data) else data
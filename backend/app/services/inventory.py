@@ -0,0 +1,243 @@
+"""
+Inventory listing: keyset pagination over (generic_name, id).
+
+Each page is one indexed range scan of `limit + 1` projected rows (the extra
+row only tells us whether there is a next page), so its cost doesn't depend
+on how deep into the catalog the cursor is or how big the catalog gets.
+
+A search instead returns the `limit` best matches from the full-text index
+(see search_index), ranked, without a cursor.
+
+Low-stock listings and counts read the partial index ix_medicines_low_stock
+(see the Medicine model), created at startup by ensure_low_stock_index().
+
+Serialized responses are cached per query and catalog version (see
+catalog_version) in inventory_response_cache.
+
+export_chunks() walks the whole (optionally filtered) catalog through a
+yield_per cursor for the streaming NDJSON/CSV export.
+"""
+import base64
+import csv
+import io
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Hashable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import String, cast, func, or_, select, tuple_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import registry
+from app.models.all_models import Medicine
+from app.services.reservations import reserved_quantities
+from app.services.search_index import apply_search
+
+# Only the columns the listing returns
+INVENTORY_COLUMNS = (
+    Medicine.id,
+    Medicine.generic_name,
+    Medicine.brand_names,
+    Medicine.strength,
+    Medicine.form,
+    Medicine.current_stock,
+    Medicine.min_stock_level,
+    Medicine.unit_price,
+)
+
+
+EXPORT_COLUMNS = INVENTORY_COLUMNS + (
+    Medicine.manufacturer,
+    Medicine.gst_rate,
+    Medicine.reorder_quantity,
+    Medicine.expiry_date,
+    Medicine.is_active,
+)
+
+EXPORT_FIELDS = [
+    "id", "generic_name", "brand_names", "strength", "form", "manufacturer", "current_stock", "reserved_stock",
+    "available_stock", "min_stock_level", "reorder_quantity", "unit_price", "gst_rate", "stock_value",
+    "expiry_date", "is_active", "stock_status",
+]
+
+# Must match the partial index predicate exactly for the planner to use it
+LOW_STOCK = Medicine.current_stock < Medicine.min_stock_level
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def ensure_low_stock_index(engine: Engine):
+    # create_all() only creates indexes along with new tables
+    for index in Medicine.__table__.indexes:
+        if index.name == "ix_medicines_low_stock":
+            index.create(bind=engine, checkfirst=True)
+
+
+def low_stock_count(db: Session) -> int:
+    return db.execute(select(func.count()).select_from(Medicine).where(LOW_STOCK)).scalar_one()
+
+
+def encode_cursor(generic_name: str, medicine_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([generic_name, medicine_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        generic_name, medicine_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+    if not isinstance(generic_name, str) or not isinstance(medicine_id, str):
+        raise InvalidCursor(cursor)
+    return generic_name, medicine_id
+
+
+def inventory_row(m, reserved: dict) -> dict:
+    held = reserved.get(m.id, 0)
+    return {
+        "id": m.id,
+        "generic_name": m.generic_name,
+        "brand_names": m.brand_names,
+        "strength": m.strength,
+        "form": m.form,
+        "current_stock": m.current_stock,
+        "reserved_stock": held,
+        "available_stock": max(0, m.current_stock - held),
+        "min_stock_level": m.min_stock_level,
+        "unit_price": float(m.unit_price),
+        "stock_status": "LOW" if m.current_stock < m.min_stock_level else "OK"
+    }
+
+
+def inventory_page(db: Session, limit: int, cursor: Optional[str] = None, search: Optional[str] = None,
+                   low_stock_only: bool = False) -> Tuple[List[dict], Optional[str]]:
+    """One page of the inventory ordered by name (or search rank). Returns (rows, next_cursor or None)."""
+    query = select(*INVENTORY_COLUMNS)
+    if low_stock_only:
+        query = query.where(LOW_STOCK)
+
+    if search:
+        searched = apply_search(query, search)
+        if searched is None:
+            # No search index on this database
+            search_term = f"%{search}%"
+            searched = query.where(or_(
+                Medicine.generic_name.ilike(search_term),
+                cast(Medicine.brand_names, String).ilike(search_term)
+            )).order_by(Medicine.generic_name, Medicine.id)
+        page = db.execute(searched.limit(limit)).all()
+        next_cursor = None
+    else:
+        if cursor:
+            query = query.where(tuple_(Medicine.generic_name, Medicine.id) > tuple_(*decode_cursor(cursor)))
+        rows = db.execute(query.order_by(Medicine.generic_name, Medicine.id).limit(limit + 1)).all()
+        page = rows[:limit]
+        next_cursor = encode_cursor(page[-1].generic_name, page[-1].id) if len(rows) > limit else None
+
+    # Units held by pending bills, for this page's medicines only
+    reserved = reserved_quantities(db, [m.id for m in page])
+    return [inventory_row(m, reserved) for m in page], next_cursor
+
+
+def export_row(m, reserved: dict) -> dict:
+    row = inventory_row(m, reserved)
+    row.update({
+        "manufacturer": m.manufacturer,
+        "reorder_quantity": m.reorder_quantity,
+        "gst_rate": float(m.gst_rate) if m.gst_rate is not None else None,
+        # Valuation at unit price, kept exact
+        "stock_value": str(m.unit_price * m.current_stock),
+        "expiry_date": m.expiry_date.isoformat() if m.expiry_date else None,
+        "is_active": m.is_active,
+    })
+    return row
+
+
+def export_chunks(db: Session, chunk_rows: int, low_stock_only: bool = False,
+                  expiring_within_days: Optional[int] = None, manufacturer: Optional[str] = None) -> Iterator[List[dict]]:
+    """
+    Yield the catalog (in name order) as lists of at most `chunk_rows` export
+    rows. Rows come from a yield_per cursor (server-side on Postgres), so
+    memory is bounded by the chunk size, not the catalog size.
+    """
+    query = select(*EXPORT_COLUMNS)
+    if low_stock_only:
+        query = query.where(LOW_STOCK)
+    if expiring_within_days is not None:
+        query = query.where(Medicine.expiry_date <= datetime.utcnow() + timedelta(days=expiring_within_days))
+    if manufacturer:
+        query = query.where(func.lower(Medicine.manufacturer) == manufacturer.lower())
+    result = db.execute(query.order_by(Medicine.generic_name, Medicine.id).execution_options(yield_per=chunk_rows))
+    for partition in result.partitions():
+        reserved = reserved_quantities(db, [m.id for m in partition])
+        yield [export_row(m, reserved) for m in partition]
+
+
+def ndjson_lines(chunks: Iterator[List[dict]]) -> Iterator[str]:
+    for rows in chunks:
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def csv_lines(chunks: Iterator[List[dict]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for rows in chunks:
+        for row in rows:
+            writer.writerow(dict(row, brand_names="; ".join(row["brand_names"] or [])))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class ResponseCache:
+    """
+    Serialized responses keyed by (catalog version, query). A new version
+    simply misses; entries for old versions age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, Hashable], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version: int, query: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get((version, query))
+            if body is not None:
+                self._entries.move_to_end((version, query))
+            return body
+
+    def put(self, version: int, query: Hashable, body: bytes):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[(version, query)] = body
+            self._entries.move_to_end((version, query))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+inventory_response_cache = ResponseCache(settings.INVENTORY_CACHE_ENTRIES)
+
+INVENTORY_RESPONSES = registry.counter("medease_inventory_responses_total",
+                                       "GET /inventory responses by cache outcome", ("outcome",))
+
+
+def _scrape_low_stock_count() -> int:
+    with SessionLocal() as db:
+        return low_stock_count(db)
+
+
+registry.callback("medease_low_stock_medicines", "Medicines below their minimum stock level", _scrape_low_stock_count)
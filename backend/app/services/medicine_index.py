@@ -0,0 +1,215 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.all_models import Medicine
+from app.services.fuzzy_matcher import FuzzyCandidate, TrigramMatcher
+
+# Session.info key holding catalog changes that are waiting for their commit
+_PENDING_KEY = "medicine_index_pending"
+
+
+def normalize_name(name: Optional[str]) -> str:
+    # Same normalization the original scan loop applied to both sides
+    return (name or "").strip().lower()
+
+
+def parse_brand_names(brand_names) -> List[str]:
+    # brand_names is a JSON list, but older rows may hold a raw string
+    if isinstance(brand_names, list):
+        return [b for b in brand_names if isinstance(b, str)]
+    if isinstance(brand_names, str):
+        try:
+            parsed = json.loads(brand_names)
+            if isinstance(parsed, list):
+                return [b for b in parsed if isinstance(b, str)]
+        except ValueError:
+            pass
+        return [brand_names]
+    return []
+
+
+class MedicineIndex:
+    """
+    In-memory lookup of normalized generic/brand names -> medicine ids.
+
+    Every medicine keeps the ordinal it had in catalog order, so when several
+    medicines match an extracted line the earliest one wins, exactly like the
+    old linear scan over `db.query(Medicine).all()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._built_at: Optional[float] = None
+        self._next_ordinal = 0
+        self._entries: Dict[str, Tuple[int, str, List[str]]] = {}  # id -> (ordinal, generic, brands)
+        self._by_generic: Dict[str, set] = {}
+        self._by_brand: Dict[str, set] = {}
+        self._fuzzy = TrigramMatcher()
+
+    @property
+    def is_built(self) -> bool:
+        return self._built_at is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def build(self, db: Session):
+        rows = db.query(Medicine.id, Medicine.generic_name, Medicine.brand_names).all()
+        with self._lock:
+            self._entries.clear()
+            self._by_generic.clear()
+            self._by_brand.clear()
+            self._fuzzy.clear()
+            self._next_ordinal = 0
+            for med_id, generic_name, brand_names in rows:
+                self._add(med_id, generic_name, parse_brand_names(brand_names))
+            self._built_at = time.monotonic()
+
+    @property
+    def needs_build(self) -> bool:
+        ttl = settings.CATALOG_INDEX_TTL_SECONDS
+        return self._built_at is None or bool(ttl and time.monotonic() - self._built_at > ttl)
+
+    def ensure_built(self, db: Session):
+        if self.needs_build:
+            # One build at a time; callers that waited find it fresh
+            with self._build_lock:
+                if self.needs_build:
+                    self.build(db)
+
+    def invalidate(self):
+        # Next ensure_built() rebuilds from the database (use after bulk SQL writes)
+        with self._lock:
+            self._built_at = None
+
+    def upsert(self, med_id: str, generic_name: str, brand_names: List[str]):
+        with self._lock:
+            if not self.is_built:
+                return
+            ordinal = None
+            if med_id in self._entries:
+                ordinal = self._entries[med_id][0]
+                self._remove(med_id)
+            self._add(med_id, generic_name, brand_names, ordinal)
+
+    def remove(self, med_id: str):
+        with self._lock:
+            if self.is_built and med_id in self._entries:
+                self._remove(med_id)
+
+    def match(self, generic_name: Optional[str], brand_name: Optional[str]) -> Optional[str]:
+        """
+        Return the id of the first catalog medicine where any of these hold:
+        extracted generic == generic, extracted generic in brands,
+        extracted brand in brands, extracted brand == generic.
+        """
+        extracted_generic = normalize_name(generic_name)
+        extracted_brand = normalize_name(brand_name)
+
+        with self._lock:
+            candidates = set()
+            candidates |= self._by_generic.get(extracted_generic, set())
+            # Extracted generic matching a DB brand is a common AI error
+            candidates |= self._by_brand.get(extracted_generic, set())
+            if extracted_brand:
+                candidates |= self._by_brand.get(extracted_brand, set())
+                candidates |= self._by_generic.get(extracted_brand, set())
+
+            best_id, best_ordinal = None, None
+            for med_id in candidates:
+                entry = self._entries.get(med_id)
+                if entry and (best_ordinal is None or entry[0] < best_ordinal):
+                    best_id, best_ordinal = med_id, entry[0]
+            return best_id
+
+    def fuzzy_match(self, generic_name: Optional[str], brand_name: Optional[str], limit: int = 5,
+                    min_score: float = 0.0) -> List[FuzzyCandidate]:
+        """
+        Approximate candidates for an extracted line that had no exact match,
+        merged across the generic and brand spellings and ranked by score.
+        """
+        best: Dict[str, FuzzyCandidate] = {}
+        for query in (generic_name, brand_name):
+            for candidate in self._fuzzy.search(query, limit=limit, min_score=min_score):
+                current = best.get(candidate.medicine_id)
+                if current is None or candidate.score > current.score:
+                    best[candidate.medicine_id] = candidate
+        ranked = sorted(best.values(), key=lambda c: (-c.score, self._entries.get(c.medicine_id, (0,))[0]))
+        return ranked[:limit]
+
+    # --- internals (call with the lock held) ---
+    def _add(self, med_id: str, generic_name: str, brand_names: List[str], ordinal: Optional[int] = None):
+        if ordinal is None:
+            ordinal = self._next_ordinal
+            self._next_ordinal += 1
+        self._entries[med_id] = (ordinal, generic_name, brand_names)
+        self._by_generic.setdefault(generic_name.lower(), set()).add(med_id)
+        self._fuzzy.add(med_id, generic_name, "generic")
+        for brand in brand_names:
+            self._by_brand.setdefault(brand.lower(), set()).add(med_id)
+            self._fuzzy.add(med_id, brand, "brand")
+
+    def _remove(self, med_id: str):
+        _, generic_name, brand_names = self._entries.pop(med_id)
+        keys = [(self._by_generic, generic_name.lower())] + [(self._by_brand, b.lower()) for b in brand_names]
+        for mapping, key in keys:
+            ids = mapping.get(key)
+            if ids is not None:
+                ids.discard(med_id)
+                if not ids:
+                    del mapping[key]
+        self._fuzzy.remove(med_id, generic_name, "generic")
+        for brand in brand_names:
+            self._fuzzy.remove(med_id, brand, "brand")
+
+
+medicine_index = MedicineIndex()
+
+
+# --- Keep the index in sync with committed Medicine writes ---
+def _stage(target: Medicine, entry):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, {})[target.id] = entry
+
+
+@event.listens_for(Medicine, "after_insert")
+def _medicine_inserted(mapper, connection, target):
+    _stage(target, (target.generic_name, parse_brand_names(target.brand_names)))
+
+
+@event.listens_for(Medicine, "after_update")
+def _medicine_updated(mapper, connection, target):
+    state = inspect(target)
+    # Stock-only updates (e.g. confirm_bill) don't touch the index
+    if state.attrs.generic_name.history.has_changes() or state.attrs.brand_names.history.has_changes():
+        _stage(target, (target.generic_name, parse_brand_names(target.brand_names)))
+
+
+@event.listens_for(Medicine, "after_delete")
+def _medicine_deleted(mapper, connection, target):
+    _stage(target, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for med_id, entry in pending.items():
+        if entry is None:
+            medicine_index.remove(med_id)
+        else:
+            medicine_index.upsert(med_id, *entry)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
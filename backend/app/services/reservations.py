@@ -0,0 +1,106 @@
+"""
+Soft stock reservations held by pending bills.
+
+A scan reserves the quantities it could price from stock, so the next scan
+(and /inventory) sees `available = current_stock - active reservations` and
+doesn't promise the same units twice. Reservations are soft: confirmation
+still checks physical stock. A reservation disappears when its bill is
+confirmed or cancelled, or once RESERVATION_TTL_MINUTES have passed.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.all_models import Bill, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+def reservations_enabled() -> bool:
+    return settings.RESERVATION_TTL_MINUTES > 0
+
+
+def reserved_quantities(db: Session, medicine_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Active reserved quantity per medicine (one grouped, index-only query)."""
+    if not reservations_enabled():
+        return {}
+    query = (
+        select(StockReservation.medicine_id, func.sum(StockReservation.quantity))
+        .where(StockReservation.expires_at > datetime.utcnow())
+        .group_by(StockReservation.medicine_id)
+    )
+    if medicine_ids is not None:
+        medicine_ids = list(medicine_ids)
+        if not medicine_ids:
+            return {}
+        query = query.where(StockReservation.medicine_id.in_(medicine_ids))
+    return {medicine_id: int(quantity) for medicine_id, quantity in db.execute(query)}
+
+
+def reserve(db: Session, rows: List[dict]):
+    """Bulk-insert reservation rows ({bill_id, medicine_id, quantity}) in the caller's transaction."""
+    if not rows or not reservations_enabled():
+        return
+    expires_at = datetime.utcnow() + timedelta(minutes=settings.RESERVATION_TTL_MINUTES)
+    db.execute(insert(StockReservation), [dict(row, expires_at=expires_at) for row in rows])
+
+
+def release(db: Session, bill_id: str):
+    db.execute(delete(StockReservation).where(StockReservation.bill_id == bill_id))
+
+
+def release_bills(db: Session, bill_ids: List[str]):
+    db.execute(delete(StockReservation).where(StockReservation.bill_id.in_(bill_ids)))
+
+
+def sweep_expired(db: Session) -> int:
+    """Delete expired reservations and any still held by bills that are no longer PENDING."""
+    expired = db.execute(delete(StockReservation).where(StockReservation.expires_at <= datetime.utcnow())).rowcount
+    settled = db.execute(
+        delete(StockReservation).where(
+            StockReservation.bill_id.in_(select(Bill.id).where(Bill.status != "PENDING"))
+        )
+    ).rowcount
+    db.commit()
+    return expired + settled
+
+
+class ReservationSweeper:
+    """Background task clearing released reservations every RESERVATION_SWEEP_INTERVAL_SECONDS."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if reservations_enabled() and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="stock-reservation-sweeper")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @staticmethod
+    def sweep_once() -> int:
+        with SessionLocal() as db:
+            return sweep_expired(db)
+
+    async def _run(self):
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.sweep_once)
+                if removed:
+                    logger.info("Released %d stock reservation(s)", removed)
+            except Exception:
+                logger.exception("Reservation sweep failed")
+            await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
+
+
+reservation_sweeper = ReservationSweeper()
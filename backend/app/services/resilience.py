@@ -0,0 +1,115 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit: next slot in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit open: upstream unhealthy, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Async token bucket shared by every caller in the process: `rate` tokens per
+    second, bursts of up to `capacity`. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, deadline: Optional[float] = None):
+        """Take one token, waiting for it unless that would overrun `deadline` (monotonic)."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    raise RateLimitExceeded(wait)
+                await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast for
+    `reset_timeout` seconds; then lets a single trial call through (half-open)
+    and closes again on its success.
+    """
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def check(self):
+        """Raise CircuitOpenError if a call would be rejected now, without claiming the half-open trial."""
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+        elif self.state == self.HALF_OPEN and self._trial_in_flight:
+            raise CircuitOpenError(self.reset_timeout)
+
+    def before_call(self):
+        """Admit a call (claiming the trial when half-open); follow with record_success/failure or abandon_trial."""
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError(self.reset_timeout)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def abandon_trial(self):
+        # The call ended without a verdict on upstream health (e.g. cancelled);
+        # let the next caller run the trial
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
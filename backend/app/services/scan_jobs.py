@@ -0,0 +1,398 @@
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Set
+from uuid import uuid4
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.metrics import registry
+from app.models.all_models import ScanJob
+from app.services.gemini_service import GeminiUnavailableError
+from app.services.resilience import backoff_delay
+from app.services.scan_pipeline import run_scan
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+COMPLETED = "COMPLETED"
+FAILED = "FAILED"
+TERMINAL_STATUSES = {COMPLETED, FAILED}
+
+_JOB_FIELDS = ("id", "status", "image_path", "content_hash", "result", "error", "attempts", "created_at", "updated_at")
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The job was reclaimed and claimed again while this worker was still running it."""
+
+
+# --- Job stores ---
+class JobStore(ABC):
+    """Persistence for scan jobs. Jobs are plain dicts with the ScanJob columns."""
+
+    @abstractmethod
+    def create(self, job: dict):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def claim(self, job_id: str) -> Optional[dict]:
+        """Atomically move a QUEUED job to RUNNING; None if someone else has it."""
+
+    @abstractmethod
+    def complete_with(self, db: Session, job: dict, result: dict) -> bool:
+        """
+        Mark `job` COMPLETED in `db`'s transaction, the one writing its bill,
+        if the store lives in that database; returns False if it doesn't and
+        the caller must record the result itself. Raises LeaseLost if the job
+        is no longer held by the claim `job` came from.
+        """
+
+    @abstractmethod
+    def unfinished(self) -> List[dict]:
+        ...
+
+    @abstractmethod
+    def reclaim_expired(self, cutoff: datetime) -> List[str]:
+        """Move RUNNING jobs not updated since cutoff back to QUEUED; returns their ids."""
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+
+    def create(self, job: dict):
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated_at=datetime.utcnow())
+
+    def claim(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] != QUEUED:
+                return None
+            job.update(status=RUNNING, attempts=job["attempts"] + 1, updated_at=datetime.utcnow())
+            return dict(job)
+
+    def complete_with(self, db: Session, job: dict, result: dict) -> bool:
+        return False
+
+    def unfinished(self) -> List[dict]:
+        with self._lock:
+            return [dict(j) for j in self._jobs.values() if j["status"] not in TERMINAL_STATUSES]
+
+    def reclaim_expired(self, cutoff: datetime) -> List[str]:
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j["status"] == RUNNING and j["updated_at"] < cutoff]
+            for job in expired:
+                job.update(status=QUEUED, updated_at=datetime.utcnow())
+            return [j["id"] for j in expired]
+
+
+class SqlJobStore(JobStore):
+    """Jobs in the scan_jobs table, so queued and in-flight work survives a restart."""
+
+    @staticmethod
+    def _to_dict(row: ScanJob) -> dict:
+        return {field: getattr(row, field) for field in _JOB_FIELDS}
+
+    def create(self, job: dict):
+        with SessionLocal() as db:
+            db.add(ScanJob(**job))
+            db.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with SessionLocal() as db:
+            row = db.get(ScanJob, job_id)
+            return self._to_dict(row) if row else None
+
+    def update(self, job_id: str, **fields):
+        with SessionLocal() as db:
+            db.query(ScanJob).filter(ScanJob.id == job_id).update(
+                dict(fields, updated_at=datetime.utcnow()), synchronize_session=False
+            )
+            db.commit()
+
+    def claim(self, job_id: str) -> Optional[dict]:
+        with SessionLocal() as db:
+            claimed = db.query(ScanJob).filter(ScanJob.id == job_id, ScanJob.status == QUEUED).update(
+                {"status": RUNNING, "attempts": ScanJob.attempts + 1, "updated_at": datetime.utcnow()},
+                synchronize_session=False,
+            )
+            db.commit()
+            if not claimed:
+                return None
+            return self._to_dict(db.get(ScanJob, job_id))
+
+    def complete_with(self, db: Session, job: dict, result: dict) -> bool:
+        # attempts is bumped by every claim, so it tells this run from a later one of the same job
+        completed = db.execute(
+            update(ScanJob)
+            .where(ScanJob.id == job["id"], ScanJob.status == RUNNING, ScanJob.attempts == job["attempts"])
+            .values(status=COMPLETED, result=result, error=None, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not completed:
+            raise LeaseLost(job["id"])
+        return True
+
+    def unfinished(self) -> List[dict]:
+        with SessionLocal() as db:
+            rows = (
+                db.query(ScanJob)
+                .filter(ScanJob.status.notin_(TERMINAL_STATUSES))
+                .order_by(ScanJob.created_at)
+                .all()
+            )
+            return [self._to_dict(r) for r in rows]
+
+    def reclaim_expired(self, cutoff: datetime) -> List[str]:
+        with SessionLocal() as db:
+            ids = db.execute(
+                update(ScanJob)
+                .where(ScanJob.status == RUNNING, ScanJob.updated_at < cutoff)
+                .values(status=QUEUED, updated_at=datetime.utcnow())
+                .returning(ScanJob.id)
+            ).scalars().all()
+            db.commit()
+            return list(ids)
+
+
+def create_job_store() -> JobStore:
+    if settings.SCAN_JOB_BACKEND == "memory":
+        return MemoryJobStore()
+    return SqlJobStore()
+
+
+# --- Queue + workers ---
+class ScanJobQueue:
+    """
+    In-process queue of scan jobs drained by SCAN_JOB_WORKERS asyncio workers.
+
+    The store is the source of truth: workers claim a job before running it and
+    keep its updated_at fresh while it runs. A job is marked COMPLETED in the
+    transaction that writes its bill, so a job whose bill exists is never run
+    again. start() queues the jobs left
+    QUEUED, and a reaper puts RUNNING jobs whose lease (SCAN_JOB_LEASE_SECONDS)
+    has expired back in the queue, so jobs held by a live worker in another
+    process are left alone (up to SCAN_JOB_MAX_ATTEMPTS runs). A run that finds
+    Gemini unavailable goes back to QUEUED and is retried after a backoff,
+    within the same attempt budget.
+    """
+
+    def __init__(self):
+        self.store: Optional[JobStore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+        self._retries: Set[asyncio.TimerHandle] = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self, store: Optional[JobStore] = None, workers: Optional[int] = None):
+        self.store = store or create_job_store()
+        self._queue = asyncio.Queue()
+        for job in await run_in_threadpool(self.store.unfinished):
+            if job["status"] == QUEUED:
+                self._queue.put_nowait(job["id"])
+        await self._reclaim_expired()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"scan-job-worker-{i}")
+            for i in range(workers or settings.SCAN_JOB_WORKERS)
+        ]
+        self._reaper = asyncio.create_task(self._reap(), name="scan-job-reaper")
+
+    async def stop(self):
+        # Jobs waiting out a backoff stay QUEUED in the store for the next start()
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        tasks = self._workers + ([self._reaper] if self._reaper else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+
+    async def submit(self, image_key: str, content_hash: str) -> dict:
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid4()),
+            "status": QUEUED,
+            "image_path": image_key,
+            "content_hash": content_hash,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await run_in_threadpool(self.store.create, job)
+        self._queue.put_nowait(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await run_in_threadpool(self.store.get, job_id)
+
+    async def events(self, job_id: str) -> AsyncIterator[dict]:
+        """
+        Yield job snapshots as the status changes, ending at a terminal status.
+        Jobs run by another process are picked up by re-reading the store
+        every SCAN_JOB_EVENT_POLL_SECONDS.
+        """
+        updates: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(job_id, set()).add(updates)
+        try:
+            job = await self.get(job_id)
+            last_status = None
+            while job is not None:
+                if job["status"] != last_status:
+                    last_status = job["status"]
+                    yield job
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+                try:
+                    job = await asyncio.wait_for(updates.get(), timeout=settings.SCAN_JOB_EVENT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    job = await self.get(job_id)
+        finally:
+            listeners = self._listeners.get(job_id)
+            if listeners is not None:
+                listeners.discard(updates)
+                if not listeners:
+                    del self._listeners[job_id]
+
+    def _publish(self, job: dict):
+        for listener in self._listeners.get(job["id"], ()):
+            listener.put_nowait(job)
+
+    async def _set(self, job: dict, **fields) -> dict:
+        await run_in_threadpool(self.store.update, job["id"], **fields)
+        job = dict(job, **fields, updated_at=datetime.utcnow())
+        self._publish(job)
+        return job
+
+    def _retry_later(self, job_id: str, delay: float):
+        def requeue():
+            self._retries.discard(handle)
+            self._queue.put_nowait(job_id)
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retries.add(handle)
+
+    async def _reclaim_expired(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.SCAN_JOB_LEASE_SECONDS)
+        for job_id in await run_in_threadpool(self.store.reclaim_expired, cutoff):
+            logger.warning("Scan job %s: lease expired while RUNNING; re-queueing", job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(settings.SCAN_JOB_LEASE_SECONDS / 2)
+            try:
+                await self._reclaim_expired()
+            except Exception:
+                logger.exception("Reclaiming expired scan jobs failed")
+
+    async def _heartbeat(self, job_id: str):
+        # Renews the lease; an unchanged row just gets a fresh updated_at
+        while True:
+            await asyncio.sleep(settings.SCAN_JOB_LEASE_SECONDS / 3)
+            try:
+                await run_in_threadpool(self.store.update, job_id)
+            except Exception:
+                logger.exception("Scan job %s: renewing the lease failed", job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Scan job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await run_in_threadpool(self.store.claim, job_id)
+        if job is None:
+            return
+        if job["attempts"] > settings.SCAN_JOB_MAX_ATTEMPTS:
+            await self._set(job, status=FAILED, error="Gave up after repeated interrupted attempts")
+            return
+        self._publish(job)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id), name=f"scan-job-heartbeat-{job_id}")
+        try:
+            await self._execute(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _execute(self, job: dict):
+        job_id = job["id"]
+        completed = {}
+
+        def complete(sync_db: Session, responses: List[dict]):
+            completed["result"] = jsonable_encoder(responses[0])
+            completed["stored"] = self.store.complete_with(sync_db, job, completed["result"])
+
+        async with AsyncSessionLocal() as db:
+            try:
+                await run_scan(db, job["image_path"], job["content_hash"], before_commit=complete)
+                if completed["stored"]:
+                    self._publish(dict(job, status=COMPLETED, result=completed["result"], error=None,
+                                       updated_at=datetime.utcnow()))
+                else:
+                    await self._set(job, status=COMPLETED, result=completed["result"], error=None)
+            except LeaseLost:
+                # Another worker owns the job now; our bill was rolled back with the transaction
+                await db.rollback()
+                logger.warning("Scan job %s was reclaimed while running; dropping this run", job_id)
+            except GeminiUnavailableError as e:
+                await db.rollback()
+                if job["attempts"] >= settings.SCAN_JOB_MAX_ATTEMPTS:
+                    logger.warning("Scan job %s failed: %s", job_id, e)
+                    await self._set(job, status=FAILED, error=str(e))
+                    return
+                delay = max(e.retry_after, backoff_delay(job["attempts"] - 1, settings.SCAN_JOB_RETRY_BASE_DELAY_SECONDS,
+                                                         settings.SCAN_JOB_RETRY_MAX_DELAY_SECONDS))
+                logger.info("Scan job %s: %s; retrying in %.1fs", job_id, e, delay)
+                await self._set(job, status=QUEUED, error=str(e))
+                self._retry_later(job_id, delay)
+            except Exception as e:
+                await db.rollback()
+                logger.warning("Scan job %s failed: %s", job_id, e)
+                await self._set(job, status=FAILED, error=str(e))
+
+
+scan_job_queue = ScanJobQueue()
+
+registry.callback("medease_scan_jobs_queued", "Scan jobs waiting for a worker in this process",
+                  lambda: scan_job_queue._queue.qsize() if scan_job_queue._queue else 0)
@@ -0,0 +1,387 @@
+import asyncio
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import observe_scan_timings
+from app.models.all_models import Medicine, Prescription, Bill, BillItem
+from app.schemas.schemas import GeminiResponse, MedicineExtraction
+from app.services.extraction_cache import extraction_cache, perceptual_hash
+from app.services.extraction_parser import parse_gemini_data
+from app.services.gemini_service import extract_medicines_from_image
+from app.services.medicine_index import medicine_index
+from app.services.reservations import reserve, reserved_quantities
+from app.services.storage import read_image
+
+def generate_bill_number():
+    # Simple bill number generation
+    year = datetime.now().year
+    count = uuid4().hex[:6].upper()
+    return f"BILL-{year}-{count}"
+
+def match_extracted_medicine(med_data: MedicineExtraction) -> dict:
+    # Only an exact name/brand hit is attached to the line. OCR-tolerant fuzzy
+    # hits can be a different drug or strength (Hydroxyzine/Thyroxine, Dolo
+    # 500/Dolo 650), so they are returned as candidates for the pharmacist to
+    # pick from (POST /bills/{bill_id}/items) and the line stays unbilled
+    generic_name = med_data.generic_name
+    brand_name = med_data.brand_name
+    
+    medicine_id = medicine_index.match(generic_name, brand_name)
+    if medicine_id:
+        return {"medicine_id": medicine_id, "match_type": "EXACT", "match_score": 1.0, "match_candidates": []}
+        
+    candidates = medicine_index.fuzzy_match(generic_name, brand_name, limit=settings.FUZZY_MATCH_MAX_CANDIDATES,
+                                            min_score=settings.FUZZY_MATCH_THRESHOLD)
+    return {
+        "medicine_id": None,
+        "match_type": "FUZZY" if candidates else None,
+        "match_score": candidates[0].score if candidates else None,
+        "match_candidates": [c._asdict() for c in candidates],
+    }
+
+async def load_extraction(db: AsyncSession, image_key: str, content_hash: str,
+                          db_lock: Optional[asyncio.Lock] = None) -> dict:
+    """
+    Reuse a cached extraction for the same (or a near-duplicate) image,
+    otherwise call Gemini. Returns the scan state the later steps build on.
+    `db_lock` serializes the cache lookup with other users of a shared session.
+    """
+    db_lock = db_lock or asyncio.Lock()
+    timings = {}
+    cached = None
+    prescription = None
+    phash = None
+    image_data = None
+    if settings.EXTRACTION_CACHE_ENABLED:
+        started = time.perf_counter()
+        if settings.EXTRACTION_CACHE_PHASH:
+            image_data = await read_image(image_key)
+            phash = await run_in_threadpool(perceptual_hash, image_data)
+        async with db_lock:
+            cached = await db.run_sync(extraction_cache.get, content_hash, phash)
+            if cached and cached.prescription_id:
+                prescription = await db.get(Prescription, cached.prescription_id)
+            # End the lookup's transaction (writing a hit's counter) so the
+            # pooled connection goes back before a miss waits on Gemini
+            await db.commit()
+        timings["cache_lookup_ms"] = (time.perf_counter() - started) * 1000
+    
+    if cached:
+        started = time.perf_counter()
+        extraction = parse_gemini_data(cached.gemini_extraction_response)
+        timings["parse_ms"] = (time.perf_counter() - started) * 1000
+    else:
+        if image_data is None:
+            started = time.perf_counter()
+            image_data = await read_image(image_key)
+            timings["image_read_ms"] = (time.perf_counter() - started) * 1000
+        extraction = await extract_medicines_from_image(image_data, timings)
+        
+    return {
+        "timings": timings,
+        "image_key": image_key,
+        "content_hash": content_hash,
+        "phash": phash,
+        "cached": cached is not None,
+        "prescription": prescription,
+        "extraction": extraction,
+    }
+
+def new_prescription(scan: dict) -> Prescription:
+    extraction: GeminiResponse = scan["extraction"]
+    return Prescription(
+        image_path=scan["image_key"],
+        gemini_extraction_response=extraction.model_dump(mode="json"),
+        extraction_confidence=extraction.prescription_metadata.overall_confidence or 0.0,
+        is_readable=extraction.extraction_quality.is_readable
+    )
+
+def should_cache(scan: dict) -> bool:
+    extraction_ok = not scan["extraction"].extraction_quality.error
+    return settings.EXTRACTION_CACHE_ENABLED and not scan["cached"] and extraction_ok
+
+def price_medicines(extracted_medicines: List[MedicineExtraction], matches: List[dict], medicines_by_id: Dict[str, Medicine],
+                    reserved: Optional[Dict[str, int]] = None) -> Tuple[List[dict], float]:
+    # `reserved` (medicine_id -> units held by pending bills) is updated with
+    # this bill's own reservations, so later scans in a batch see them too
+    reserved = reserved if reserved is not None else {}
+    medicines_with_pricing = []
+    bill_subtotal = 0.0
+    
+    for med_data, match in zip(extracted_medicines, matches):
+        matched_med = medicines_by_id.get(match["medicine_id"])
+        
+        # Helper to construct item dict
+        item = med_data.model_dump()
+        item["match_type"] = match["match_type"]
+        item["match_score"] = match["match_score"]
+        item["match_candidates"] = match["match_candidates"]
+        item["found_in_inventory"] = False
+        item["stock_available"] = False
+        item["unit_price"] = 0.0
+        item["line_total"] = 0.0
+        item["gst_amount"] = 0.0
+        item["item_total"] = 0.0
+        item["current_stock"] = 0
+        item["reserved_stock"] = 0
+        item["available_stock"] = 0
+        item["stock_reserved"] = False
+        
+        qty = int(med_data.quantity_prescribed or 1) # Default to 1 if None
+        item["quantity_prescribed"] = qty
+
+        if matched_med:
+            medicine = matched_med
+            item["medicine_id"] = medicine.id
+            item["found_in_inventory"] = True
+            item["current_stock"] = medicine.current_stock
+            item["reserved_stock"] = reserved.get(medicine.id, 0)
+            item["available_stock"] = max(0, medicine.current_stock - item["reserved_stock"])
+            item["stock_available"] = item["available_stock"] >= qty
+            if item["stock_available"]:
+                item["stock_reserved"] = True
+                reserved[medicine.id] = item["reserved_stock"] + qty
+            item["unit_price"] = float(medicine.unit_price)
+            
+            line_total = float(medicine.unit_price) * qty
+            gst_amount = line_total * (float(medicine.gst_rate) / 100.0)
+            
+            item["line_total"] = line_total
+            item["gst_amount"] = gst_amount
+            item["item_total"] = line_total + gst_amount
+            
+            bill_subtotal += line_total
+        
+        medicines_with_pricing.append(item)
+        
+    return medicines_with_pricing, bill_subtotal
+
+def match_scans(db: Session, scans: List[dict]):
+    """
+    Match every extracted line of every scan through the in-memory name index,
+    then load all matched medicines in a single query and price each scan.
+    """
+    started = time.perf_counter()
+    medicine_index.ensure_built(db)
+    for scan in scans:
+        scan["matches"] = [match_extracted_medicine(m) for m in scan["extraction"].medicines]
+        
+    wanted_ids = {m["medicine_id"] for scan in scans for m in scan["matches"] if m["medicine_id"]}
+    medicines_by_id = {}
+    reserved = {}
+    if wanted_ids:
+        medicines_by_id = {m.id: m for m in db.query(Medicine).filter(Medicine.id.in_(wanted_ids)).all()}
+        reserved = reserved_quantities(db, wanted_ids)
+        
+    for scan in scans:
+        medicines, subtotal = price_medicines(scan["extraction"].medicines, scan["matches"], medicines_by_id, reserved)
+        total_gst = sum(m["gst_amount"] for m in medicines)
+        scan["medicines"] = medicines
+        scan["subtotal"] = subtotal
+        scan["total_gst"] = total_gst
+        scan["final_amount"] = subtotal + total_gst
+        
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for scan in scans:
+        scan["timings"]["match_ms"] = elapsed_ms
+
+def new_bill(scan: dict, prescription_id: str) -> Bill:
+    metadata = scan["extraction"].prescription_metadata
+    return Bill(
+        bill_number=generate_bill_number(),
+        prescription_id=prescription_id,
+        patient_name=metadata.patient_name,
+        patient_age=metadata.patient_age,
+        subtotal=scan["subtotal"],
+        total_gst=scan["total_gst"],
+        final_amount=scan["final_amount"],
+        status="PENDING"
+    )
+
+def bill_item_rows(scan: dict, bill_id: str) -> List[dict]:
+    # Only exact matches FOUND in inventory become bill_items (medicine_id is
+    # mandatory); the rest, fuzzy candidates included, are returned to the UI
+    # for manual mapping
+    return [
+        {
+            "bill_id": bill_id,
+            "medicine_id": m["medicine_id"],
+            "quantity": m["quantity_prescribed"],
+            "unit_price": m["unit_price"],
+            "line_total": m["line_total"],
+            "gst_amount": m["gst_amount"],
+            "item_total": m["item_total"],
+            "dosage_frequency": m.get("frequency"),
+            "dosage_duration": m.get("duration"),
+        }
+        for m in scan["medicines"]
+        if m["found_in_inventory"]
+    ]
+
+def reservation_rows(scan: dict, bill_id: str) -> List[dict]:
+    return [
+        {"bill_id": bill_id, "medicine_id": m["medicine_id"], "quantity": m["quantity_prescribed"]}
+        for m in scan["medicines"]
+        if m["stock_reserved"]
+    ]
+
+def scan_response(scan: dict, prescription: Prescription, bill: Bill) -> dict:
+    extraction = scan["extraction"]
+    medicines_with_pricing = scan["medicines"]
+    return {
+        "status": "PENDING_CONFIRMATION",
+        "bill_id": bill.id,
+        "bill_number": bill.bill_number,
+        "extraction_confidence": float(prescription.extraction_confidence or 0),
+        "medicines": medicines_with_pricing,
+        "subtotal": scan["subtotal"],
+        "total_gst": scan["total_gst"],
+        "final_amount": scan["final_amount"],
+        "extraction_cached": scan["cached"],
+        "timings": scan["timings"],
+        "doctor_notes": extraction.prescription_metadata.doctor_notes,
+        "clinical_analysis": extraction.clinical_analysis,
+        "warnings": [m for m in medicines_with_pricing if not m["found_in_inventory"] or not m["stock_available"]]
+    }
+
+def persist_scans(db: Session, scans: List[dict],
+                  before_commit: Optional[Callable[[Session, List[dict]], None]] = None) -> List[dict]:
+    """
+    Write prescriptions, bills and bill items for many matched scans in one
+    transaction: flush for ids, bulk-insert the items, commit once.
+    `before_commit(db, responses)` can add its own writes to that transaction.
+    """
+    started = time.perf_counter()
+    for scan in scans:
+        # A cache hit reuses the original prescription (and its stored image)
+        if not scan["prescription"]:
+            scan["prescription"] = new_prescription(scan)
+            db.add(scan["prescription"])
+    db.flush()
+    
+    for scan in scans:
+        if should_cache(scan):
+            extraction_cache.put(db, scan["content_hash"], scan["extraction"].model_dump(mode="json"),
+                                 prescription_id=scan["prescription"].id, phash=scan["phash"])
+        scan["bill"] = new_bill(scan, scan["prescription"].id)
+        db.add(scan["bill"])
+    db.flush()
+    
+    item_rows = [row for scan in scans for row in bill_item_rows(scan, scan["bill"].id)]
+    if item_rows:
+        db.execute(insert(BillItem), item_rows)
+    reserve(db, [row for scan in scans for row in reservation_rows(scan, scan["bill"].id)])
+    responses = [scan_response(scan, scan["prescription"], scan["bill"]) for scan in scans]
+    if before_commit is not None:
+        before_commit(db, responses)
+    db.commit()
+    
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for scan in scans:
+        scan["timings"]["persist_ms"] = elapsed_ms
+        observe_scan_timings(scan["timings"])
+    return responses
+
+async def ensure_index_built():
+    # (Re)build the name index in the threadpool rather than on the event loop
+    # inside match_scans(); concurrent scans wait for the one build
+    def build():
+        with SessionLocal() as db:
+            medicine_index.ensure_built(db)
+    if medicine_index.needs_build:
+        await run_in_threadpool(build)
+
+async def run_scan(db: AsyncSession, image_key: str, content_hash: str,
+                   before_commit: Optional[Callable[[Session, List[dict]], None]] = None) -> dict:
+    """
+    Extraction -> prescription -> catalog matching -> pending bill for an
+    image already stored by storage.save_upload(). Shared by the synchronous
+    scan endpoint and the background scan job workers; `before_commit` is
+    passed on to persist_scans().
+    """
+    # 1. Cached or fresh extraction; the cache lookup commits before Gemini is
+    # called, so no connection is held while it runs
+    scan = await load_extraction(db, image_key, content_hash)
+    
+    # 2. Match and price medicines
+    await ensure_index_built()
+    await db.run_sync(match_scans, [scan])
+    
+    # 3. Prescription (a cache hit reuses the original one), pending bill and
+    # its items as one unit of work with a single commit
+    return (await db.run_sync(persist_scans, [scan], before_commit))[0]
+
+async def run_scan_batch(db: AsyncSession, files: List[Tuple[str, str]]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Scan many stored images. Extractions run concurrently (bounded by
+    SCAN_BATCH_CONCURRENCY, on top of the Gemini concurrency cap); whatever has
+    finished is matched in one pass and persisted in one transaction per chunk
+    of up to SCAN_BATCH_PERSIST_CHUNK files. Yields (index, response, error)
+    per file as soon as its chunk is committed.
+    """
+    limit = asyncio.Semaphore(settings.SCAN_BATCH_CONCURRENCY)
+    # Identical images (same key) share one extraction, run by the first file
+    in_flight: Dict[str, Tuple[int, asyncio.Task]] = {}
+    done: asyncio.Queue = asyncio.Queue()
+    # An AsyncSession takes one operation at a time; extractions and chunk
+    # persists take turns on it
+    db_lock = asyncio.Lock()
+    
+    async def extract(index: int, image_key: str, content_hash: str):
+        try:
+            if image_key not in in_flight:
+                async def _load():
+                    async with limit:
+                        return await load_extraction(db, image_key, content_hash, db_lock)
+                in_flight[image_key] = (index, asyncio.ensure_future(_load()))
+            owner, task = in_flight[image_key]
+            shared = await task
+            scan = dict(shared, timings=dict(shared["timings"]))
+            if owner != index:
+                # Same bytes as an earlier file in this batch: reuse its extraction
+                scan["cached"] = True
+            await done.put((index, scan, None))
+        except Exception as e:
+            await done.put((index, None, str(e)))
+            
+    tasks = [asyncio.create_task(extract(i, key, digest)) for i, (key, digest) in enumerate(files)]
+    try:
+        remaining = len(files)
+        while remaining:
+            chunk = [await done.get()]
+            while not done.empty() and len(chunk) < settings.SCAN_BATCH_PERSIST_CHUNK:
+                chunk.append(done.get_nowait())
+            remaining -= len(chunk)
+            
+            for index, _, error in chunk:
+                if error:
+                    yield index, None, error
+            ok = [(index, scan) for index, scan, error in chunk if not error]
+            if not ok:
+                continue
+            try:
+                scans = [scan for _, scan in ok]
+                await ensure_index_built()
+                async with db_lock:
+                    await db.run_sync(match_scans, scans)
+                    responses = await db.run_sync(persist_scans, scans)
+            except Exception as e:
+                async with db_lock:
+                    await db.rollback()
+                for index, _ in ok:
+                    yield index, None, str(e)
+                continue
+            for (index, _), response in zip(ok, responses):
+                yield index, response, None
+    finally:
+        for task in tasks:
+            task.cancel()
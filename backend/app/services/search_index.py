@@ -0,0 +1,137 @@
+"""
+Full-text search over the medicine catalog (generic name, brand names,
+strength, manufacturer).
+
+SQLite: an external-content FTS5 table `medicines_fts` keyed by the
+medicines rowid, kept in sync by triggers. The update trigger only fires
+when a searchable column changes, so stock movements never touch the index.
+
+Postgres: a generated `search_vector` tsvector column with a GIN index
+(always in sync), plus a pg_trgm index on generic_name for substring
+matches and similarity ranking.
+
+ensure_search_index() creates whichever applies at startup (idempotent);
+until it has run, or if the database supports neither, apply_search()
+returns None and callers fall back to ILIKE.
+"""
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, func, literal_column, or_, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+from app.models.all_models import Medicine
+
+logger = logging.getLogger(__name__)
+
+# Column weights for ranking: a generic name hit beats a brand hit beats strength/manufacturer
+_WEIGHTS = (10.0, 5.0, 1.0, 1.0)
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS medicines_fts USING fts5(
+        generic_name, brand_names, strength, manufacturer,
+        content='medicines', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_ai AFTER INSERT ON medicines BEGIN
+        INSERT INTO medicines_fts(rowid, generic_name, brand_names, strength, manufacturer)
+        VALUES (new.rowid, new.generic_name, new.brand_names, new.strength, new.manufacturer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_ad AFTER DELETE ON medicines BEGIN
+        INSERT INTO medicines_fts(medicines_fts, rowid, generic_name, brand_names, strength, manufacturer)
+        VALUES ('delete', old.rowid, old.generic_name, old.brand_names, old.strength, old.manufacturer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS medicines_fts_au
+    AFTER UPDATE OF generic_name, brand_names, strength, manufacturer ON medicines BEGIN
+        INSERT INTO medicines_fts(medicines_fts, rowid, generic_name, brand_names, strength, manufacturer)
+        VALUES ('delete', old.rowid, old.generic_name, old.brand_names, old.strength, old.manufacturer);
+        INSERT INTO medicines_fts(rowid, generic_name, brand_names, strength, manufacturer)
+        VALUES (new.rowid, new.generic_name, new.brand_names, new.strength, new.manufacturer);
+    END
+    """,
+]
+
+_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE medicines ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(generic_name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(brand_names::text, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(strength, '') || ' ' || coalesce(manufacturer, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_medicines_search_vector ON medicines USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_medicines_generic_name_trgm ON medicines USING GIN (generic_name gin_trgm_ops)",
+]
+
+_fts = table("medicines_fts", column("rowid"), column("rank"))
+
+# Set by ensure_search_index(): "fts5", "postgres" or None
+_backend: Optional[str] = None
+
+
+def ensure_search_index(engine: Engine) -> Optional[str]:
+    """Create the search index for this database if missing; returns the backend in use."""
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                existed = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medicines_fts'")).first()
+                for statement in _SQLITE_DDL:
+                    conn.execute(text(statement))
+                # Make the built-in rank column use our column weights
+                conn.execute(text("INSERT INTO medicines_fts(medicines_fts, rank) VALUES ('rank', :rank)"),
+                             {"rank": f"bm25({', '.join(map(str, _WEIGHTS))})"})
+                if not existed:
+                    # Index the rows that were there before the table
+                    conn.execute(text("INSERT INTO medicines_fts(medicines_fts) VALUES ('rebuild')"))
+                _backend = "fts5"
+            elif dialect == "postgresql":
+                for statement in _POSTGRES_DDL:
+                    conn.execute(text(statement))
+                _backend = "postgres"
+    except Exception:
+        logger.exception("Could not set up the %s search index; inventory search falls back to ILIKE", dialect)
+        _backend = None
+    return _backend
+
+
+def search_tokens(term: str) -> List[str]:
+    return re.findall(r"\w+", term.lower())
+
+
+def apply_search(query: Select, term: str) -> Optional[Select]:
+    """
+    Restrict a select over medicines to `term`, best match first. Every word
+    is matched as a prefix (so "amox 50" finds "Amoxycillin 500mg"). Returns
+    None when no index is set up or the term has no words.
+    """
+    tokens = search_tokens(term)
+    if _backend is None or not tokens:
+        return None
+    if _backend == "fts5":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        return (
+            query.join(_fts, _fts.c.rowid == literal_column("medicines.rowid"))
+            .where(text("medicines_fts MATCH :fts_query").bindparams(fts_query=match))
+            .order_by(_fts.c.rank)
+        )
+    # postgres
+    tsquery = func.to_tsquery("simple", " & ".join(f"{token}:*" for token in tokens))
+    vector = literal_column("medicines.search_vector")
+    return (
+        # The trigram index also serves the substring ILIKE (e.g. "cillin")
+        query.where(or_(vector.op("@@")(tsquery), Medicine.generic_name.ilike(f"%{term}%")))
+        .order_by((func.ts_rank(vector, tsquery) + func.similarity(Medicine.generic_name, term)).desc())
+    )
@@ -0,0 +1,311 @@
+"""
+Content-addressed storage for prescription images.
+
+Uploads are streamed to a staging file while being hashed, then stored once
+under `prescriptions/<h[0:2]>/<h[2:4]>/<sha256>.jpg`, so re-uploads of the same
+image cost no extra space and no directory holds more than a few thousand
+files. The object store behind the keys is pluggable (local disk or any
+S3-compatible API).
+"""
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+KEY_PREFIX = "prescriptions"
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+# Room for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def upload_body_limit(path: str) -> int:
+    """Most bytes a multipart request to `path` may send: its file allowance plus overhead."""
+    files = settings.SCAN_BATCH_MAX_FILES if path.endswith("/scan/batch") else 1
+    return files * settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Enforces MAX_UPLOAD_BYTES before FastAPI parses a multipart form, which
+    would otherwise spool the whole body first: a larger Content-Length gets a
+    413 without reading the body, and bodies without one are cut off (413) as
+    soon as they stream past upload_body_limit(). save_upload() still checks
+    each file, which matters for batches.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.MAX_UPLOAD_BYTES:
+            return await self.app(scope, receive, send)
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        limit = upload_body_limit(scope["path"])
+        length = headers.get("content-length", "")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": str(UploadTooLarge(limit))})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=str(UploadTooLarge(limit)))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def content_key(content_hash: str, extension: str = ".jpg") -> str:
+    return f"{KEY_PREFIX}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}"
+
+
+# --- Backends ---
+class StorageBackend(ABC):
+    """Blocking object store; callers run these methods off the event loop."""
+
+    # Where uploads are spooled while streaming, before put_file()
+    staging_dir: str
+
+    @abstractmethod
+    def put_file(self, key: str, source_path: str) -> bool:
+        """Store the staged file under `key`, consuming it. True if the object is new."""
+
+    @abstractmethod
+    def read(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def list_objects(self) -> Iterator[Tuple[str, datetime]]:
+        """(key, last modified as aware UTC datetime) for every stored image."""
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: str):
+        self.root = Path(root)
+        # Staging lives under the root so the final move is an atomic rename
+        self.staging_dir = str(self.root / ".staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key
+
+    def put_file(self, key: str, source_path: str) -> bool:
+        target = self.path_for(key)
+        if target.exists():
+            # Already stored: refresh its age for the retention sweeper
+            os.utime(target)
+            os.remove(source_path)
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source_path, target)
+        return True
+
+    def read(self, key: str) -> bytes:
+        return self.path_for(key).read_bytes()
+
+    def delete(self, key: str):
+        with contextlib.suppress(FileNotFoundError):
+            self.path_for(key).unlink()
+
+    def list_objects(self) -> Iterator[Tuple[str, datetime]]:
+        base = self.root / KEY_PREFIX
+        if not base.exists():
+            return
+        for path in base.rglob("*"):
+            if path.is_file():
+                modified = datetime.fromtimestamp(path.stat().st_mtime, tz=timezone.utc)
+                yield path.relative_to(self.root).as_posix(), modified
+
+    def sweep_staging(self, max_age_seconds: float) -> int:
+        # Spool files left behind by a crash mid-upload
+        removed = 0
+        cutoff = time.time() - max_age_seconds
+        for entry in os.scandir(self.staging_dir):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(entry.path)
+                    removed += 1
+        return removed
+
+
+class S3Storage(StorageBackend):
+    """
+    Any S3-compatible API through a boto3-style client (put_object, get_object,
+    delete_object, list_objects_v2). Puts are idempotent overwrites, so a
+    re-upload also refreshes the object's age for the retention sweeper.
+    """
+
+    def __init__(self, client, bucket: str, prefix: str = ""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.staging_dir = tempfile.gettempdir()
+
+    def put_file(self, key: str, source_path: str) -> bool:
+        try:
+            with open(source_path, "rb") as body:
+                self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=body, ContentType="image/jpeg")
+        finally:
+            os.remove(source_path)
+        return True
+
+    def read(self, key: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"].read()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def list_objects(self) -> Iterator[Tuple[str, datetime]]:
+        kwargs = {"Bucket": self.bucket, "Prefix": self.prefix + KEY_PREFIX + "/"}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["LastModified"]
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+
+def create_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "s3":
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs the boto3 package") from e
+        client = boto3.client("s3", endpoint_url=settings.S3_ENDPOINT_URL, region_name=settings.S3_REGION)
+        return S3Storage(client, settings.S3_BUCKET, settings.S3_PREFIX)
+    return LocalStorage(settings.UPLOAD_ROOT)
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def set_storage(storage: StorageBackend):
+    """Swap the storage backend, e.g. for a local S3 stand-in in benchmarks."""
+    global _storage
+    _storage = storage
+
+
+# --- Upload streaming ---
+def _write_chunk(out, digest, chunk: bytes):
+    # Hashing and writing both release the GIL for large buffers
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def save_upload(upload, max_bytes: Optional[int] = None) -> Tuple[str, str]:
+    """
+    Stream an UploadFile (anything with `async read(n)`) into storage,
+    hashing on the fly. Returns (key, sha256). Raises UploadTooLarge as soon as
+    more than `max_bytes` (default MAX_UPLOAD_BYTES) have been read.
+    """
+    storage = get_storage()
+    max_bytes = settings.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    fd, staging_path = tempfile.mkstemp(dir=storage.staging_dir, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await asyncio.to_thread(_write_chunk, out, digest, chunk)
+        content_hash = digest.hexdigest()
+        key = content_key(content_hash)
+        await asyncio.to_thread(storage.put_file, key, staging_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(staging_path)
+        raise
+    return key, content_hash
+
+
+async def read_image(key: str) -> bytes:
+    return await asyncio.to_thread(get_storage().read, key)
+
+
+# --- Retention ---
+def sweep_expired(retention_days: int, storage: Optional[StorageBackend] = None) -> int:
+    """Delete stored images not written or re-uploaded for `retention_days`."""
+    storage = storage or get_storage()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    expired: List[str] = [key for key, modified in storage.list_objects() if modified < cutoff]
+    for key in expired:
+        storage.delete(key)
+    if isinstance(storage, LocalStorage):
+        storage.sweep_staging(max_age_seconds=3600)
+    return len(expired)
+
+
+class RetentionSweeper:
+    """Background task deleting images older than UPLOAD_RETENTION_DAYS (0 keeps them forever)."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if settings.UPLOAD_RETENTION_DAYS > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="upload-retention-sweeper")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                removed = await asyncio.to_thread(sweep_expired, settings.UPLOAD_RETENTION_DAYS)
+                if removed:
+                    logger.info("Retention sweep removed %d prescription image(s)", removed)
+            except Exception:
+                logger.exception("Retention sweep failed")
+            await asyncio.sleep(settings.UPLOAD_SWEEP_INTERVAL_SECONDS)
+
+
+retention_sweeper = RetentionSweeper()
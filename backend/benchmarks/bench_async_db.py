@@ -0,0 +1,145 @@
+"""
+Load test: async database sessions vs the previous sync-session endpoints.
+
+Serves the app under uvicorn with the extraction cache and the /inventory
+response cache off (so every request does its database work) and drives it
+with --clients concurrent HTTP clients for --seconds per round. Each client
+loops over a mix of inventory pages/searches and, with --scan-share
+probability, a prescription scan against a fake Gemini sleeping --delay
+seconds. Two rounds per client count:
+
+  sync  : /legacy/* routes, the pre-async implementations (a threadpool
+          endpoint with a sync Session for inventory; an async scan endpoint
+          running its sync Session queries on the event loop)
+  async : the real /api/* routes on AsyncSession (aiosqlite)
+
+reporting requests/s, p50/p99 latency and errors. Client and server share one
+process (and the GIL), so absolute numbers are pessimistic for both modes.
+Each round runs in a fresh process with its own database.
+
+Usage (from backend/):
+    python benchmarks/bench_async_db.py [--clients 1,8,32] [--seconds 10] [--skus 20000] [--scan-share 0.2] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+os.environ.setdefault("EXTRACTION_CACHE_ENABLED", "false")
+os.environ.setdefault("INVENTORY_CACHE_ENTRIES", "0")
+
+import httpx
+from fastapi import APIRouter, Depends, File, UploadFile
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal, get_db
+from app.main import app
+from app.services import gemini_service
+from app.services.catalog_version import catalog_version
+from app.services.gemini_service import extract_medicines_from_image
+from app.services.inventory import inventory_page
+from app.services.scan_pipeline import match_scans, persist_scans
+from app.services.storage import read_image, save_upload
+
+SEARCHES = [None, None, "para", "amox", "Benchmed 01", "pan 40", "BM77"]
+
+legacy = APIRouter()
+
+
+@legacy.get("/inventory")
+def legacy_inventory(search: str = None, limit: int = 100, db: Session = Depends(get_db)):
+    catalog_version(db)
+    medicines, next_cursor = inventory_page(db, limit, None, search, False)
+    return {"medicines": medicines, "next_cursor": next_cursor}
+
+
+@legacy.post("/prescriptions/scan")
+async def legacy_scan(file: UploadFile = File(...)):
+    image_key, content_hash = await save_upload(file)
+    db = SessionLocal()
+    try:
+        timings = {}
+        extraction = await extract_medicines_from_image(await read_image(image_key), timings)
+        scan = {"timings": timings, "image_key": image_key, "content_hash": content_hash, "phash": None,
+                "cached": False, "prescription": None, "extraction": extraction}
+        match_scans(db, [scan])
+        return persist_scans(db, [scan])[0]
+    finally:
+        db.close()
+
+
+app.include_router(legacy, prefix="/legacy")
+
+
+async def load(base_url, prefix, clients, seconds, scan_share):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async def client_loop(rng, client):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if rng.random() < scan_share:
+                    r = await client.post(f"{prefix}/prescriptions/scan",
+                                          files={"file": ("rx.jpg", rng.randbytes(64), "image/jpeg")})
+                else:
+                    search = rng.choice(SEARCHES)
+                    r = await client.get(f"{prefix}/inventory", params={"search": search} if search else {})
+                r.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+            except httpx.HTTPError:
+                errors += 1
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(random.Random(i), client) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, latencies, errors
+
+
+def run_round(args):
+    clients = int(args.clients)
+    common.seed_catalog(extra_skus=args.skus, stock=10 ** 9)
+    gemini_service.set_model(common.FakeGeminiModel(delay=args.delay))
+    prefix = "/legacy" if args.mode == "sync" else "/api"
+    with common.serve_app(app) as base_url:
+        rps, latencies, errors = asyncio.run(load(base_url, prefix, clients, args.seconds, args.scan_share))
+    if not latencies:
+        print(f"{clients:3d} clients | {args.mode:<5} no successful requests | errors {errors}")
+    else:
+        print(f"{clients:3d} clients | {args.mode:<5} {rps:7.1f} req/s | p50 {common.percentile(latencies, 50):7.1f} ms"
+              f" | p99 {common.percentile(latencies, 99):7.1f} ms | errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default="1,8,32")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--skus", type=int, default=20000)
+    parser.add_argument("--scan-share", type=float, default=0.2)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_round(args)
+        return
+    # Every round gets a fresh process and database, so requests left hanging
+    # by an overloaded round can't slow down the next one
+    env = {k: v for k, v in os.environ.items() if k != "SQLALCHEMY_DATABASE_URI"}
+    for clients in args.clients.split(","):
+        for mode in ("sync", "async"):
+            subprocess.run([sys.executable, __file__, "--mode", mode, "--clients", clients, "--seconds", str(args.seconds),
+                            "--skus", str(args.skus), "--scan-share", str(args.scan_share), "--delay", str(args.delay)],
+                           env=env, check=True, stderr=subprocess.DEVNULL)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Pharmacist authentication cost per bill confirmation.
+
+  plaintext : the original check, a pharmacists query filtering on the raw PIN
+  bcrypt    : verify_pin against the stored bcrypt hash, the work
+              authenticate_pharmacist_by_pin does at /auth/login and on the
+              legacy PIN + license number path of /bills/{id}/confirm
+  token     : decode_access_token on a Bearer token issued by /auth/login
+
+Each mode runs --iterations checks on one thread and on --workers threads and
+reports checks/s and p50 latency. The first bcrypt login also upgrades the
+seeded plaintext PIN in place.
+
+Usage (from backend/):
+    python benchmarks/bench_auth.py [--iterations 200] [--workers 8]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401  (must precede app imports)
+
+from app.api.endpoints import authenticate_pharmacist_by_pin
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.core.security import create_access_token, decode_access_token, verify_pin
+from app.models.all_models import Pharmacist
+
+
+def plaintext_check(db):
+    return db.query(Pharmacist).filter(Pharmacist.pin_hash == "1234", Pharmacist.is_active == True).first()
+
+
+async def first_login():
+    async with AsyncSessionLocal() as db:
+        return await authenticate_pharmacist_by_pin("1234", db, "BENCH-001")
+
+
+def measure(label, check, iterations, workers):
+    def timed(_):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            assert check(db) is not None
+            return (time.perf_counter() - started) * 1000
+        finally:
+            db.close()
+
+    for threads in (1, workers):
+        n = iterations * threads
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(timed, range(n)))
+        elapsed = time.perf_counter() - started
+        print(f"{label:<9} {threads:2d} thread(s): {n / elapsed:9.0f} checks/s | p50 {common.percentile(latencies, 50):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    measure("plaintext", plaintext_check, args.iterations * 10, args.workers)
+
+    pharmacist = asyncio.run(first_login())
+    print(f"first login upgraded the stored PIN to {pharmacist.pin_hash[:7]}... hash")
+    token, _ = create_access_token(pharmacist.id, pharmacist.name)
+
+    measure("bcrypt", lambda db: verify_pin("1234", pharmacist.pin_hash)[0] or None, args.iterations // 10 or 1, args.workers)
+    measure("token", lambda db: decode_access_token(token), args.iterations * 10, args.workers)
+
+
+if __name__ == "__main__":
+    main()
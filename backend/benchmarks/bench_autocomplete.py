@@ -0,0 +1,114 @@
+"""
+Medicine autocomplete: in-memory sorted-array index vs searching the database.
+
+Seeds --skus synthetic medicines (same generator as bench_inventory_search)
+and --dispensings DISPENSED ledger rows with a skewed popularity, then times
+typed-as-you-go prefixes of a few names through:
+
+  fts   : inventory_page(search=...) on the full-text index, limit 10
+  index : autocomplete_index.complete(), first call for each prefix (cold)
+          and repeated calls (memoized)
+
+Also reports the index build time and the cost of the incremental updates a
+catalog edit or a confirmation triggers after commit.
+
+Usage (from backend/):
+    python benchmarks/bench_autocomplete.py [--skus 100000] [--dispensings 200000] [--repeat 200]
+"""
+import argparse
+import random
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import insert
+
+from app.core.database import SessionLocal, engine
+from app.models.all_models import InventoryTransaction, Medicine
+from app.services import search_index
+from app.services.autocomplete import autocomplete_index, stage_dispensed
+from app.services.inventory import inventory_page
+from bench_inventory_search import seed_skus
+
+WORDS = ["Paracetamol", "Amoxycillin", "Pantoprazole", "Metformin", "Cefzol", "Dolo 650", "Vasoxi"]
+
+
+def seed_dispensings(count, rng):
+    db = SessionLocal()
+    ids = [m for (m,) in db.query(Medicine.id)]
+    # Zipf-ish: a small head of medicines accounts for most dispensings
+    weights = [1 / (rank + 1) for rank in range(len(ids))]
+    rows = [{"medicine_id": mid, "transaction_type": "DISPENSED", "quantity_change": -1, "stock_before": 100,
+             "stock_after": 99} for mid in rng.choices(ids, weights, k=count)]
+    for start in range(0, len(rows), 20000):
+        db.execute(insert(InventoryTransaction), rows[start:start + 20000])
+    db.commit()
+    db.close()
+    return ids
+
+
+def prefixes():
+    for word in WORDS:
+        for end in range(2, len(word) + 1):
+            yield word[:end]
+
+
+def time_us(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def report(label, latencies):
+    print(f"{label:<14} p50 {common.percentile(latencies, 50):9.1f} us | p99 {common.percentile(latencies, 99):9.1f} us"
+          f" | max {max(latencies):9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=100000)
+    parser.add_argument("--dispensings", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    rng = random.Random(23)
+    seed_skus(args.skus, rng)
+    ids = seed_dispensings(args.dispensings, rng)
+    search_index.ensure_search_index(engine)
+
+    db = SessionLocal()
+    fts = []
+    for prefix in prefixes():
+        fts += time_us(lambda: inventory_page(db, 10, search=prefix), max(3, args.repeat // 20))
+    report("fts", fts)
+
+    started = time.perf_counter()
+    autocomplete_index.build(db)
+    print(f"index build over {len(ids)} SKUs + {args.dispensings} dispensings: {time.perf_counter() - started:.2f}s, "
+          f"{len(autocomplete_index._keys)} keys")
+
+    cold, warm = [], []
+    for prefix in prefixes():
+        cold += time_us(lambda: autocomplete_index.complete(prefix, 10), 1)
+        warm += time_us(lambda: autocomplete_index.complete(prefix, 10), args.repeat)
+    report("index cold", cold)
+    report("index memo", warm)
+    top = autocomplete_index.complete("para", 3)
+    print("top 'para':", ", ".join(f"{s['match']} ({s['dispensed_recently']})" for s in top))
+
+    # Incremental updates, applied from the after_commit listeners
+    medicine = db.get(Medicine, ids[len(ids) // 2])
+    renames = time_us(lambda: (setattr(medicine, "brand_names", [f"Renamed {rng.random():.6f}"]), db.commit()),
+                      max(10, args.repeat // 10))
+    report("rename+commit", renames)
+    dispensed = time_us(lambda: (stage_dispensed(db, rng.sample(ids, 5)), db.commit()), args.repeat)
+    report("5 dispensed", dispensed)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Batch scanning throughput.
+
+Posts --files distinct images to /api/prescriptions/scan/batch against a stub
+Gemini model that sleeps --delay seconds, and reports time to first result,
+total time and prescriptions per minute.
+
+Usage (from backend/):
+    python benchmarks/bench_batch_scan.py [--files 100] [--delay 0.5] [--gemini-concurrency 8]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+
+def jpeg(seed):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (320, 240), "white")
+    ImageDraw.Draw(img).text((20, 100), f"Rx #{seed}", fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+async def run(files):
+    import httpx
+    from app.main import app
+
+    payload = [("files", (f"rx-{i}.jpg", jpeg(i), "image/jpeg")) for i in range(files)]
+    with common.serve_app(app) as base_url:
+        async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+            start = time.perf_counter()
+            first = None
+            results = []
+            summary = None
+            async with client.stream("POST", "/api/prescriptions/scan/batch", files=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if "summary" in data:
+                        summary = data["summary"]
+                        continue
+                    if first is None:
+                        first = time.perf_counter() - start
+                    results.append(data)
+            total = time.perf_counter() - start
+    return first, total, results, summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--gemini-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.gemini_concurrency)
+    os.environ["SCAN_BATCH_CONCURRENCY"] = str(args.gemini_concurrency)
+    common.seed_catalog()
+
+    from app.services import gemini_service
+    model = common.FakeGeminiModel(delay=args.delay)
+    gemini_service.set_model(model)
+
+    first, total, results, summary = asyncio.run(run(args.files))
+    print(f"Files            : {args.files} (stub delay {args.delay}s, Gemini concurrency {args.gemini_concurrency})")
+    print(f"Extraction calls : {model.calls}")
+    print(f"Succeeded/failed : {summary['succeeded']}/{summary['failed']}")
+    print(f"First result     : {first:.2f}s")
+    print(f"Total            : {total:.2f}s")
+    print(f"Throughput       : {args.files / total * 60:.0f} prescriptions/minute")
+
+
+if __name__ == "__main__":
+    main()
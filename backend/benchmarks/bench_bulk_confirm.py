@@ -0,0 +1,107 @@
+"""
+Confirming a backlog of pending bills: one request per bill vs /bills/confirm-bulk.
+
+Seeds --bills pending bills of --lines items (the same bills as
+bench_confirm_concurrency, including the scarce "hot" medicine, so some bills
+fail for stock) and confirms them through the API:
+
+  per-bill : POST /api/bills/{id}/confirm for each bill, Bearer token
+  bulk     : POST /api/bills/confirm-bulk in chunks of --chunk bill ids
+
+Reports wall time, bills/s, SQL statements and commits per bill, and checks
+both modes confirm the same number of bills. Before timing, it also checks that
+a single confirm, a bulk confirm and an autocomplete index rebuild agree on
+each medicine's popularity (one per dispensing, whatever the quantity).
+
+Usage (from backend/):
+    python benchmarks/bench_bulk_confirm.py [--bills 200] [--lines 5] [--chunk 100] [--hot-stock 100]
+"""
+import argparse
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.core.database import SessionLocal, async_engine
+from app.main import app
+from app.services.autocomplete import autocomplete_index
+from bench_confirm_concurrency import setup
+
+
+def count_statements():
+    counts = {"statements": 0, "commits": 0}
+
+    def on_execute(*args):
+        counts["statements"] += 1
+
+    def on_commit(*args):
+        counts["commits"] += 1
+
+    # The confirm endpoints run on AsyncSession; its statements go through the async engine's sync core
+    engine = async_engine.sync_engine
+    event.listen(engine, "before_cursor_execute", on_execute)
+    event.listen(engine, "commit", on_commit)
+    return counts, lambda: (event.remove(engine, "before_cursor_execute", on_execute),
+                            event.remove(engine, "commit", on_commit))
+
+
+def check_popularity(client, headers):
+    bill_ids, _, medicine_ids = setup(2, 3, 100, quantity=10)
+    db = SessionLocal()
+    try:
+        # setup() cleared the ledger; start the live counts from the same place
+        autocomplete_index.build(db)
+        client.post(f"/api/bills/{bill_ids[0]}/confirm", json={}, headers=headers).raise_for_status()
+        client.post("/api/bills/confirm-bulk", json={"bill_ids": [bill_ids[1]]}, headers=headers).raise_for_status()
+        live = {mid: autocomplete_index._popularity[mid] for mid in medicine_ids}
+        autocomplete_index.build(db)
+        rebuilt = {mid: autocomplete_index._popularity[mid] for mid in medicine_ids}
+    finally:
+        db.close()
+    assert live == rebuilt == dict.fromkeys(medicine_ids, 2), f"popularity differs: live {live}, rebuilt {rebuilt}"
+    print(f"popularity after single + bulk confirm of 10-unit lines: {sorted(set(live.values()))} (matches rebuild)")
+
+
+def run(label, client, headers, bill_ids, chunk):
+    counts, stop = count_statements()
+    confirmed = 0
+    started = time.perf_counter()
+    if chunk:
+        for i in range(0, len(bill_ids), chunk):
+            response = client.post("/api/bills/confirm-bulk", json={"bill_ids": bill_ids[i:i + chunk]}, headers=headers)
+            confirmed += response.json()["summary"]["confirmed"]
+    else:
+        for bill_id in bill_ids:
+            confirmed += client.post(f"/api/bills/{bill_id}/confirm", json={}, headers=headers).status_code == 200
+    elapsed = time.perf_counter() - started
+    stop()
+    n = len(bill_ids)
+    print(f"{label:<8} {elapsed:6.2f}s | {n / elapsed:7.1f} bills/s | confirmed {confirmed:4d}/{n} | "
+          f"{counts['statements'] / n:5.1f} statements/bill | {counts['commits'] / n:5.2f} commits/bill")
+    return confirmed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bills", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--chunk", type=int, default=100)
+    parser.add_argument("--hot-stock", type=int, default=100)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    with TestClient(app) as client:
+        token = client.post("/api/auth/login", json={"pin": "1234", "license_number": "BENCH-001"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        check_popularity(client, headers)
+        bill_ids, _, _ = setup(args.bills, args.lines, args.hot_stock)
+        single = run("per-bill", client, headers, bill_ids, 0)
+        bill_ids, _, _ = setup(args.bills, args.lines, args.hot_stock)
+        bulk = run("bulk", client, headers, bill_ids, args.chunk)
+    assert single == bulk, "modes confirmed a different number of bills"
+
+
+if __name__ == "__main__":
+    main()
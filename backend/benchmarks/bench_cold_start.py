@@ -0,0 +1,67 @@
+"""
+First-scan latency with and without the startup warm-up request.
+
+The fake Gemini model adds --cold-start seconds to its first call, standing in
+for connection / TLS / channel setup. Without warm-up the first scan pays it;
+with GEMINI_WARMUP the lifespan pays it before traffic arrives.
+
+Usage (from backend/):
+    python benchmarks/bench_cold_start.py [--delay 0.5] [--cold-start 1.5]
+"""
+import argparse
+import asyncio
+import io
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from PIL import Image, ImageDraw
+
+from app.services.gemini_service import GeminiExtractionClient
+
+
+def write_image(path):
+    img = Image.new("RGB", (800, 1000), "white")
+    ImageDraw.Draw(img).text((60, 60), "Rx: Paracetamol 650 mg 1-0-1 x 5 days", fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    with open(path, "wb") as f:
+        f.write(buf.getvalue())
+
+
+async def measure(warm_up, delay, cold_start, image_data):
+    client = GeminiExtractionClient()
+    client.set_model(common.FakeGeminiModel(delay=delay, cold_start_delay=cold_start))
+    try:
+        started = time.perf_counter()
+        await client.start(warm_up=warm_up)
+        startup_ms = (time.perf_counter() - started) * 1000
+
+        scans_ms = []
+        for _ in range(2):
+            started = time.perf_counter()
+            await client.extract(image_data)
+            scans_ms.append((time.perf_counter() - started) * 1000)
+    finally:
+        client.close()
+
+    print(f"[warm-up {'on ' if warm_up else 'off'}] startup {startup_ms:6.0f} ms | "
+          f"first scan {scans_ms[0]:6.0f} ms | second scan {scans_ms[1]:6.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--cold-start", type=float, default=1.5)
+    args = parser.parse_args()
+
+    image_path = "rx.jpg"
+    write_image(image_path)
+    with open(image_path, "rb") as f:
+        image_data = f.read()
+    for warm_up in (False, True):
+        asyncio.run(measure(warm_up, args.delay, args.cold_start, image_data))
+
+
+if __name__ == "__main__":
+    main()
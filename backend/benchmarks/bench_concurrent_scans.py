@@ -0,0 +1,65 @@
+"""
+Event-loop responsiveness during concurrent prescription scans.
+
+Runs the app in-process against a fake Gemini model that sleeps for
+--delay seconds, fires --scans concurrent scans and, while they are in flight,
+polls /api/inventory to show other endpoints stay fast. Total scan wall time
+reflects the GEMINI_MAX_CONCURRENCY cap.
+
+Usage (from backend/):
+    python benchmarks/bench_concurrent_scans.py [--scans 8] [--delay 2]
+"""
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+import httpx
+
+from app.core.config import settings
+from app.main import app
+from app.services import gemini_service
+
+
+async def run(scans, delay):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def scan():
+            start = time.perf_counter()
+            r = await client.post("/api/prescriptions/scan", files={"file": ("rx.jpg", b"\xff\xd8fake", "image/jpeg")})
+            r.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        scan_tasks = [asyncio.create_task(scan()) for _ in range(scans)]
+        inventory_ms = []
+        while not all(t.done() for t in scan_tasks):
+            t0 = time.perf_counter()
+            r = await client.get("/api/inventory")
+            r.raise_for_status()
+            inventory_ms.append((time.perf_counter() - t0) * 1000)
+            await asyncio.sleep(0.05)
+        scan_s = await asyncio.gather(*scan_tasks)
+        total_s = time.perf_counter() - start
+
+    print(f"Scans           : {scans} (fake Gemini delay {delay}s, concurrency cap {settings.GEMINI_MAX_CONCURRENCY})")
+    print(f"Scan wall time  : {total_s:.2f}s (slowest scan {max(scan_s):.2f}s)")
+    print(f"Inventory polls : {len(inventory_ms)} during scans")
+    print(f"Inventory p50   : {common.percentile(inventory_ms, 50):.1f} ms")
+    print(f"Inventory p99   : {common.percentile(inventory_ms, 99):.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scans", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=2.0)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    gemini_service.set_model(common.FakeGeminiModel(delay=args.delay))
+    asyncio.run(run(args.scans, args.delay))
+
+
+if __name__ == "__main__":
+    main()
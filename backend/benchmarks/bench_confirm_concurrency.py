@@ -0,0 +1,171 @@
+"""
+Bill confirmation under concurrency: oversell check and confirms per second.
+
+Seeds --bills pending bills of --lines items each. Every bill also takes one
+unit of a "hot" medicine stocked with only --hot-stock units, so most bills
+compete for it. --workers threads (one session each) then confirm all bills
+at once.
+
+  legacy : the original flow (per-item SELECTs, read-modify-write of
+           current_stock through the ORM)
+  atomic : dispensing.confirm_pending_bill (locked read + conditional
+           executemany decrement, bulk ledger insert)
+
+For each mode it reports confirms/s, rejected bills, statements per
+confirmation and oversold units. Oversold units are the units the ledger
+says were dispensed beyond what stock actually went down by, plus any
+negative stock.
+
+Usage (from backend/):
+    python benchmarks/bench_confirm_concurrency.py [--bills 300] [--lines 5] [--workers 8] [--hot-stock 100]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import event, func, select
+
+from app.core.database import SessionLocal, engine
+from app.models.all_models import (AuditLog, Bill, BillItem, InventoryTransaction, Medicine, Pharmacist)
+from app.services import dispensing
+
+HOT = "Hotmed 500"
+
+
+def setup(bills, lines, hot_stock, quantity=1):
+    db = SessionLocal()
+    try:
+        db.query(InventoryTransaction).delete()
+        db.query(AuditLog).delete()
+        db.query(BillItem).delete()
+        db.query(Bill).delete()
+        db.query(Medicine).update({Medicine.current_stock: 10_000})
+        hot = db.query(Medicine).filter(Medicine.generic_name == HOT).first()
+        if hot is None:
+            hot = Medicine(generic_name=HOT, brand_names=[], strength="500 mg", form="Tablet", unit_price=1)
+            db.add(hot)
+        hot.current_stock = hot_stock
+        db.flush()
+        others = [m.id for m in db.query(Medicine).filter(Medicine.id != hot.id).order_by(Medicine.generic_name).limit(lines - 1)]
+        bill_ids = []
+        for i in range(bills):
+            bill = Bill(bill_number=f"BENCH-{i:06d}-{time.time_ns()}", subtotal=0, total_gst=0, final_amount=0, status="PENDING")
+            db.add(bill)
+            db.flush()
+            bill_ids.append(bill.id)
+            for medicine_id in [hot.id] + others:
+                db.add(BillItem(bill_id=bill.id, medicine_id=medicine_id, quantity=quantity, unit_price=1,
+                                line_total=1, gst_amount=0, item_total=1))
+        pharmacist_id = db.query(Pharmacist.id).filter(Pharmacist.license_number == "BENCH-001").scalar()
+        db.commit()
+        return bill_ids, pharmacist_id, [hot.id] + others
+    finally:
+        db.close()
+
+
+def legacy_confirm(db, bill_id, pharmacist_id):
+    # The pre-refactor confirm_bill body
+    bill = db.query(Bill).filter(Bill.id == bill_id).first()
+    if bill.status != "PENDING":
+        raise dispensing.BillAlreadyProcessed(bill_id)
+    items = db.query(BillItem).filter(BillItem.bill_id == bill_id).all()
+    for item in items:
+        med = db.query(Medicine).filter(Medicine.id == item.medicine_id).first()
+        if med.current_stock < item.quantity:
+            raise dispensing.InsufficientStock([med.generic_name])
+    bill.status = "CONFIRMED"
+    bill.confirmed_by = pharmacist_id
+    for item in items:
+        med = db.query(Medicine).filter(Medicine.id == item.medicine_id).first()
+        db.add(InventoryTransaction(medicine_id=med.id, transaction_type="DISPENSED", quantity_change=-item.quantity,
+                                    stock_before=med.current_stock, stock_after=med.current_stock - item.quantity,
+                                    bill_id=bill.id, performed_by=pharmacist_id))
+        med.current_stock -= item.quantity
+    db.add(AuditLog(pharmacist_id=pharmacist_id, action="BILL_CONFIRMED", resource_type="BILL",
+                    resource_id=bill.id, changes={"status": "CONFIRMED"}))
+    return bill.bill_number
+
+
+def atomic_confirm(db, bill_id, pharmacist_id):
+    return dispensing.confirm_pending_bill(db, bill_id, pharmacist_id)
+
+
+def run(label, confirm, bills, lines, workers, hot_stock):
+    bill_ids, pharmacist_id, medicine_ids = setup(bills, lines, hot_stock)
+    db = SessionLocal()
+    stock_before = dict(db.execute(select(Medicine.id, Medicine.current_stock).where(Medicine.id.in_(medicine_ids))).all())
+    db.close()
+
+    statements = {"count": 0}
+    counting = threading.local()
+
+    def on_execute(*args):
+        if getattr(counting, "active", False):
+            statements["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", on_execute)
+    outcomes = {"ok": 0, "rejected": 0, "error": 0}
+    lock = threading.Lock()
+
+    def confirm_one(bill_id):
+        db = SessionLocal()
+        counting.active = True
+        try:
+            confirm(db, bill_id, pharmacist_id)
+            db.commit()
+            outcome = "ok"
+        except (dispensing.InsufficientStock, dispensing.BillAlreadyProcessed):
+            db.rollback()
+            outcome = "rejected"
+        except Exception:
+            db.rollback()
+            outcome = "error"
+        finally:
+            counting.active = False
+            db.close()
+        with lock:
+            outcomes[outcome] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(confirm_one, bill_ids))
+    elapsed = time.perf_counter() - started
+    event.remove(engine, "before_cursor_execute", on_execute)
+
+    db = SessionLocal()
+    try:
+        stock_after = dict(db.execute(select(Medicine.id, Medicine.current_stock).where(Medicine.id.in_(medicine_ids))).all())
+        dispensed = dict(db.execute(
+            select(InventoryTransaction.medicine_id, -func.sum(InventoryTransaction.quantity_change))
+            .group_by(InventoryTransaction.medicine_id)
+        ).all())
+    finally:
+        db.close()
+    oversold = sum(max(0, dispensed.get(mid, 0) - (stock_before[mid] - stock_after[mid])) for mid in medicine_ids)
+    oversold += sum(-s for s in stock_after.values() if s < 0)
+    hot_id = medicine_ids[0]
+
+    print(f"{label:<7} {outcomes['ok'] / elapsed:7.1f} confirms/s | confirmed {outcomes['ok']:4d}, rejected "
+          f"{outcomes['rejected']:4d}, errors {outcomes['error']:3d} | {statements['count'] / len(bill_ids):5.1f} "
+          f"statements/confirm | hot stock {stock_before[hot_id]} -> {stock_after[hot_id]} | oversold units {oversold}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bills", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--hot-stock", type=int, default=100)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    print(f"{args.bills} bills x {args.lines} lines, {args.workers} workers, hot medicine stock {args.hot_stock}")
+    run("legacy", legacy_confirm, args.bills, args.lines, args.workers, args.hot_stock)
+    run("atomic", atomic_confirm, args.bills, args.lines, args.workers, args.hot_stock)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Fuzzy medicine-name matching benchmark.
+
+Builds a trigram matcher over ~50k synthetic catalog names (the real
+MEDICINES_DATA names plus generated ones), then times lookups of OCR-style
+misspellings and reports per-line latency percentiles and top-1 accuracy.
+
+Usage (from backend/):
+    python benchmarks/bench_fuzzy_match.py [--entries 50000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.data.medicines_data import MEDICINES_DATA
+from app.services.fuzzy_matcher import TrigramMatcher
+
+SYLLABLES = ["am", "lo", "xi", "ci", "pra", "zo", "le", "met", "for", "min", "tel", "mi", "sar", "tan",
+             "pan", "to", "ce", "fa", "dro", "xil", "val", "car", "di", "ol", "ra", "be", "nex", "cef"]
+SUFFIXES = ["", " 10", " 20", " 40", " 500", " 650", "-D", "-SR", " Plus", " Forte"]
+
+
+def synthetic_names(count, rng):
+    names = set()
+    for med in MEDICINES_DATA:
+        names.add(med["generic_name"])
+        names.update(med["brand_names"])
+    while len(names) < count:
+        stem = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+        names.add(stem.capitalize() + rng.choice(SUFFIXES))
+    return list(names)
+
+
+def misspell(name, rng):
+    chars = list(name)
+    for _ in range(rng.randint(1, 2)):
+        op = rng.choice(["sub", "del", "ins", "sep"])
+        i = rng.randrange(len(chars))
+        if op == "sub":
+            chars[i] = rng.choice("aeiouycklmnrst")
+        elif op == "del" and len(chars) > 4:
+            del chars[i]
+        elif op == "ins":
+            chars.insert(i, rng.choice("aeiouy"))
+        else:
+            chars.insert(i, rng.choice(" -"))
+    return "".join(chars)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = synthetic_names(args.entries, rng)
+
+    matcher = TrigramMatcher()
+    start = time.perf_counter()
+    for i, name in enumerate(names):
+        matcher.add(f"med-{i}", name, "generic")
+    build_s = time.perf_counter() - start
+
+    ids = {name: f"med-{i}" for i, name in enumerate(names)}
+    samples = [rng.choice(names) for _ in range(args.queries)]
+    latencies_ms = []
+    hits = 0
+    for original in samples:
+        query = misspell(original, rng)
+        start = time.perf_counter()
+        candidates = matcher.search(query, limit=5)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        if candidates and candidates[0].medicine_id == ids[original]:
+            hits += 1
+
+    print(f"Catalog entries : {len(matcher)} (built in {build_s:.2f}s)")
+    print(f"Queries         : {len(samples)}")
+    print(f"Top-1 accuracy  : {hits / len(samples):.1%}")
+    print(f"Latency p50     : {percentile(latencies_ms, 50):.3f} ms")
+    print(f"Latency p95     : {percentile(latencies_ms, 95):.3f} ms")
+    print(f"Latency p99     : {percentile(latencies_ms, 99):.3f} ms")
+    print(f"Latency max     : {max(latencies_ms):.3f} ms")
+    print(f"Latency mean    : {statistics.mean(latencies_ms):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
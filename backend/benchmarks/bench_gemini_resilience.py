@@ -0,0 +1,91 @@
+"""
+Gemini retry budget and circuit breaker under injected upstream failures.
+
+Three phases against a fake Gemini model:
+  1. flaky   - a fraction of calls fail with 429; retries should hide them
+  2. outage  - every call fails with 503; the breaker should open and later
+               scans should fail fast with 503 + Retry-After
+  3. recover - after the reset timeout a trial call closes the breaker again
+
+Usage (from backend/):
+    python benchmarks/bench_gemini_resilience.py [--scans 20] [--error-rate 0.3] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+# Small budgets so the phases finish in seconds; cache off so every scan calls Gemini
+os.environ.setdefault("EXTRACTION_CACHE_ENABLED", "false")
+os.environ.setdefault("GEMINI_RETRY_BASE_DELAY", "0.05")
+os.environ.setdefault("GEMINI_RETRY_MAX_DELAY", "0.5")
+os.environ.setdefault("GEMINI_BREAKER_FAILURE_THRESHOLD", "5")
+os.environ.setdefault("GEMINI_BREAKER_RESET_SECONDS", "2")
+
+import httpx
+
+from app.main import app
+from app.services import gemini_service
+
+
+async def scan_many(client, count, tag):
+    async def scan(i):
+        start = time.perf_counter()
+        r = await client.post(
+            "/api/prescriptions/scan",
+            files={"file": (f"rx-{tag}-{i}.jpg", b"\xff\xd8fake-" + f"{tag}-{i}".encode(), "image/jpeg")},
+        )
+        return r.status_code, r.headers.get("retry-after"), (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(scan(i) for i in range(count)))
+
+
+def report(name, results, model, calls_before):
+    ok = [ms for status, _, ms in results if status == 200]
+    unavailable = [ms for status, _, ms in results if status == 503]
+    print(f"[{name}]")
+    print(f"  scans           : {len(results)} -> {len(ok)} ok, {len(unavailable)} x 503, "
+          f"{len(results) - len(ok) - len(unavailable)} other")
+    print(f"  upstream calls  : {model.calls - calls_before}")
+    if ok:
+        print(f"  ok latency      : p50 {common.percentile(ok, 50):.0f} ms, p99 {common.percentile(ok, 99):.0f} ms")
+    if unavailable:
+        print(f"  503 latency     : p50 {common.percentile(unavailable, 50):.0f} ms, "
+              f"p99 {common.percentile(unavailable, 99):.0f} ms")
+    print(f"  breaker state   : {gemini_service.extraction_client.circuit_breaker.state}")
+
+
+async def run(scans, error_rate, delay):
+    model = common.FakeGeminiModel(delay=delay, quota_error_rate=error_rate)
+    gemini_service.set_model(model)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        calls = model.calls
+        report(f"flaky: {error_rate:.0%} of calls return 429", await scan_many(client, scans, "flaky"), model, calls)
+
+        model.quota_error_rate = 0.0
+        model.outage = True
+        calls = model.calls
+        report("outage: every call returns 503", await scan_many(client, scans, "outage"), model, calls)
+
+        model.outage = False
+        await asyncio.sleep(gemini_service.extraction_client.circuit_breaker.reset_timeout)
+        calls = model.calls
+        report("recover: after the breaker reset timeout", await scan_many(client, 1, "recover"), model, calls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scans", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    asyncio.run(run(args.scans, args.error_rate, args.delay))
+
+
+if __name__ == "__main__":
+    main()
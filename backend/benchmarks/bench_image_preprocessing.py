@@ -0,0 +1,93 @@
+"""
+Image pre-processing benchmark: payload bytes and extraction latency with the
+pre-processing stage on and off.
+
+Uses synthetic phone-sized prescription photos (or every *.jpg in --images)
+and a fake Gemini model whose latency grows with the uploaded payload
+(--bandwidth bytes/second on top of a fixed --delay).
+
+Usage (from backend/):
+    python benchmarks/bench_image_preprocessing.py [--images DIR] [--count 6]
+"""
+import argparse
+import asyncio
+import glob
+import os
+import random
+import statistics
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.core.config import settings
+from app.services import gemini_service, image_preprocessing
+
+
+def synthetic_photo(path, seed):
+    """A 4032x3024 'phone photo' of a handwritten-ish prescription on a desk."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", (4032, 3024), (90, 70, 55))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((500, 250, 3500, 2800), fill=(245, 243, 236))
+    for line in range(18):
+        y = 400 + line * 130
+        x = 650
+        while x < 3200:
+            w = rng.randint(60, 260)
+            draw.line((x, y + rng.randint(-8, 8), x + w, y + rng.randint(-8, 8)),
+                      fill=(rng.randint(10, 60), rng.randint(10, 60), rng.randint(80, 140)), width=7)
+            x += w + rng.randint(30, 90)
+    noise = Image.effect_noise(img.size, 25).convert("RGB")
+    img = Image.blend(img, noise, 0.12).filter(ImageFilter.GaussianBlur(1))
+    img.save(path, format="JPEG", quality=95)
+
+
+async def run_pass(paths, enabled, model):
+    settings.IMAGE_PREPROCESSING_ENABLED = enabled
+    model.payload_bytes.clear()
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        await gemini_service.extract_medicines_from_prescription(path)
+        latencies.append(time.perf_counter() - start)
+    return sum(model.payload_bytes), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", help="directory of .jpg prescriptions (default: synthetic photos)")
+    parser.add_argument("--count", type=int, default=6)
+    parser.add_argument("--delay", type=float, default=0.5, help="fixed fake model latency (s)")
+    parser.add_argument("--bandwidth", type=float, default=2_000_000, help="fake upload bytes/second")
+    args = parser.parse_args()
+
+    if args.images:
+        paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")))
+    else:
+        paths = []
+        for i in range(args.count):
+            path = f"synthetic-{i}.jpg"
+            synthetic_photo(path, i)
+            paths.append(path)
+
+    model = common.FakeGeminiModel(delay=args.delay, upload_bytes_per_second=args.bandwidth)
+    gemini_service.set_model(model)
+
+    raw_bytes = sum(os.path.getsize(p) for p in paths)
+    off_bytes, off_lat = asyncio.run(run_pass(paths, False, model))
+    on_bytes, on_lat = asyncio.run(run_pass(paths, True, model))
+    image_preprocessing.shutdown_pool()
+
+    print(f"Images            : {len(paths)} ({raw_bytes / len(paths) / 1e6:.2f} MB avg on disk)")
+    print(f"Settings          : max {settings.IMAGE_MAX_DIMENSION}px, quality {settings.IMAGE_JPEG_QUALITY}, "
+          f"grayscale={settings.IMAGE_GRAYSCALE}, crop={settings.IMAGE_CROP_MARGINS}")
+    print(f"Payload (off)     : {off_bytes / len(paths) / 1e6:.2f} MB/scan")
+    print(f"Payload (on)      : {on_bytes / len(paths) / 1e6:.2f} MB/scan ({on_bytes / off_bytes:.1%} of original)")
+    print(f"Latency off p50   : {statistics.median(off_lat):.2f}s  max {max(off_lat):.2f}s")
+    print(f"Latency on  p50   : {statistics.median(on_lat):.2f}s  max {max(on_lat):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Cost of an unchanged /inventory poll: recompute vs response cache vs 304.
+
+Seeds --skus synthetic medicines, sets up the catalog version row and
+awaits the get_inventory endpoint function directly (no HTTP stack) for one
+page of --limit rows:
+
+  uncached     : version row not set up, every poll rebuilds the page
+  cache hit    : same query and catalog version, body served from memory
+  304          : If-None-Match carries the current ETag
+
+Then one stock write bumps the version and the next poll misses. Also
+times a bulk stock decrement with and without its commit-time version bump.
+
+Usage (from backend/):
+    python benchmarks/bench_inventory_cache.py [--skus 20000] [--limit 100] [--polls 2000]
+"""
+import argparse
+import asyncio
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import update
+
+from app.api.endpoints import get_inventory
+from app.core.database import AsyncSessionLocal, SessionLocal, engine
+from app.models.all_models import Medicine
+from app.services import catalog_version
+from app.services.inventory import inventory_response_cache
+
+
+async def poll_us(db, polls, limit, if_none_match=None):
+    latencies = []
+    for _ in range(polls):
+        started = time.perf_counter()
+        response = await get_inventory(search=None, low_stock_only=False, cursor=None, limit=limit,
+                                       if_none_match=if_none_match, db=db)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return common.percentile(latencies, 50), common.percentile(latencies, 99), response
+
+
+def decrement_ms(ids, column="current_stock"):
+    table = Medicine.__table__
+    db = SessionLocal()
+    started = time.perf_counter()
+    db.execute(update(table).where(table.c.id.in_(ids)).values({column: table.c[column] - 1}))
+    db.commit()
+    db.close()
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(args):
+    with SessionLocal() as sync_db:
+        ids = [m for (m,) in sync_db.query(Medicine.id).limit(4000)]
+    db = AsyncSessionLocal()
+
+    p50, p99, _ = await poll_us(db, max(50, args.polls // 20), args.limit)
+    print(f"uncached  : p50 {p50:8.1f} us | p99 {p99:8.1f} us")
+
+    catalog_version.ensure_catalog_version(engine)
+    await poll_us(db, 1, args.limit)  # fill the cache
+    p50, p99, response = await poll_us(db, args.polls, args.limit)
+    etag = response.headers["etag"]
+    print(f"cache hit : p50 {p50:8.1f} us | p99 {p99:8.1f} us | {len(response.body) / 1024:.0f} KB body")
+    p50, p99, response = await poll_us(db, args.polls, args.limit, if_none_match=etag)
+    print(f"304       : p50 {p50:8.1f} us | p99 {p99:8.1f} us | status {response.status_code}")
+
+    # reorder_quantity isn't shown by /inventory, so that write doesn't bump the version
+    write_unlisted = decrement_ms(ids[:2000], "reorder_quantity")
+    write_listed = decrement_ms(ids[2000:])
+    await db.rollback()  # end the read transaction so the next poll sees the write
+    started = time.perf_counter()
+    response = await get_inventory(search=None, low_stock_only=False, cursor=None, limit=args.limit,
+                                   if_none_match=etag, db=db)
+    print(f"after write: status {response.status_code}, etag {etag} -> {response.headers['etag']}, "
+          f"{(time.perf_counter() - started) * 1e6:.0f} us")
+    print(f"2000-row decrement: {write_unlisted:.1f} ms unlisted column, {write_listed:.1f} ms stock column (bumps the version once)")
+    print(f"cached entries: {len(inventory_response_cache._entries)}")
+    await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--polls", type=int, default=2000)
+    args = parser.parse_args()
+
+    common.seed_catalog(extra_skus=args.skus)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Full-catalog export: one materialized JSON document vs the streaming export.
+
+Grows the catalog to each of --sizes medicines and measures:
+
+  materialized : every row as a dict in one list, json.dumps'd at once
+                 (what /inventory used to do for the whole catalog)
+  ndjson / csv : consuming export_chunks() through ndjson_lines/csv_lines
+
+reporting time, rows/s and peak Python allocations (one separate tracemalloc
+run). Finally streams GET /api/inventory/export over a real uvicorn server
+and reports time to first byte and throughput.
+
+Usage (from backend/):
+    python benchmarks/bench_inventory_export.py [--sizes 10000,100000] [--chunk 1000]
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import common  # noqa: F401  (must precede app imports)
+
+import httpx
+from sqlalchemy import insert, select
+
+from app.core.database import SessionLocal
+from app.main import app
+from app.models.all_models import Medicine
+from app.services.inventory import EXPORT_COLUMNS, csv_lines, export_chunks, export_row, ndjson_lines
+
+
+def grow_catalog(target, rng):
+    db = SessionLocal()
+    current = db.query(Medicine).count()
+    rows = [{"generic_name": f"Exportmed {i:07d}", "brand_names": [f"EX{i}"], "strength": "10 mg", "form": "Tablet",
+             "unit_price": round(rng.uniform(1, 50), 2), "gst_rate": 12.0, "current_stock": rng.randint(0, 500),
+             "min_stock_level": 50, "manufacturer": rng.choice(["Acme Labs", "Generic Pharma Co", "Sunrise"])}
+            for i in range(current, target)]
+    for start in range(0, len(rows), 10000):
+        db.execute(insert(Medicine), rows[start:start + 10000])
+    db.commit()
+    db.close()
+
+
+def materialized(chunk):
+    db = SessionLocal()
+    rows = [export_row(m, {}) for m in db.execute(select(*EXPORT_COLUMNS).order_by(Medicine.generic_name)).all()]
+    body = json.dumps({"medicines": rows})
+    db.close()
+    return len(body)
+
+
+def streamed(serializer, chunk):
+    db = SessionLocal()
+    size = sum(len(part) for part in serializer(export_chunks(db, chunk)))
+    db.close()
+    return size
+
+
+def measure(fn):
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--chunk", type=int, default=1000)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    rng = random.Random(4)
+    mb = 1024 * 1024
+    for size in (int(s) for s in args.sizes.split(",")):
+        grow_catalog(size, rng)
+        for label, fn in (("materialized", lambda: materialized(args.chunk)),
+                          ("ndjson", lambda: streamed(ndjson_lines, args.chunk)),
+                          ("csv", lambda: streamed(csv_lines, args.chunk))):
+            elapsed, peak, body = measure(fn)
+            print(f"{size:7d} rows | {label:<12} {elapsed:6.2f}s | {size / elapsed:8.0f} rows/s | "
+                  f"peak alloc {peak / mb:7.1f} MB | output {body / mb:6.1f} MB")
+
+    with common.serve_app(app) as base_url:
+        with httpx.Client(timeout=None) as client:
+            started = time.perf_counter()
+            with client.stream("GET", f"{base_url}/api/inventory/export", params={"format": "csv"}) as response:
+                first_byte = None
+                received = 0
+                for part in response.iter_bytes():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    received += len(part)
+            elapsed = time.perf_counter() - started
+    print(f"HTTP csv export: first byte after {first_byte * 1000:.0f} ms, {received / mb:.1f} MB in "
+          f"{elapsed:.2f}s ({received / mb / elapsed:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
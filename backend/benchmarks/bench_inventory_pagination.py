@@ -0,0 +1,107 @@
+"""
+GET /inventory cost as the catalog grows: full listing vs keyset pages.
+
+Grows the catalog to each of --sizes medicines and times, per request:
+
+  full  : the original endpoint body (every Medicine ORM object -> dict list)
+  first : inventory_page() without a cursor
+  deep  : inventory_page() with a cursor 90% of the way through the catalog
+
+Reports p50 latency, peak Python allocations (from one extra tracemalloc
+run) and JSON response size. The paged rows should stay flat while the full
+listing grows linearly.
+
+Usage (from backend/):
+    python benchmarks/bench_inventory_pagination.py [--sizes 1000,10000,100000] [--requests 30] [--page-size 100]
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import insert, select
+
+from app.core.database import SessionLocal
+from app.models.all_models import Medicine
+from app.services.inventory import encode_cursor, inventory_page
+from app.services.reservations import reserved_quantities
+
+
+def legacy_inventory(db):
+    # The pre-pagination endpoint body
+    medicines = db.query(Medicine).all()
+    reserved = reserved_quantities(db)
+    res_list = []
+    for m in medicines:
+        res_list.append({
+            "id": m.id, "generic_name": m.generic_name, "brand_names": m.brand_names, "strength": m.strength,
+            "current_stock": m.current_stock, "reserved_stock": reserved.get(m.id, 0),
+            "available_stock": max(0, m.current_stock - reserved.get(m.id, 0)),
+            "min_stock_level": m.min_stock_level, "unit_price": float(m.unit_price),
+            "stock_status": "LOW" if m.current_stock < m.min_stock_level else "OK"
+        })
+    return {"medicines": res_list}
+
+
+def grow_catalog(db, target, rng):
+    current = db.query(Medicine).count()
+    rows = [{"generic_name": f"Growmed {i:07d}", "brand_names": [f"GM{i}", f"Grow {i}"], "strength": "10 mg",
+             "form": "Tablet", "unit_price": round(rng.uniform(1, 50), 2), "gst_rate": 5.0,
+             "current_stock": rng.randint(0, 500), "min_stock_level": 50}
+            for i in range(current, target)]
+    for start in range(0, len(rows), 10000):
+        db.execute(insert(Medicine), rows[start:start + 10000])
+    db.commit()
+
+
+def measure(fn, requests):
+    latencies = []
+    for _ in range(requests):
+        db = SessionLocal()
+        started = time.perf_counter()
+        fn(db)
+        latencies.append((time.perf_counter() - started) * 1000)
+        db.close()
+    # One more run under tracemalloc (it slows allocation down, so kept out of the timings)
+    db = SessionLocal()
+    tracemalloc.start()
+    body = fn(db)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.close()
+    return common.percentile(latencies, 50), peak, len(json.dumps(body))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    rng = random.Random(5)
+    for size in (int(s) for s in args.sizes.split(",")):
+        db = SessionLocal()
+        grow_catalog(db, size, rng)
+        deep = db.execute(select(Medicine.generic_name, Medicine.id).order_by(Medicine.generic_name, Medicine.id)
+                          .offset(int(size * 0.9)).limit(1)).first()
+        db.close()
+        cursor = encode_cursor(deep.generic_name, deep.id)
+        modes = {
+            "full": legacy_inventory,
+            "first": lambda db: inventory_page(db, args.page_size),
+            "deep": lambda db: inventory_page(db, args.page_size, cursor),
+        }
+        for label, fn in modes.items():
+            requests = args.requests if label != "full" else max(3, args.requests // 10)
+            p50, peak, body = measure(fn, requests)
+            print(f"{size:7d} medicines | {label:<5} p50 {p50:9.2f} ms | peak alloc {peak / 1024:9.0f} KB | "
+                  f"response {body / 1024:8.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Inventory search on a large catalog: ILIKE scan vs the full-text index.
+
+Seeds the catalog plus --skus synthetic medicines with pronounceable random
+names, brands and manufacturers, then times inventory_page(search=...) for a
+set of realistic queries (prefixes, brand names, "name strength") with:
+
+  ilike : the fallback filter (generic_name / brand JSON ILIKE '%term%')
+  fts   : after ensure_search_index() (FTS5 on SQLite)
+
+Also times a stock-only UPDATE burst with the index in place, to show the
+sync triggers don't fire on stock movements.
+
+Usage (from backend/):
+    python benchmarks/bench_inventory_search.py [--skus 100000] [--repeat 20]
+"""
+import argparse
+import random
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import insert, update
+
+from app.core.database import SessionLocal, engine
+from app.models.all_models import Medicine
+from app.services import search_index
+from app.services.inventory import inventory_page
+
+SYLLABLES = ["ab", "ace", "al", "am", "ben", "bis", "car", "cef", "clo", "cor", "dex", "di", "dol", "dox", "en",
+             "fen", "flu", "gab", "glu", "hy", "ib", "ket", "la", "lev", "lo", "lor", "mag", "met", "mi", "mox",
+             "na", "nex", "ni", "ol", "on", "pan", "para", "pi", "pre", "pro", "qui", "ran", "ri", "ro", "sal",
+             "se", "sul", "ta", "tel", "ti", "tri", "ur", "va", "vas", "ver", "xi", "ya", "ze", "zol", "zy"]
+QUERIES = ["para", "Paracetamol", "dolo 650", "amox", "augmentin", "pan 40", "metfor", "cefzol", "vasoxi", "zz"]
+
+
+def random_name(rng, parts):
+    return "".join(rng.choice(SYLLABLES) for _ in range(parts)).capitalize()
+
+
+def seed_skus(count, rng):
+    rows, seen = [], set()
+    while len(rows) < count:
+        name = f"{random_name(rng, 3)} {random_name(rng, 2)}"
+        if name in seen:
+            continue
+        seen.add(name)
+        rows.append({"generic_name": name, "brand_names": [random_name(rng, 2) for _ in range(rng.randint(0, 3))],
+                     "strength": f"{rng.choice([5, 10, 20, 40, 250, 500, 650])} mg", "form": "Tablet",
+                     "unit_price": round(rng.uniform(1, 50), 2), "gst_rate": 5.0, "current_stock": 100,
+                     "min_stock_level": 10, "manufacturer": f"{random_name(rng, 2)} Pharma"})
+    db = SessionLocal()
+    for start in range(0, len(rows), 10000):
+        db.execute(insert(Medicine), rows[start:start + 10000])
+    db.commit()
+    db.close()
+
+
+def time_queries(label, repeat):
+    db = SessionLocal()
+    for query in QUERIES:
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows, _ = inventory_page(db, 20, search=query)
+            latencies.append((time.perf_counter() - started) * 1000)
+        top = rows[0]["generic_name"] if rows else "-"
+        print(f"{label:<5} {query!r:<14} p50 {common.percentile(latencies, 50):8.2f} ms | "
+              f"p99 {common.percentile(latencies, 99):8.2f} ms | {len(rows):2d} hits, top {top}")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    seed_skus(args.skus, random.Random(11))
+
+    time_queries("ilike", max(3, args.repeat // 5))
+
+    started = time.perf_counter()
+    search_index.ensure_search_index(engine)
+    print(f"index build over {args.skus} SKUs: {time.perf_counter() - started:.2f}s")
+    time_queries("fts", args.repeat)
+
+    db = SessionLocal()
+    ids = [m for (m,) in db.query(Medicine.id).limit(5000)]
+    started = time.perf_counter()
+    db.execute(update(Medicine.__table__).where(Medicine.__table__.c.id.in_(ids))
+               .values(current_stock=Medicine.__table__.c.current_stock - 1))
+    db.commit()
+    print(f"stock update of {len(ids)} rows with the index in place: {(time.perf_counter() - started) * 1000:.1f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
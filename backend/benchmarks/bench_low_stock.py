@@ -0,0 +1,88 @@
+"""
+Low-stock listing and count: full table scan vs the ix_medicines_low_stock
+partial index.
+
+Seeds --skus synthetic medicines, --low-rate of them below their minimum
+stock, and times inventory_page(low_stock_only=True) and low_stock_count()
+without the index, then with it. Finally times a burst of stock decrements
+that move rows into the low-stock set, to show what keeping the index
+current costs on writes.
+
+Usage (from backend/):
+    python benchmarks/bench_low_stock.py [--skus 100000] [--low-rate 0.01] [--repeat 50]
+"""
+import argparse
+import random
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import insert, text, update
+
+from app.core.database import SessionLocal, engine
+from app.models.all_models import Medicine
+from app.services.inventory import ensure_low_stock_index, inventory_page, low_stock_count
+
+
+def seed(skus, low_rate, rng):
+    rows = [{"generic_name": f"Lowmed {i:07d}", "brand_names": [], "strength": "10 mg", "form": "Tablet",
+             "unit_price": 5, "gst_rate": 5.0, "min_stock_level": 50,
+             "current_stock": rng.randint(0, 49) if rng.random() < low_rate else rng.randint(50, 500)}
+            for i in range(skus)]
+    db = SessionLocal()
+    for start in range(0, len(rows), 10000):
+        db.execute(insert(Medicine), rows[start:start + 10000])
+    db.commit()
+    db.close()
+
+
+def time_reads(label, repeat):
+    db = SessionLocal()
+    for name, fn in (("list", lambda: inventory_page(db, 100, low_stock_only=True)), ("count", lambda: low_stock_count(db))):
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = fn()
+            latencies.append((time.perf_counter() - started) * 1000)
+        found = len(result[0]) if name == "list" else result
+        print(f"{label:<9} {name:<5} p50 {common.percentile(latencies, 50):8.2f} ms | p99 "
+              f"{common.percentile(latencies, 99):8.2f} ms | {found} rows")
+    db.close()
+
+
+def time_writes(label, ids):
+    table = Medicine.__table__
+    db = SessionLocal()
+    started = time.perf_counter()
+    for medicine_id in ids:
+        db.execute(update(table).where(table.c.id == medicine_id).values(current_stock=table.c.current_stock - 10))
+    db.commit()
+    elapsed = time.perf_counter() - started
+    db.close()
+    print(f"{label:<9} {len(ids)} single-row stock decrements: {elapsed / len(ids) * 1e6:7.1f} us each")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=100000)
+    parser.add_argument("--low-rate", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    seed(args.skus, args.low_rate, random.Random(9))
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_medicines_low_stock"))
+    db = SessionLocal()
+    ids = [m for (m,) in db.query(Medicine.id).order_by(Medicine.id).limit(4000)]
+    db.close()
+
+    time_reads("no index", max(5, args.repeat // 10))
+    time_writes("no index", ids[:2000])
+    ensure_low_stock_index(engine)
+    time_reads("partial", args.repeat)
+    time_writes("partial", ids[2000:])
+
+
+if __name__ == "__main__":
+    main()
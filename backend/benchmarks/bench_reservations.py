@@ -0,0 +1,97 @@
+"""
+Cost of stock reservation lookups on the scan path.
+
+Seeds the catalog plus --extra-skus synthetic medicines, then grows the
+stock_reservations table (half active, half expired) and, at each size,
+times reserved_quantities() for one prescription's medicines and the full
+match_scans() step. Also prints the query plan to show the covering index
+is used.
+
+Usage (from backend/):
+    python benchmarks/bench_reservations.py [--sizes 0,10000,100000] [--scans 200]
+"""
+import argparse
+import copy
+import random
+import time
+from datetime import datetime, timedelta
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import insert, text
+
+from app.core.database import SessionLocal, engine
+from app.data.medicines_data import MEDICINES_DATA
+from app.models.all_models import Bill, Medicine, StockReservation
+from app.services import scan_pipeline
+from app.services.extraction_parser import parse_gemini_data
+from app.services.reservations import reserved_quantities
+
+
+def grow_reservations(db, target, medicine_ids, bill_ids, rng):
+    current = db.query(StockReservation).count()
+    now = datetime.utcnow()
+    rows = []
+    for i in range(target - current):
+        # Half still active, half already expired (what the sweeper clears)
+        offset = timedelta(minutes=rng.randint(1, 30)) * (1 if i % 2 else -1)
+        rows.append({"bill_id": rng.choice(bill_ids), "medicine_id": rng.choice(medicine_ids),
+                     "quantity": rng.randint(1, 20), "expires_at": now + offset})
+    for start in range(0, len(rows), 10000):
+        db.execute(insert(StockReservation), rows[start:start + 10000])
+    db.commit()
+
+
+def make_scan():
+    extraction = copy.deepcopy(common.FAKE_EXTRACTION)
+    extraction["medicines"] = [
+        {"generic_name": med["generic_name"], "quantity_prescribed": 2} for med in MEDICINES_DATA[:8]
+    ]
+    return {"image_key": "prescriptions/00/00/bench.jpg", "content_hash": "0" * 64, "phash": None, "timings": {},
+            "cached": True, "prescription": None, "extraction": parse_gemini_data(extraction)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="0,10000,100000")
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--extra-skus", type=int, default=5000)
+    args = parser.parse_args()
+
+    common.seed_catalog(extra_skus=args.extra_skus)
+    rng = random.Random(3)
+    db = SessionLocal()
+    medicine_ids = [m for (m,) in db.query(Medicine.id)]
+    bills = [Bill(bill_number=f"RES-{i}", subtotal=0, total_gst=0, final_amount=0) for i in range(1000)]
+    db.add_all(bills)
+    db.commit()
+    bill_ids = [b.id for b in bills]
+    prescription_ids = [m for (m,) in db.query(Medicine.id).filter(
+        Medicine.generic_name.in_([m["generic_name"] for m in MEDICINES_DATA[:8]]))]
+
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT medicine_id, sum(quantity) FROM stock_reservations "
+            "WHERE expires_at > :now AND medicine_id IN ('a', 'b') GROUP BY medicine_id"), {"now": datetime.utcnow()}).all()
+    print("plan:", " | ".join(row[-1] for row in plan))
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        grow_reservations(db, size, medicine_ids, bill_ids, rng)
+        lookup_ms, match_ms = [], []
+        for _ in range(args.scans):
+            started = time.perf_counter()
+            reserved_quantities(db, prescription_ids)
+            lookup_ms.append((time.perf_counter() - started) * 1000)
+            scan = make_scan()
+            started = time.perf_counter()
+            scan_pipeline.match_scans(db, [scan])
+            match_ms.append((time.perf_counter() - started) * 1000)
+            db.rollback()
+        print(f"{size:7d} reservations | lookup p50 {common.percentile(lookup_ms, 50):6.3f} ms "
+              f"p99 {common.percentile(lookup_ms, 99):6.3f} ms | match_scans p50 {common.percentile(match_ms, 50):6.3f} ms "
+              f"p99 {common.percentile(match_ms, 99):6.3f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
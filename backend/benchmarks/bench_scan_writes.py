@@ -0,0 +1,103 @@
+"""
+Scan write-path benchmark: SQL statements, commits and write latency per scan.
+
+"before" replays the original sequence (commit + refresh after the
+Prescription, again after the Bill, then one INSERT per BillItem and a third
+commit); "after" is persist_scans(), one flush-for-ids unit of work with a
+bulk BillItem insert and a single commit. Extraction is a fixed payload, so
+only the write path is measured.
+
+Usage (from backend/):
+    python benchmarks/bench_scan_writes.py [--scans 200] [--lines 8]
+"""
+import argparse
+import copy
+import statistics
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import event
+
+from app.core.database import SessionLocal, engine
+from app.data.medicines_data import MEDICINES_DATA
+from app.models.all_models import BillItem
+from app.services import scan_pipeline
+from app.services.extraction_parser import parse_gemini_data
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+    def reset(self):
+        self.statements = self.commits = 0
+
+
+def legacy_persist(db, scan):
+    prescription = scan_pipeline.new_prescription(scan)
+    db.add(prescription)
+    db.commit()
+    db.refresh(prescription)
+    bill = scan_pipeline.new_bill(scan, prescription.id)
+    db.add(bill)
+    db.commit()
+    db.refresh(bill)
+    for row in scan_pipeline.bill_item_rows(scan, bill.id):
+        db.add(BillItem(**row))
+    db.commit()
+
+
+def make_scan(lines):
+    extraction = copy.deepcopy(common.FAKE_EXTRACTION)
+    extraction["medicines"] = [
+        {"generic_name": med["generic_name"], "quantity_prescribed": 2, "frequency": "1-0-1", "duration": "5 days"}
+        for med in MEDICINES_DATA[:lines]
+    ]
+    return {"image_key": "prescriptions/00/00/bench.jpg", "content_hash": "0" * 64, "phash": None, "timings": {},
+            "cached": True, "prescription": None, "extraction": parse_gemini_data(extraction)}
+
+
+def measure(label, persist, scans, lines, counter):
+    latencies, statements, commits = [], [], []
+    db = SessionLocal()
+    try:
+        for _ in range(scans):
+            scan = make_scan(lines)
+            scan_pipeline.match_scans(db, [scan])
+            counter.reset()
+            start = time.perf_counter()
+            persist(db, scan)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statements.append(counter.statements)
+            commits.append(counter.commits)
+    finally:
+        db.close()
+    print(f"{label:<7} statements/scan {statistics.mean(statements):5.1f}   commits/scan {statistics.mean(commits):3.1f}   "
+          f"write p50 {common.percentile(latencies, 50):6.2f} ms   p99 {common.percentile(latencies, 99):6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=8, help="matched medicines per prescription")
+    args = parser.parse_args()
+
+    common.seed_catalog()
+    counter = StatementCounter()
+    print(f"{args.scans} scans x {args.lines} matched lines")
+    measure("before", legacy_persist, args.scans, args.lines, counter)
+    measure("after", lambda db, scan: scan_pipeline.persist_scans(db, [scan]), args.scans, args.lines, counter)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Concurrent write throughput on SQLite: driver defaults vs the production pragmas.
+
+Each round seeds a fresh database file with --skus medicines, then runs
+--writers threads doing confirm-shaped transactions (decrement a medicine's
+stock, append a DISPENSED ledger row, commit) next to --readers threads paging
+through /inventory, for --seconds. Two engines per writer count:
+
+  defaults : create_engine(url) as before (rollback journal, synchronous=FULL,
+             the driver's 5 s lock timeout, SQLAlchemy's 5+10 pool)
+  tuned    : engine_options() + configure_sqlite(), i.e. the DB_POOL_* and
+             SQLITE_* settings (WAL, busy_timeout, synchronous=NORMAL, mmap, cache)
+
+reporting committed writes/s, reads/s, write p50/p99 latency and the
+transactions that failed with "database is locked" (or a pool timeout).
+
+Usage (from backend/):
+    python benchmarks/bench_sqlite_pragmas.py [--writers 1,4,16] [--readers 4] [--seconds 10] [--skus 5000]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+
+import common  # noqa: F401  (must precede app imports)
+
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, configure_sqlite, engine_options
+from app.models.all_models import InventoryTransaction, Medicine
+from app.services.inventory import inventory_page
+
+
+def make_engine(mode, writers):
+    url = f"sqlite:///{os.path.abspath(f'pragmas-{mode}-{writers}.db')}"
+    if mode == "defaults":
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    configure_sqlite(engine)
+    return engine
+
+
+def seed(engine, skus):
+    Base.metadata.create_all(bind=engine)
+    rows = [{"id": f"med-{i:06d}", "generic_name": f"Benchmed {i:06d}", "brand_names": [], "strength": "500 mg",
+             "form": "Tablet", "unit_price": 10, "current_stock": 10 ** 9} for i in range(skus)]
+    with engine.begin() as conn:
+        conn.execute(insert(Medicine), rows)
+    return [row["id"] for row in rows]
+
+
+def run_round(mode, writers, readers, seconds, skus):
+    engine = make_engine(mode, writers)
+    ids = seed(engine, skus)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    write_ms, reads, errors = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(seed_):
+        rng = random.Random(seed_)
+        while time.perf_counter() < deadline:
+            med_id = rng.choice(ids)
+            started = time.perf_counter()
+            db = Session()
+            try:
+                db.execute(update(Medicine).where(Medicine.id == med_id)
+                           .values(current_stock=Medicine.current_stock - 1))
+                db.execute(insert(InventoryTransaction).values(
+                    medicine_id=med_id, transaction_type="DISPENSED", quantity_change=-1,
+                    stock_before=0, stock_after=0))
+                db.commit()
+                with lock:
+                    write_ms.append((time.perf_counter() - started) * 1000)
+            except (OperationalError, PoolTimeoutError):
+                db.rollback()
+                with lock:
+                    errors[0] += 1
+            finally:
+                db.close()
+
+    def reader(seed_):
+        rng = random.Random(seed_)
+        while time.perf_counter() < deadline:
+            db = Session()
+            try:
+                inventory_page(db, 50, search=rng.choice([None, "Benchmed 00"]))
+                with lock:
+                    reads[0] += 1
+            except (OperationalError, PoolTimeoutError):
+                with lock:
+                    errors[0] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(1000 + i,)) for i in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    if write_ms:
+        latency = f"p50 {common.percentile(write_ms, 50):7.1f} ms | p99 {common.percentile(write_ms, 99):7.1f} ms"
+    else:
+        latency = "no committed writes"
+    print(f"{writers:3d} writers | {mode:<8} {len(write_ms) / elapsed:7.1f} writes/s | {reads[0] / elapsed:7.1f} reads/s"
+          f" | {latency} | locked {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", default="1,4,16")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--skus", type=int, default=5000)
+    args = parser.parse_args()
+
+    for writers in (int(w) for w in args.writers.split(",")):
+        for mode in ("defaults", "tuned"):
+            run_round(mode, writers, args.readers, args.seconds, args.skus)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Prescription image storage: legacy flat uuid files vs content-addressed storage.
+
+Uploads --uploads images of --size KB, of which --dup-rate are re-uploads of
+an earlier image, through:
+  - legacy : synchronous copyfileobj into uploads/prescriptions/<uuid4>.jpg
+  - local  : storage.save_upload() into sharded content-addressed paths
+  - s3     : storage.save_upload() into S3Storage over an in-memory S3 stand-in
+and reports time, objects/bytes stored and the largest directory. It then
+checks the streaming size limit and the retention sweep.
+
+Usage (from backend/):
+    python benchmarks/bench_upload_storage.py [--uploads 2000] [--size 400] [--dup-rate 0.3]
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import shutil
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+import common  # noqa: F401  (must precede app imports)
+
+from fastapi import UploadFile
+
+from app.services import storage
+
+
+def make_payloads(count, size_kb, dup_rate, seed=7):
+    rng = random.Random(seed)
+    unique = []
+    payloads = []
+    for _ in range(count):
+        if unique and rng.random() < dup_rate:
+            payloads.append(rng.choice(unique))
+        else:
+            data = rng.randbytes(size_kb * 1024)
+            unique.append(data)
+            payloads.append(data)
+    return payloads
+
+
+def legacy_save(data):
+    upload_dir = Path("legacy/prescriptions")
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    with open(upload_dir / f"{uuid.uuid4()}.jpg", "wb") as out:
+        shutil.copyfileobj(io.BytesIO(data), out)
+
+
+def disk_usage(root):
+    files = [p for p in Path(root).rglob("*") if p.is_file() and ".staging" not in p.parts]
+    per_dir = Counter(p.parent for p in files)
+    return len(files), sum(p.stat().st_size for p in files), max(per_dir.values(), default=0)
+
+
+async def save_all(payloads):
+    for data in payloads:
+        await storage.save_upload(UploadFile(file=io.BytesIO(data)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=400, help="KB per image")
+    parser.add_argument("--dup-rate", type=float, default=0.3)
+    args = parser.parse_args()
+    payloads = make_payloads(args.uploads, args.size, args.dup_rate)
+    mb = 1024 * 1024
+
+    started = time.perf_counter()
+    for data in payloads:
+        legacy_save(data)
+    elapsed = time.perf_counter() - started
+    files, size, widest = disk_usage("legacy")
+    print(f"legacy : {elapsed:6.2f}s | {files} files, {size / mb:7.1f} MB | largest directory {widest} files")
+
+    storage.set_storage(storage.LocalStorage("local"))
+    started = time.perf_counter()
+    asyncio.run(save_all(payloads))
+    elapsed = time.perf_counter() - started
+    files, size, widest = disk_usage("local")
+    print(f"local  : {elapsed:6.2f}s | {files} files, {size / mb:7.1f} MB | largest directory {widest} files")
+
+    client = common.FakeS3Client()
+    s3 = storage.S3Storage(client, bucket="bench", prefix="medease")
+    storage.set_storage(s3)
+    started = time.perf_counter()
+    asyncio.run(save_all(payloads))
+    elapsed = time.perf_counter() - started
+    stored = sum(len(data) for data, _ in client.objects.values())
+    print(f"s3     : {elapsed:6.2f}s | {len(client.objects)} objects, {stored / mb:7.1f} MB | {client.requests} requests")
+    key, _ = asyncio.run(storage.save_upload(UploadFile(file=io.BytesIO(payloads[0]))))
+    assert s3.read(key) == payloads[0], "S3 read-back mismatch"
+
+    # Oversized upload: rejected after reading just past the limit
+    storage.set_storage(storage.LocalStorage("local"))
+    oversized = io.BytesIO(os.urandom(8 * mb))
+    try:
+        asyncio.run(storage.save_upload(UploadFile(file=oversized), max_bytes=2 * mb))
+        print("limit  : NOT enforced")
+    except storage.UploadTooLarge:
+        print(f"limit  : 8 MB upload rejected after reading {oversized.tell() / mb:.0f} MB (limit 2 MB), "
+              f"staging files left: {len(os.listdir(storage.get_storage().staging_dir))}")
+
+    # Retention: age half the local objects, then sweep
+    local = storage.get_storage()
+    keys = [k for k, _ in local.list_objects()]
+    old = time.time() - 40 * 86400
+    for k in keys[::2]:
+        os.utime(local.path_for(k), (old, old))
+    started = time.perf_counter()
+    removed = storage.sweep_expired(30, local)
+    print(f"sweep  : removed {removed}/{len(keys)} objects older than 30 days in "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Shared helpers for the benchmark scripts: a throwaway SQLite database, a seeded
+catalog and local fakes that stand in for external services.
+
+Import this module BEFORE anything from `app`, so the settings pick up the
+temporary database URL.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+_workdir = tempfile.mkdtemp(prefix="medease-bench-")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{os.path.join(_workdir, 'bench.db')}")
+# The shared Gemini rate limiter would otherwise dominate throughput benchmarks
+os.environ.setdefault("GEMINI_RATE_LIMIT_PER_MINUTE", "0")
+# Uploads are written relative to the working directory
+os.chdir(_workdir)
+
+FAKE_EXTRACTION = {
+    "prescription_metadata": {"patient_name": "Bench Patient", "patient_age": 42, "overall_confidence": 0.93},
+    "clinical_analysis": {"inferred_diagnosis": "Fever", "patient_advice": "Rest", "pharmacist_notes": None},
+    "medicines": [
+        {"generic_name": "Paracetamol", "brand_name": "Dolo 650", "strength": "650 mg", "form": "Tablet",
+         "quantity_prescribed": 10, "frequency": "1-0-1", "duration": "5 days"},
+        {"generic_name": "Amoxycillin", "brand_name": None, "strength": "500 mg", "form": "Capsule",
+         "quantity_prescribed": 15, "frequency": "1-1-1", "duration": "5 days"},
+        {"generic_name": "Pantoprazole", "brand_name": "Pan-40", "strength": "40 mg", "form": "Tablet",
+         "quantity_prescribed": 5, "frequency": "1-0-0", "duration": "5 days"},
+    ],
+    "extraction_quality": {"is_readable": True, "missing_fields": [], "overall_suggestion": None},
+}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeApiError(Exception):
+    """Mimics google.api_core errors, which carry an HTTP status in `.code`."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeGeminiModel:
+    """
+    Stand-in for genai.GenerativeModel that sleeps like a real round trip.
+    With `upload_bytes_per_second` the sleep also grows with the image payload.
+    `quota_error_rate` makes that fraction of calls fail with a 429, and setting
+    `outage = True` makes every call fail with a 503 until it is cleared.
+    `cold_start_delay` is added to the first call only (connection setup).
+    """
+
+    def __init__(self, delay=1.0, extraction=None, upload_bytes_per_second=None, quota_error_rate=0.0, seed=1,
+                 cold_start_delay=0.0):
+        self.delay = delay
+        self.cold_start_delay = cold_start_delay
+        self.extraction = extraction or FAKE_EXTRACTION
+        self.upload_bytes_per_second = upload_bytes_per_second
+        self.quota_error_rate = quota_error_rate
+        self.outage = False
+        self.calls = 0
+        self.failures = 0
+        self.payload_bytes = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, parts, **kwargs):
+        with self._lock:
+            self.calls += 1
+            quota_error = self._rng.random() < self.quota_error_rate
+            cold_start, self.cold_start_delay = self.cold_start_delay, 0.0
+        time.sleep(cold_start)
+        if self.outage or quota_error:
+            time.sleep(self.delay / 10)
+            with self._lock:
+                self.failures += 1
+            if self.outage:
+                raise FakeApiError(503, "Service Unavailable")
+            raise FakeApiError(429, "Resource has been exhausted (e.g. check quota).")
+        size = sum(len(p["data"]) for p in parts if isinstance(p, dict) and "data" in p)
+        self.payload_bytes.append(size)
+        delay = self.delay
+        if self.upload_bytes_per_second:
+            delay += size / self.upload_bytes_per_second
+        time.sleep(delay)
+        return FakeResponse(json.dumps(self.extraction))
+
+
+class FakeS3Client:
+    """
+    In-memory stand-in for a boto3 S3 client: the subset S3Storage uses, with
+    real-client shapes (Body.read(), LastModified, paginated listings).
+    """
+
+    def __init__(self, page_size=1000):
+        self.objects = {}
+        self.page_size = page_size
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body.read() if hasattr(Body, "read") else Body
+        with self._lock:
+            self.requests += 1
+            self.objects[(Bucket, Key)] = (data, datetime.now(timezone.utc))
+        return {"ETag": hashlib.md5(data).hexdigest()}
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            self.requests += 1
+            data, modified = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(data), "LastModified": modified, "ContentLength": len(data)}
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.requests += 1
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, **kwargs):
+        with self._lock:
+            self.requests += 1
+            keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+            start = int(ContinuationToken or 0)
+            page = keys[start:start + self.page_size]
+            contents = [{"Key": k, "LastModified": self.objects[(Bucket, k)][1],
+                         "Size": len(self.objects[(Bucket, k)][0])} for k in page]
+        result = {"Contents": contents, "IsTruncated": start + len(page) < len(keys)}
+        if result["IsTruncated"]:
+            result["NextContinuationToken"] = str(start + len(page))
+        return result
+
+
+def seed_catalog(extra_skus=0, stock=1000):
+    """Create tables, the MEDICINES_DATA catalog (+ synthetic SKUs) and a PIN 1234 pharmacist."""
+    from app.core.database import Base, SessionLocal, engine
+    from app.data.medicines_data import MEDICINES_DATA
+    from app.models.all_models import Medicine, Pharmacist
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rows = [dict(m) for m in MEDICINES_DATA]
+        rng = random.Random(1)
+        for i in range(extra_skus):
+            rows.append({"generic_name": f"Benchmed {i:06d}", "brand_names": [f"BM{i}"], "strength": "10 mg",
+                         "form": "Tablet", "unit_price": round(rng.uniform(1, 50), 2)})
+        db.bulk_insert_mappings(Medicine, [
+            {"generic_name": r["generic_name"], "brand_names": r["brand_names"], "strength": r["strength"],
+             "form": r["form"], "unit_price": r["unit_price"], "gst_rate": 5.0, "current_stock": stock,
+             "min_stock_level": 50, "manufacturer": "Generic Pharma Co"}
+            for r in rows
+        ])
+        db.add(Pharmacist(name="Bench Pharmacist", license_number="BENCH-001", pin_hash="1234"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+@contextlib.contextmanager
+def serve_app(app, workers_ready_timeout=10):
+    """Run the ASGI app under a real uvicorn server in a background thread; yields the base URL."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + workers_ready_timeout
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("uvicorn did not start")
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
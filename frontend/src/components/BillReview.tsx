@@ -4,6 +4,7 @@ import { AlertCircle, CheckCircle, Printer, Loader2 } from 'lucide-react';
 import { Button, Card, CardContent, CardHeader, CardTitle, Input } from './ui';
 import { ScanResponse } from '../types';
 import { cn, formatCurrency } from '../lib/utils';
+import { PharmacistSession, authHeaders, clearSession, getSession, login } from '../lib/auth';
 
 interface BillReviewProps {
     billData: ScanResponse;
@@ -11,6 +12,8 @@ interface BillReviewProps {
 }
 
 export const BillReview: React.FC<BillReviewProps> = ({ billData, onReset }) => {
+    const [session, setSession] = useState<PharmacistSession | null>(getSession);
+    const [licenseNumber, setLicenseNumber] = useState("");
     const [pin, setPin] = useState("");
     const [isConfirming, setIsConfirming] = useState(false);
     const [confirmed, setConfirmed] = useState(false);
@@ -20,18 +23,31 @@ export const BillReview: React.FC<BillReviewProps> = ({ billData, onReset }) =>
         setIsConfirming(true);
         setError(null);
         try {
+            const current = session ?? await login(licenseNumber, pin);
+            setSession(current);
+            setPin("");
             const apiUrl = import.meta.env.VITE_API_URL || '';
-            await axios.post(`${apiUrl}/api/bills/${billData.bill_id}/confirm`, {
-                pharmacist_pin: pin
+            await axios.post(`${apiUrl}/api/bills/${billData.bill_id}/confirm`, {}, {
+                headers: authHeaders(current)
             });
             setConfirmed(true);
         } catch (err: any) {
+            if (err.response?.status === 401) {
+                // Wrong PIN, or the token expired: ask for the PIN again
+                clearSession();
+                setSession(null);
+            }
             setError(err.response?.data?.detail || "Confirmation failed");
         } finally {
             setIsConfirming(false);
         }
     };
 
+    const handleSwitchPharmacist = () => {
+        clearSession();
+        setSession(null);
+    };
+
     if (confirmed) {
         return (
             <div className="max-w-2xl mx-auto mt-10 text-center">
@@ -171,21 +187,38 @@ export const BillReview: React.FC<BillReviewProps> = ({ billData, onReset }) =>
                                     {error}
                                 </div>
                             )}
-                            <div>
-                                <label className="text-xs font-medium text-slate-700 block mb-1">Enter PIN to Confirm</label>
-                                <Input
-                                    type="password"
-                                    value={pin}
-                                    onChange={(e) => setPin(e.target.value)}
-                                    placeholder="Enter PIN (e.g. 1234)"
-                                    className="text-center tracking-widest"
-                                />
-                            </div>
+                            {session ? (
+                                <div className="flex justify-between items-center text-sm">
+                                    <span className="text-slate-700">Signed in as <span className="font-medium">{session.pharmacistName}</span></span>
+                                    <button onClick={handleSwitchPharmacist} className="text-xs text-blue-600 hover:underline">Switch</button>
+                                </div>
+                            ) : (
+                                <>
+                                    <div>
+                                        <label className="text-xs font-medium text-slate-700 block mb-1">License Number</label>
+                                        <Input
+                                            value={licenseNumber}
+                                            onChange={(e) => setLicenseNumber(e.target.value)}
+                                            placeholder="e.g. PHARM-001"
+                                        />
+                                    </div>
+                                    <div>
+                                        <label className="text-xs font-medium text-slate-700 block mb-1">Enter PIN to Confirm</label>
+                                        <Input
+                                            type="password"
+                                            value={pin}
+                                            onChange={(e) => setPin(e.target.value)}
+                                            placeholder="Enter PIN (e.g. 1234)"
+                                            className="text-center tracking-widest"
+                                        />
+                                    </div>
+                                </>
+                            )}
                             <div className="grid grid-cols-2 gap-2">
                                 <Button variant="outline" onClick={onReset}>Reject</Button>
                                 <Button
                                     onClick={handleConfirm}
-                                    disabled={!pin || isConfirming}
+                                    disabled={(!session && (!licenseNumber || !pin)) || isConfirming}
                                     className="bg-blue-600 hover:bg-blue-700"
                                 >
                                     {isConfirming ? <Loader2 className="animate-spin w-4 h-4" /> : "Confirm Bill"}
@@ -1,22 +1,29 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { Search } from 'lucide-react';
-import { Card, CardHeader, CardTitle, CardContent, Input } from './ui';
+import { Button, Card, CardHeader, CardTitle, CardContent, Input } from './ui';
 import { Medicine } from '../types';
 
 export const InventoryDashboard: React.FC = () => {
     const [medicines, setMedicines] = useState<Medicine[]>([]);
     const [search, setSearch] = useState("");
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+
+    const fetchPage = async (cursor?: string) => {
+        const apiUrl = import.meta.env.VITE_API_URL || '';
+        const response = await axios.get(`${apiUrl}/api/inventory`, {
+            params: { search, cursor }
+        });
+        setNextCursor(response.data.next_cursor);
+        return response.data.medicines as Medicine[];
+    };
 
     useEffect(() => {
         const fetchInventory = async () => {
             try {
-                const apiUrl = import.meta.env.VITE_API_URL || '';
-                const response = await axios.get(`${apiUrl}/api/inventory`, {
-                    params: { search }
-                });
-                setMedicines(response.data.medicines);
+                setMedicines(await fetchPage());
             } catch (err) {
                 console.error(err);
             } finally {
@@ -28,6 +35,19 @@ export const InventoryDashboard: React.FC = () => {
         return () => clearTimeout(timeout);
     }, [search]);
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const page = await fetchPage(nextCursor);
+            setMedicines((prev) => [...prev, ...page]);
+        } catch (err) {
+            console.error(err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     return (
         <div className="max-w-6xl mx-auto mt-6 p-4">
             <div className="flex justify-between items-center mb-6">
@@ -88,6 +108,13 @@ export const InventoryDashboard: React.FC = () => {
                         {medicines.length === 0 && !loading && (
                             <div className="text-center py-8 text-slate-500">No medicines found.</div>
                         )}
+                        {nextCursor && !loading && (
+                            <div className="text-center py-4">
+                                <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                                    {loadingMore ? "Loading..." : "Load more"}
+                                </Button>
+                            </div>
+                        )}
                     </div>
                 </CardContent>
             </Card>
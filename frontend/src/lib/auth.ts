@@ -0,0 +1,51 @@
+import axios from 'axios';
+
+export interface PharmacistSession {
+    token: string;
+    pharmacistId: string;
+    pharmacistName: string;
+    expiresAt: number;
+}
+
+const STORAGE_KEY = 'medease.pharmacistSession';
+
+// A token that expires within this margin is treated as already expired
+const EXPIRY_MARGIN_MS = 30_000;
+
+export const getSession = (): PharmacistSession | null => {
+    const raw = sessionStorage.getItem(STORAGE_KEY);
+    if (!raw) return null;
+    try {
+        const session: PharmacistSession = JSON.parse(raw);
+        if (session.expiresAt - EXPIRY_MARGIN_MS > Date.now()) return session;
+    } catch {
+        // Unreadable entry; fall through and drop it
+    }
+    clearSession();
+    return null;
+};
+
+export const clearSession = () => {
+    sessionStorage.removeItem(STORAGE_KEY);
+};
+
+// Checks the PIN once and keeps the token, so later requests skip the server's bcrypt check
+export const login = async (licenseNumber: string, pin: string): Promise<PharmacistSession> => {
+    const apiUrl = import.meta.env.VITE_API_URL || '';
+    const response = await axios.post(`${apiUrl}/api/auth/login`, {
+        license_number: licenseNumber,
+        pin
+    });
+    const session: PharmacistSession = {
+        token: response.data.access_token,
+        pharmacistId: response.data.pharmacist_id,
+        pharmacistName: response.data.pharmacist_name,
+        expiresAt: Date.now() + response.data.expires_in * 1000
+    };
+    sessionStorage.setItem(STORAGE_KEY, JSON.stringify(session));
+    return session;
+};
+
+export const authHeaders = (session: PharmacistSession) => ({
+    Authorization: `Bearer ${session.token}`
+});